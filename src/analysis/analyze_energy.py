@@ -1,14 +1,18 @@
 import pandas as pd
+import numpy as np
 import matplotlib.pyplot as plt
 from datetime import datetime
 import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.data_store import load_cleaned_data
+from utils.dataset import EnergyDataset
+from analysis.battery_simulation import cyclic_initial_state, simulate_battery_soc
+from analysis.degradation import estimate_degradation
 
 def analyze_energy_data():
     # Read the cleaned data
-    df = pd.read_csv('cleaned_data.csv')
-    
-    # Convert Time to datetime
-    df['Time'] = pd.to_datetime(df['Time'])
+    df = load_cleaned_data()
     
     # Convert negative production values to positive
     df['Pprod(W)'] = df['Pprod(W)'].abs()
@@ -81,17 +85,14 @@ def analyze_energy_data():
 
 def create_solstice_comparison():
     # Read the cleaned data
-    df = pd.read_csv('cleaned_data.csv')
-    
-    # Convert Time to datetime
-    df['Time'] = pd.to_datetime(df['Time'])
+    dataset = EnergyDataset.load()
     
-    # Convert negative production values to positive
-    df['Pprod(W)'] = df['Pprod(W)'].abs()
+    # Production power as absolute values
+    df = dataset.to_frame()
     
     # Filter for June 1st and December 21st
-    june_1 = df[df['Time'].dt.date == pd.to_datetime('2023-06-01').date()]
-    dec_21 = df[df['Time'].dt.date == pd.to_datetime('2023-12-21').date()]
+    june_1 = df.iloc[dataset.day_slice('2023-06-01')]
+    dec_21 = df.iloc[dataset.day_slice('2023-12-21')]
     
     # Create the plot
     plt.figure(figsize=(15, 8))
@@ -129,10 +130,7 @@ def create_solstice_comparison():
 
 def analyze_battery_sizing():
     # Read the cleaned data
-    df = pd.read_csv('cleaned_data.csv')
-    
-    # Convert Time to datetime
-    df['Time'] = pd.to_datetime(df['Time'])
+    df = load_cleaned_data()
     
     # Convert negative production values to positive
     df['Pprod(W)'] = df['Pprod(W)'].abs()
@@ -222,10 +220,7 @@ def analyze_battery_sizing():
 
 def analyze_seasonal_storage():
     # Read the cleaned data
-    df = pd.read_csv('cleaned_data.csv')
-    
-    # Convert Time to datetime
-    df['Time'] = pd.to_datetime(df['Time'])
+    df = load_cleaned_data()
     
     # Convert negative production values to positive
     df['Pprod(W)'] = df['Pprod(W)'].abs()
@@ -382,14 +377,11 @@ def calculate_battery_state(day_data, initial_percent, battery_capacity=None):
     
     # Initialize battery state at specified percentage
     initial_state = battery_capacity * (initial_percent / 100)
-    day_data['Battery_State_Wh'] = initial_state
     
-    # Calculate battery state over time
-    for i in range(1, len(day_data)):
-        # Calculate new state based on previous state and current flow
-        new_state = day_data['Battery_State_Wh'].iloc[i-1] + day_data['Energy_Flow_Wh'].iloc[i]
-        # Clip to battery capacity limits
-        day_data.loc[day_data.index[i], 'Battery_State_Wh'] = max(0, min(new_state, battery_capacity))
+    # Calculate battery state over time, clipped to battery capacity limits
+    day_data['Battery_State_Wh'] = simulate_battery_soc(
+        day_data['Energy_Flow_Wh'].to_numpy(), battery_capacity, initial_state
+    )
     
     # Calculate percentage of capacity
     day_data['Battery_State_Percent'] = (day_data['Battery_State_Wh'] / battery_capacity) * 100
@@ -398,17 +390,14 @@ def calculate_battery_state(day_data, initial_percent, battery_capacity=None):
 
 def analyze_battery_flows():
     # Read the cleaned data
-    df = pd.read_csv('cleaned_data.csv')
+    dataset = EnergyDataset.load()
     
-    # Convert Time to datetime
-    df['Time'] = pd.to_datetime(df['Time'])
-    
-    # Convert negative production values to positive
-    df['Pprod(W)'] = df['Pprod(W)'].abs()
+    # Production power as absolute values
+    df = dataset.to_frame()
     
     # Filter for June 1st (summer) and December 21st (winter)
-    summer_day = df[df['Time'].dt.date == pd.to_datetime('2023-06-01').date()]
-    winter_day = df[df['Time'].dt.date == pd.to_datetime('2023-12-21').date()]
+    summer_day = df.iloc[dataset.day_slice('2023-06-01')]
+    winter_day = df.iloc[dataset.day_slice('2023-12-21')]
     
     # Battery capacity in Wh
     BATTERY_CAPACITY = 650 * 1000  # 650 kWh in Wh
@@ -552,19 +541,17 @@ def analyze_battery_flows():
     print("- battery_flows_100percent.png")
     print("- battery_flows_calculations.txt")
 
-def analyze_annual_battery():
-    # Read the cleaned data
-    df = pd.read_csv('cleaned_data.csv')
-    
-    # Convert Time to datetime
-    df['Time'] = pd.to_datetime(df['Time'])
-    
-    # Convert negative production values to positive
-    df['Pprod(W)'] = df['Pprod(W)'].abs()
+def analyze_annual_battery(cyclic=False):
+    """
+    Simulate the 40 MWh seasonal battery over the year.
     
-    # Calculate energy in Wh (15-minute intervals)
-    df['Energy_Production_Wh'] = df['Pprod(W)'] * 0.25
-    df['Energy_Demand_Wh'] = df['Pdemand(W)'] * 0.25
+    Args:
+        cyclic (bool): Start at the periodic steady state (the charge at which the
+            battery ends the year where it started) instead of at 50%
+    """
+    # Read the cleaned data (production as absolute values, energy in Wh)
+    dataset = EnergyDataset.load()
+    df = dataset.to_frame()
     
     # Calculate power difference (battery flow)
     df['Battery_Flow_W'] = df['Pprod(W)'] - df['Pdemand(W)']
@@ -575,28 +562,30 @@ def analyze_annual_battery():
     # Battery capacity in Wh - 40 MWh = 40,000 kWh = 40,000,000 Wh
     BATTERY_CAPACITY = 40 * 1000 * 1000  # 40 MWh in Wh
     
-    # Initialize battery state at 50% (as requested)
-    initial_state = BATTERY_CAPACITY * 0.5
-    df['Battery_State_Wh'] = initial_state
+    # Initialize battery state at 50% (as requested), or at the charge the
+    # battery returns to at the end of the year
+    if cyclic:
+        initial_state = float(cyclic_initial_state(df['Energy_Flow_Wh'].to_numpy(), BATTERY_CAPACITY))
+    else:
+        initial_state = BATTERY_CAPACITY * 0.5
+    initial_percent = initial_state / BATTERY_CAPACITY * 100
+    suffix = '_cyclic' if cyclic else ''
     
-    # Calculate battery state over time
-    for i in range(1, len(df)):
-        # Calculate new state based on previous state and current flow
-        new_state = df['Battery_State_Wh'].iloc[i-1] + df['Energy_Flow_Wh'].iloc[i]
-        # Clip to battery capacity limits
-        df.loc[df.index[i], 'Battery_State_Wh'] = max(0, min(new_state, BATTERY_CAPACITY))
+    # Calculate battery state over time, clipped to battery capacity limits
+    df['Battery_State_Wh'] = simulate_battery_soc(
+        df['Energy_Flow_Wh'].to_numpy(), BATTERY_CAPACITY, initial_state
+    )
     
     # Calculate percentage of capacity
     df['Battery_State_Percent'] = (df['Battery_State_Wh'] / BATTERY_CAPACITY) * 100
     
-    # Calculate daily averages for plotting (to reduce number of points in the graph)
-    daily_avg = df.groupby(df['Time'].dt.date).agg({
-        'Battery_State_Percent': 'mean',
-        'Battery_State_Wh': 'mean',
-        'Energy_Production_Wh': 'sum',
-        'Energy_Demand_Wh': 'sum',
-        'Energy_Flow_Wh': 'sum'
-    }).reset_index()
+    # Daily energy totals from the rollups and daily average battery state for
+    # plotting (to reduce number of points in the graph)
+    daily_avg = dataset.rollup('day')[['Time', 'Energy_Production_Wh', 'Energy_Demand_Wh', 'Energy_Difference_Wh']]
+    daily_avg = daily_avg.rename(columns={'Energy_Difference_Wh': 'Energy_Flow_Wh'})
+    day_lengths = dataset.day_ends - dataset.day_starts
+    daily_avg['Battery_State_Wh'] = np.add.reduceat(df['Battery_State_Wh'].to_numpy(), dataset.day_starts) / day_lengths
+    daily_avg['Battery_State_Percent'] = np.add.reduceat(df['Battery_State_Percent'].to_numpy(), dataset.day_starts) / day_lengths
     
     # Convert to MWh for better readability
     daily_avg['Battery_State_MWh'] = daily_avg['Battery_State_Wh'] / 1000 / 1000
@@ -613,7 +602,7 @@ def analyze_annual_battery():
     plt.axhline(y=40, color='red', linestyle='--', alpha=0.5, label='Full Capacity (40 MWh)')
     plt.axhline(y=0, color='red', linestyle='--', alpha=0.5, label='Empty')
     plt.axhline(y=20, color='green', linestyle='--', alpha=0.5, label='50% Capacity (20 MWh)')
-    plt.title('40 MWh Battery State Throughout 2023 (Starting at 20 MWh)', fontsize=14)
+    plt.title(f'40 MWh Battery State Throughout 2023 (Starting at {initial_state/1000/1000:.0f} MWh)', fontsize=14)
     plt.xlabel('Date')
     plt.ylabel('Battery State (MWh)')
     plt.ylim(-2, 42)
@@ -635,18 +624,18 @@ def analyze_annual_battery():
     
     # Adjust layout and save plot
     plt.tight_layout()
-    plt.savefig('annual_battery_simulation.png', dpi=300)
+    plt.savefig(f'annual_battery_simulation{suffix}.png', dpi=300)
     
     # Save calculations to text file
-    with open('annual_battery_simulation.txt', 'w') as f:
-        f.write("Annual 40 MWh Battery Simulation (Starting at 50% Charge)\n")
+    with open(f'annual_battery_simulation{suffix}.txt', 'w') as f:
+        f.write(f"Annual 40 MWh Battery Simulation (Starting at {initial_percent:.0f}% Charge)\n")
         f.write("=" * 60 + "\n\n")
         
         # Overall statistics
         f.write("Overall Statistics:\n")
         f.write("-" * 30 + "\n")
         f.write(f"Battery Capacity: 40.00 MWh (40,000 kWh)\n")
-        f.write(f"Initial Charge: 20.00 MWh (50%)\n")
+        f.write(f"Initial Charge: {initial_state/1000/1000:.2f} MWh ({initial_percent:.0f}%)\n")
         f.write(f"Final Charge: {df['Battery_State_Wh'].iloc[-1]/1000/1000:.2f} MWh ({df['Battery_State_Percent'].iloc[-1]:.2f}%)\n")
         f.write(f"Minimum Charge: {df['Battery_State_Wh'].min()/1000/1000:.2f} MWh ({df['Battery_State_Percent'].min():.2f}%)\n")
         f.write(f"Maximum Charge: {df['Battery_State_Wh'].max()/1000/1000:.2f} MWh ({df['Battery_State_Percent'].max():.2f}%)\n\n")
@@ -686,20 +675,21 @@ def analyze_annual_battery():
             else:
                 f.write("(net discharging)\n")
         
-        f.write("\nNote: This simulation used a 40 MWh (40,000 kWh) battery starting at 50% charge.\n")
+        if cyclic:
+            f.write("\nNote: This simulation used a 40 MWh (40,000 kWh) battery in its periodic steady state:\n")
+            f.write("it starts the year with the same charge it has at the end of the year.\n")
+        else:
+            f.write("\nNote: This simulation used a 40 MWh (40,000 kWh) battery starting at 50% charge.\n")
         f.write("The seasonal storage analysis recommended a capacity of approximately 39,362 kWh,\n")
         f.write("which is very close to the 40 MWh (40,000 kWh) used in this simulation.\n")
     
-    print("Annual battery simulation complete! Results have been saved to 'annual_battery_simulation.png' and 'annual_battery_simulation.txt'")
+    print(f"Annual battery simulation complete! Results have been saved to 'annual_battery_simulation{suffix}.png' and 'annual_battery_simulation{suffix}.txt'")
     
     return daily_avg
 
 def analyze_annual_battery_empty():
     # Read the cleaned data
-    df = pd.read_csv('cleaned_data.csv')
-    
-    # Convert Time to datetime
-    df['Time'] = pd.to_datetime(df['Time'])
+    df = load_cleaned_data()
     
     # Convert negative production values to positive
     df['Pprod(W)'] = df['Pprod(W)'].abs()
@@ -719,14 +709,11 @@ def analyze_annual_battery_empty():
     
     # Initialize battery state at 0% (empty)
     initial_state = 0
-    df['Battery_State_Wh'] = initial_state
     
-    # Calculate battery state over time
-    for i in range(1, len(df)):
-        # Calculate new state based on previous state and current flow
-        new_state = df['Battery_State_Wh'].iloc[i-1] + df['Energy_Flow_Wh'].iloc[i]
-        # Clip to battery capacity limits
-        df.loc[df.index[i], 'Battery_State_Wh'] = max(0, min(new_state, BATTERY_CAPACITY))
+    # Calculate battery state over time, clipped to battery capacity limits
+    df['Battery_State_Wh'] = simulate_battery_soc(
+        df['Energy_Flow_Wh'].to_numpy(), BATTERY_CAPACITY, initial_state
+    )
     
     # Calculate percentage of capacity
     df['Battery_State_Percent'] = (df['Battery_State_Wh'] / BATTERY_CAPACITY) * 100
@@ -836,14 +823,9 @@ def analyze_annual_battery_empty():
     return daily_avg
 
 def analyze_battery_c_rates():
-    # Read the cleaned data
-    df = pd.read_csv('cleaned_data.csv')
-    
-    # Convert Time to datetime
-    df['Time'] = pd.to_datetime(df['Time'])
-    
-    # Convert negative production values to positive
-    df['Pprod(W)'] = df['Pprod(W)'].abs()
+    # Read the cleaned data (production as absolute values)
+    dataset = EnergyDataset.load()
+    df = dataset.to_frame()
     
     # Calculate the net power flow (positive = charging, negative = discharging)
     df['Net_Power_W'] = df['Pprod(W)'] - df['Pdemand(W)']
@@ -856,18 +838,30 @@ def analyze_battery_c_rates():
     df['Daily_C_Rate'] = abs(df['Net_Power_W']) / DAILY_BATTERY_CAPACITY_WH
     df['Seasonal_C_Rate'] = abs(df['Net_Power_W']) / SEASONAL_BATTERY_CAPACITY_WH
     
+    # Simulate both batteries from 50% and count their charge cycles
+    capacities = np.array([DAILY_BATTERY_CAPACITY_WH, SEASONAL_BATTERY_CAPACITY_WH])
+    states = simulate_battery_soc((df['Net_Power_W'] * 0.25).to_numpy()[:, None], capacities, capacities * 0.5)
+    daily_cycling, seasonal_cycling = estimate_degradation(states, capacities).to_dict('records')
+    
     # Get overall statistics
     max_daily_c_rate = df['Daily_C_Rate'].max()
     max_seasonal_c_rate = df['Seasonal_C_Rate'].max()
     avg_daily_c_rate = df['Daily_C_Rate'].mean()
     avg_seasonal_c_rate = df['Seasonal_C_Rate'].mean()
     
-    # Calculate daily maximum and average C-rates for time series visualization
-    daily_stats = df.groupby(df['Time'].dt.date).agg({
-        'Daily_C_Rate': ['max', 'mean'],
-        'Seasonal_C_Rate': ['max', 'mean'],
-        'Net_Power_W': ['max', 'min', 'mean']
-    }).reset_index()
+    # Daily maximum and average C-rates for time series visualization, from
+    # the daily rollup of the absolute net power
+    daily = dataset.rollup('day')
+    daily_stats = pd.DataFrame({
+        ('Time', ''): daily['Time'],
+        ('Daily_C_Rate', 'max'): daily['Abs_Net_Max_W'] / DAILY_BATTERY_CAPACITY_WH,
+        ('Daily_C_Rate', 'mean'): daily['Abs_Net_Mean_W'] / DAILY_BATTERY_CAPACITY_WH,
+        ('Seasonal_C_Rate', 'max'): daily['Abs_Net_Max_W'] / SEASONAL_BATTERY_CAPACITY_WH,
+        ('Seasonal_C_Rate', 'mean'): daily['Abs_Net_Mean_W'] / SEASONAL_BATTERY_CAPACITY_WH,
+        ('Net_Power_W', 'max'): daily['Net_Max_W'],
+        ('Net_Power_W', 'min'): daily['Net_Min_W'],
+        ('Net_Power_W', 'mean'): daily['Net_Mean_W']
+    })
     
     # Create plots
     plt.figure(figsize=(15, 12))
@@ -941,6 +935,17 @@ def analyze_battery_c_rates():
             seasonal_val = df['Seasonal_C_Rate'].quantile(p/100)
             f.write(f"{p:10}% | {daily_val:.4f}C ({1/daily_val:.2f} hrs) | {seasonal_val:.4f}C ({1/seasonal_val:.2f} hrs)\n")
         
+        # Cycling from rainflow counting of the simulated state of charge
+        f.write("\nCycling and Degradation (rainflow counting, starting at 50%):\n")
+        f.write("-" * 30 + "\n")
+        f.write("Metric | Daily Storage | Seasonal Storage\n")
+        f.write("-" * 50 + "\n")
+        f.write(f"Equivalent full cycles per year | {daily_cycling['Equivalent_Full_Cycles_Per_Year']:.1f} | {seasonal_cycling['Equivalent_Full_Cycles_Per_Year']:.1f}\n")
+        f.write(f"Cycle fade per year | {daily_cycling['Cycle_Fade_Percent_Per_Year']:.2f}% | {seasonal_cycling['Cycle_Fade_Percent_Per_Year']:.2f}%\n")
+        f.write(f"Calendar fade per year | {daily_cycling['Calendar_Fade_Percent_Per_Year']:.2f}% | {seasonal_cycling['Calendar_Fade_Percent_Per_Year']:.2f}%\n")
+        f.write(f"Total capacity fade per year | {daily_cycling['Capacity_Fade_Percent_Per_Year']:.2f}% | {seasonal_cycling['Capacity_Fade_Percent_Per_Year']:.2f}%\n")
+        f.write(f"Years to end of life (20% fade) | {daily_cycling['Years_To_End_Of_Life']:.1f} | {seasonal_cycling['Years_To_End_Of_Life']:.1f}\n")
+        
         # Add insights about the practical implications
         f.write("\nInsights and Implications:\n")
         f.write("-" * 30 + "\n")
@@ -975,6 +980,7 @@ if __name__ == "__main__":
     analyze_seasonal_storage()
     analyze_battery_flows()
     analyze_annual_battery()
+    analyze_annual_battery(cyclic=True)
     analyze_annual_battery_empty()
     analyze_battery_c_rates()
     analyze_annual_battery_empty()
@@ -3,71 +3,72 @@ import numpy as np
 import matplotlib.pyplot as plt
 from datetime import datetime, timedelta
 import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.dataset import EnergyDataset
 
-def analyze_solar_production_times():
+def production_windows(dataset, thresholds=0.05):
+    """
+    First and last interval of every day with production above a threshold.
+    
+    The threshold is a fraction of the maximum production of the day. All
+    thresholds are evaluated in one pass: every row is compared with the
+    threshold of its day, and the first and last producing time of each day
+    are running minima/maxima over the day index.
+    
+    Args:
+        dataset (EnergyDataset): Dataset to analyze
+        thresholds (float or list): Fraction(s) of the daily maximum production
+    
+    Returns:
+        DataFrame: One row per day (and threshold) with production above the
+            threshold: 'Threshold', 'Date', 'Month', 'Day', 'Start_Time',
+            'End_Time' and 'Duration' (times in decimal hours)
+    """
+    thresholds = np.atleast_1d(np.asarray(thresholds, dtype=np.float64))
+    if len(dataset) == 0:
+        return pd.DataFrame(columns=['Threshold', 'Date', 'Month', 'Day', 'Start_Time', 'End_Time', 'Duration'])
+    production = dataset.production_w
+    starts = dataset.day_starts
+    
+    # Threshold of every row for every threshold fraction, shape (rows, thresholds)
+    daily_max = np.maximum.reduceat(production, starts)
+    producing = production[:, None] > daily_max[dataset.day_index][:, None] * thresholds[None, :]
+    
+    time_of_day = dataset.time_of_day[:, None]
+    start_time = np.minimum.reduceat(np.where(producing, time_of_day, np.inf), starts, axis=0)
+    end_time = np.maximum.reduceat(np.where(producing, time_of_day, -np.inf), starts, axis=0)
+    
+    # Days without production above the threshold are left out
+    columns, days = np.nonzero(np.isfinite(start_time).T)
+    first_rows = starts[days]
+    return pd.DataFrame({
+        'Threshold': thresholds[columns],
+        'Date': dataset.dates[days],
+        'Month': dataset.month[first_rows],
+        'Day': dataset.time.dt.day.to_numpy()[first_rows],
+        'Start_Time': start_time[days, columns],
+        'End_Time': end_time[days, columns],
+        'Duration': end_time[days, columns] - start_time[days, columns],
+    })
+
+def analyze_solar_production_times(dataset=None):
     """
     Analyze solar production data to determine average times when solar panels 
     start and stop producing power throughout the year.
+    
+    Args:
+        dataset (EnergyDataset, optional): Preloaded dataset. If None, it is loaded from disk.
     """
     print("Starting solar production time analysis...")
     
     # Read the cleaned data
-    df = pd.read_csv('cleaned_data.csv')
-    print(f"Loaded data with {len(df)} rows")
-    
-    # Convert Time to datetime
-    df['Time'] = pd.to_datetime(df['Time'])
-    
-    # Convert negative production values to positive
-    df['Pprod(W)'] = df['Pprod(W)'].abs()
-    
-    # Add date and time components
-    df['Date'] = df['Time'].dt.date
-    df['Hour'] = df['Time'].dt.hour
-    df['Minute'] = df['Time'].dt.minute
-    df['TimeOfDay'] = df['Hour'] + df['Minute']/60
-    df['Month'] = df['Time'].dt.month
-    
-    # Define a significant production threshold (e.g., 5% of the daily maximum)
-    # Group by date to calculate daily statistics
-    daily_stats = df.groupby('Date').agg({'Pprod(W)': ['max', 'mean']})
-    daily_stats.columns = ['Daily_Max_Prod', 'Daily_Avg_Prod']
-    daily_stats.reset_index(inplace=True)
-    
-    # Merge daily stats back to the main dataframe
-    df = pd.merge(df, daily_stats, on='Date')
-    
-    # Define threshold as 5% of daily maximum production
-    df['Threshold'] = df['Daily_Max_Prod'] * 0.05
-    
-    # Identify when production is above threshold
-    df['IsProducing'] = df['Pprod(W)'] > df['Threshold']
-    
-    # Group by date to find the first and last time of production for each day
-    production_times = []
-    
-    for date, group in df.groupby('Date'):
-        if group['IsProducing'].any():
-            # Get rows where production is happening
-            producing_rows = group[group['IsProducing']]
-            
-            # Find first and last time of production
-            start_time = producing_rows['TimeOfDay'].min()
-            end_time = producing_rows['TimeOfDay'].max()
-            
-            # Get the month for seasonal analysis
-            month = producing_rows['Month'].iloc[0]
-            
-            production_times.append({
-                'Date': date,
-                'Start_Time': start_time,
-                'End_Time': end_time,
-                'Duration': end_time - start_time,
-                'Month': month
-            })
-    
-    # Convert to DataFrame
-    times_df = pd.DataFrame(production_times)
+    if dataset is None:
+        dataset = EnergyDataset.load()
+    print(f"Loaded data with {len(dataset)} rows")
+    
+    # First and last time above 5% of the daily maximum production
+    times_df = production_windows(dataset, 0.05)
     
     # Overall statistics
     print("\nOverall Statistics:")
@@ -2,33 +2,30 @@ import pandas as pd
 import matplotlib.pyplot as plt
 import os
 from src.utils.config import (
-    CLEANED_DATA_PATH, 
-    IMAGES_DIR, 
-    REPORTS_DIR,
+    output_dirs,
     DAILY_BATTERY_CAPACITY_WH,
     SEASONAL_BATTERY_CAPACITY_WH,
     SUMMER_SOLSTICE,
     WINTER_SOLSTICE
 )
+from src.utils.dataset import EnergyDataset
 
-def analyze_battery_sizing():
-    """Analyze battery sizing requirements based on daily patterns."""
-    # Read the cleaned data
-    df = pd.read_csv(CLEANED_DATA_PATH)
+def analyze_battery_sizing(dataset=None, output_dir=None):
+    """
+    Analyze battery sizing requirements based on daily patterns.
     
-    # Convert Time to datetime and preprocess data
-    df['Time'] = pd.to_datetime(df['Time'])
-    df['Pprod(W)'] = df['Pprod(W)'].abs()
-    df['Energy_Production_Wh'] = df['Pprod(W)'] * 0.25
-    df['Energy_Demand_Wh'] = df['Pdemand(W)'] * 0.25
+    Args:
+        dataset (EnergyDataset, optional): Preloaded dataset. If None, it is loaded from disk.
+        output_dir (str, optional): Directory for the images and reports. Defaults to the configured output directories.
+    """
+    images_dir, reports_dir = output_dirs(output_dir)
     
-    # Calculate daily totals
-    daily_totals = df.groupby(df['Time'].dt.date).agg({
-        'Energy_Production_Wh': 'sum',
-        'Energy_Demand_Wh': 'sum'
-    }).reset_index()
+    # Read the cleaned data
+    if dataset is None:
+        dataset = EnergyDataset.load()
     
-    daily_totals['Energy_Difference_Wh'] = daily_totals['Energy_Production_Wh'] - daily_totals['Energy_Demand_Wh']
+    # Calculate daily totals (production as absolute values, energy in Wh)
+    daily_totals = dataset.daily_totals()
     
     # Create visualization
     plt.figure(figsize=(15, 10))
@@ -52,10 +49,10 @@ def analyze_battery_sizing():
     plt.grid(True)
     
     plt.tight_layout()
-    plt.savefig(os.path.join(IMAGES_DIR, 'battery_sizing_analysis.png'))
+    plt.savefig(os.path.join(images_dir, 'battery_sizing_analysis.png'))
     
     # Save detailed analysis
-    with open(os.path.join(REPORTS_DIR, 'battery_sizing_calculations.txt'), 'w') as f:
+    with open(os.path.join(reports_dir, 'battery_sizing_calculations.txt'), 'w') as f:
         f.write("Battery Sizing Analysis\n")
         f.write("=" * 50 + "\n\n")
         
@@ -85,7 +82,7 @@ def analyze_battery_sizing():
         f.write("4. It accounts for typical battery efficiency losses (90-95%)\n")
     
     print("Battery sizing analysis complete! Results saved to:")
-    print(f"- {os.path.join(IMAGES_DIR, 'battery_sizing_analysis.png')}")
-    print(f"- {os.path.join(REPORTS_DIR, 'battery_sizing_calculations.txt')}")
+    print(f"- {os.path.join(images_dir, 'battery_sizing_analysis.png')}")
+    print(f"- {os.path.join(reports_dir, 'battery_sizing_calculations.txt')}")
     
     return daily_totals
@@ -0,0 +1,835 @@
+import numpy as np
+import pandas as pd
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.config import INTERVAL_HOURS
+
+# Scenarios simulated together in one call of the scan kernel
+SCAN_BATCH_SIZE = 16
+
+# The scan costs about the same per scenario, the per-interval loop about
+# the same for any number of scenarios; above this many scenarios the loop
+# is faster
+SCAN_MAX_SCENARIOS = 256
+
+# Rows per block of the scan: the steps inside a block are composed one
+# row at a time (for all blocks at once), the blocks with a prefix scan
+SCAN_BLOCK_ROWS = 64
+
+def _compose_clamps(first, second):
+    """
+    Compose two clamped affine steps, applying `first` and then `second`.
+
+    Each step is a tuple (retention, shift, lower, upper) representing
+    s -> min(upper, max(lower, retention * s + shift)). Because retention is
+    never negative, the composition of two such steps is again a clamped
+    affine step, which is what makes the prefix scan possible.
+    """
+    retention_1, shift_1, lower_1, upper_1 = first
+    retention_2, shift_2, lower_2, upper_2 = second
+    return (
+        retention_1 * retention_2,
+        retention_2 * shift_1 + shift_2,
+        np.clip(retention_2 * lower_1 + shift_2, lower_2, upper_2),
+        np.clip(retention_2 * upper_1 + shift_2, lower_2, upper_2),
+    )
+
+def simulate_battery_soc(energy_flow_wh, battery_capacity_wh, initial_state_wh, reset_rows=None, retention=1.0):
+    """
+    Calculate the battery state of charge for a series of energy flows.
+
+    The state follows the same rule as the original per-row loops:
+    the first interval holds the initial state, and every following interval
+    adds its energy flow to the previous state, clipped to [0, capacity].
+    Instead of stepping through the rows, the clipped steps are combined with
+    a two-level prefix scan: the series is cut into blocks of SCAN_BLOCK_ROWS
+    rows, the steps inside every block are composed row by row for all
+    blocks at once, and the block totals are combined with a parallel
+    prefix scan. Every row is composed about once, so the work grows
+    linearly with the series length and the number of scenarios.
+
+    Args:
+        energy_flow_wh (array-like): Energy into the battery per interval in Wh
+            (positive = surplus/charging, negative = deficit/discharging).
+            Shape (n,) or (n, scenarios).
+        battery_capacity_wh (float or array-like): Battery capacity in Wh,
+            broadcastable against the scenario axis.
+        initial_state_wh (float or array-like): State of charge at the first
+            interval in Wh, broadcastable against the scenario axis.
+        reset_rows (array-like, optional): Rows at which the battery is set back
+            to the initial state, e.g. the first interval of every day. Like the
+            first row, their flow is not applied.
+        retention (float or array-like): Fraction of the charge kept from one
+            interval to the next (1 - self-discharge), broadcastable against
+            the scenario axis.
+
+    Returns:
+        ndarray: Battery state in Wh with the same shape as energy_flow_wh
+    """
+    flow = np.asarray(energy_flow_wh, dtype=np.float64)
+    capacity = np.asarray(battery_capacity_wh, dtype=np.float64)
+    if len(flow) == 0:
+        return flow.copy()
+
+    shape = np.broadcast_shapes(flow.shape, capacity.shape)
+    n = shape[0]
+    block = min(SCAN_BLOCK_ROWS, n)
+    n_blocks = -(-n // block)
+
+    # The rows after the series (up to a whole number of blocks) are identity steps
+    padded = (n_blocks * block,) + shape[1:]
+    keep = np.ones(padded)
+    shift = np.zeros(padded)
+    lower = np.full(padded, -np.inf)
+    upper = np.full(padded, np.inf)
+    keep[:n] = np.asarray(retention, dtype=np.float64)
+    shift[:n] = flow
+    lower[:n] = 0.0
+    upper[:n] = capacity
+
+    initial = np.broadcast_to(np.asarray(initial_state_wh, dtype=np.float64), shape[1:])
+
+    # The first interval only holds the initial state, its flow is not applied
+    keep[0] = 1.0
+    shift[0] = 0.0
+
+    # A reset maps any state to the initial state: a clamp to [initial, initial]
+    if reset_rows is not None:
+        reset_rows = np.asarray(reset_rows, dtype=np.int64)
+        keep[reset_rows] = 0.0
+        shift[reset_rows] = initial
+        lower[reset_rows] = initial
+        upper[reset_rows] = initial
+
+    # Within every block, row j becomes the combined effect of rows 0..j of the block
+    steps = [part.reshape((n_blocks, block) + shape[1:]) for part in (keep, shift, lower, upper)]
+    for row in range(1, block):
+        combined = _compose_clamps(tuple(part[:, row - 1] for part in steps), tuple(part[:, row] for part in steps))
+        for part, value in zip(steps, combined):
+            part[:, row] = value
+
+    # Hillis-Steele inclusive scan over the block totals: after the loop,
+    # block k describes the combined effect of blocks 0..k
+    totals = [part[:, -1].copy() for part in steps]
+    step = 1
+    while step < n_blocks:
+        combined = _compose_clamps(
+            tuple(part[:n_blocks - step] for part in totals),
+            tuple(part[step:] for part in totals)
+        )
+        for part, value in zip(totals, combined):
+            part[step:] = value
+        step *= 2
+
+    # State at the start of every block, then every row from the start of its block
+    start = np.empty((n_blocks,) + shape[1:])
+    start[0] = initial
+    start[1:] = np.clip(totals[0][:-1] * initial + totals[1][:-1], totals[2][:-1], totals[3][:-1])
+    keep, shift, lower, upper = steps
+    state = np.clip(keep * start[:, None] + shift, lower, upper)
+    return state.reshape(padded)[:n]
+
+def _reduce_clamps(keep, shift, lower, upper):
+    """
+    Combine a series of clamped affine steps (along axis 0) into one step.
+
+    Neighbouring steps are composed pairwise, halving the series every
+    round, so the whole series costs log2(n) rounds of array operations.
+    """
+    steps = [np.asarray(part, dtype=np.float64) for part in (keep, shift, lower, upper)]
+    while len(steps[0]) > 1:
+        if len(steps[0]) % 2:
+            # Pad with the identity step so every step has a partner
+            identity = (1.0, 0.0, -np.inf, np.inf)
+            steps = [
+                np.concatenate((part, np.full((1,) + part.shape[1:], value)))
+                for part, value in zip(steps, identity)
+            ]
+        steps = list(_compose_clamps(
+            tuple(part[0::2] for part in steps),
+            tuple(part[1::2] for part in steps)
+        ))
+    return tuple(part[0] for part in steps)
+
+class BatteryProperties:
+    """
+    Losses and power limits of a battery.
+
+    Every value can be a scalar or an array with one value per scenario.
+    The defaults describe the ideal battery used so far: lossless, no power
+    limits and no self-discharge.
+    """
+
+    def __init__(self, charge_efficiency=1.0, discharge_efficiency=1.0,
+                 max_charge_w=None, max_discharge_w=None,
+                 max_charge_c_rate=None, max_discharge_c_rate=None,
+                 self_discharge_per_interval=0.0):
+        """
+        Args:
+            charge_efficiency (float): Fraction of the charging energy that is stored
+            discharge_efficiency (float): Fraction of the drawn charge that is delivered
+            max_charge_w (float, optional): Maximum charging power in W
+            max_discharge_w (float, optional): Maximum discharging power in W
+            max_charge_c_rate (float, optional): Maximum charging power as a C-rate
+                (1 = full capacity in one hour)
+            max_discharge_c_rate (float, optional): Maximum discharging power as a C-rate
+            self_discharge_per_interval (float): Fraction of the charge lost every interval
+        """
+        self.charge_efficiency = np.asarray(charge_efficiency, dtype=np.float64)
+        self.discharge_efficiency = np.asarray(discharge_efficiency, dtype=np.float64)
+        self.max_charge_w = max_charge_w
+        self.max_discharge_w = max_discharge_w
+        self.max_charge_c_rate = max_charge_c_rate
+        self.max_discharge_c_rate = max_discharge_c_rate
+        self.retention = 1.0 - np.asarray(self_discharge_per_interval, dtype=np.float64)
+
+    def select_scenarios(self, scenarios, n_scenarios):
+        """
+        Properties of some of the scenarios.
+
+        Args:
+            scenarios (slice or ndarray): Scenarios to keep
+            n_scenarios (int): Number of scenarios; scalar values are shared by all
+
+        Returns:
+            BatteryProperties: The properties of the selected scenarios
+        """
+        selected = BatteryProperties.__new__(BatteryProperties)
+        for name, value in vars(self).items():
+            if value is not None and np.ndim(value) > 0:
+                value = np.broadcast_to(value, (n_scenarios,))[scenarios]
+            setattr(selected, name, value)
+        return selected
+
+    @staticmethod
+    def _limit_wh(max_w, max_c_rate, capacity_wh):
+        limit = np.inf
+        if max_w is not None:
+            limit = np.minimum(limit, np.asarray(max_w, dtype=np.float64) * INTERVAL_HOURS)
+        if max_c_rate is not None:
+            limit = np.minimum(limit, np.asarray(max_c_rate, dtype=np.float64) * capacity_wh * INTERVAL_HOURS)
+        return limit
+
+    def limit_request(self, request_wh, capacity_wh):
+        """
+        Cap the requested energy per interval at the power limits.
+
+        Args:
+            request_wh (ndarray): Energy the battery is asked to take (+) or give (-)
+            capacity_wh (float or ndarray): Battery capacity in Wh (for C-rate limits)
+
+        Returns:
+            ndarray: The request within [-discharge limit, charge limit]
+        """
+        return np.clip(
+            request_wh,
+            -self._limit_wh(self.max_discharge_w, self.max_discharge_c_rate, capacity_wh),
+            self._limit_wh(self.max_charge_w, self.max_charge_c_rate, capacity_wh)
+        )
+
+    def stored_change(self, limited_request_wh):
+        """
+        Change of the stored charge for a (limited) request.
+
+        Charging stores only part of the energy taken in, and delivering
+        energy draws more than is delivered.
+        """
+        return np.where(
+            limited_request_wh > 0,
+            limited_request_wh * self.charge_efficiency,
+            limited_request_wh / self.discharge_efficiency
+        )
+
+class DispatchStrategy:
+    """
+    How the battery is operated.
+
+    A strategy decides how much energy the battery is asked to take
+    (positive) or give (negative) in every interval, and at which rows it is
+    set back to its initial state. The battery then follows those requests
+    within its capacity, using the same vectorized kernel for every strategy,
+    and whatever it does not handle goes to the grid. New strategies only
+    override battery_request() and/or reset_rows().
+
+    This base class is greedy self-consumption: every surplus is stored and
+    every deficit is drawn from the battery.
+    """
+
+    def battery_request(self, energy_flow_wh):
+        """
+        Args:
+            energy_flow_wh (ndarray): Net energy per interval in Wh (production - demand)
+
+        Returns:
+            ndarray: Energy the battery is asked to take (+) or give (-) per interval
+        """
+        return energy_flow_wh
+
+    def reset_rows(self, n_intervals):
+        """
+        Args:
+            n_intervals (int): Length of the simulated series
+
+        Returns:
+            ndarray or None: Rows at which the battery is set back to its initial state
+        """
+        return None
+
+class GreedySelfConsumption(DispatchStrategy):
+    """Store every surplus, cover every deficit, never reset."""
+
+class DailyReset(DispatchStrategy):
+    """Greedy self-consumption with the battery reset at the start of every day."""
+
+    def __init__(self, day_starts):
+        """
+        Args:
+            day_starts (array-like): First row of every day, e.g. EnergyDataset.day_starts
+        """
+        self.day_starts = np.asarray(day_starts, dtype=np.int64)
+
+    def reset_rows(self, n_intervals):
+        return self.day_starts[self.day_starts < n_intervals]
+
+class PeakShaving(DispatchStrategy):
+    """
+    Keep grid import below a limit.
+
+    Surplus is stored as in greedy self-consumption, but the battery only
+    covers the part of a deficit above the import limit, saving its charge
+    for the peaks.
+    """
+
+    def __init__(self, import_limit_w):
+        """
+        Args:
+            import_limit_w (float): Grid import the battery does not try to avoid, in W
+        """
+        self.import_limit_w = import_limit_w
+
+    def battery_request(self, energy_flow_wh):
+        allowed_import_wh = self.import_limit_w * INTERVAL_HOURS
+        return np.where(energy_flow_wh > 0, energy_flow_wh, np.minimum(energy_flow_wh + allowed_import_wh, 0.0))
+
+def _dispatch_step(state, flow, request, capacity, battery):
+    """
+    Advance every scenario by one interval.
+
+    This is the rule the scan in simulate_dispatch() applies to whole
+    series: the request is capped at the power limits, the kept charge
+    changes by the stored part of it, the result is clipped to
+    [0, capacity], and everything the battery did not handle goes to the grid.
+
+    Args:
+        state (ndarray): Battery state per scenario in Wh
+        flow (float or ndarray): Net energy of the interval in Wh
+        request (float or ndarray): Energy the strategy asks the battery to take (+) or give (-)
+        capacity (ndarray): Battery capacity per scenario in Wh
+        battery (BatteryProperties): Losses and power limits
+
+    Returns:
+        tuple: (kept, new_state, grid) with the charge left after self-discharge,
+            the new state and the grid exchange (positive = export) in Wh
+    """
+    limited = battery.limit_request(request, capacity)
+    kept = battery.retention * state
+    target = kept + battery.stored_change(limited)
+    new_state = np.minimum(np.maximum(target, 0.0), capacity)
+    grid = (
+        (flow - limited)
+        + np.maximum(target - capacity, 0.0) / battery.charge_efficiency
+        - np.maximum(-target, 0.0) * battery.discharge_efficiency
+    )
+    return kept, new_state, grid
+
+def _step_losses(state, kept, new_state, battery):
+    """Conversion losses and self-discharge of one _dispatch_step() in Wh."""
+    change = new_state - kept
+    return (
+        change.clip(min=0.0) * (1 / battery.charge_efficiency - 1)
+        - change.clip(max=0.0) * (1 - battery.discharge_efficiency)
+        + state - kept
+    )
+
+def _reset_transfer(kept, initial, battery):
+    """
+    Energy a battery gives off when it is set from its kept charge to its initial state.
+
+    A charge above the initial state is discharged (with the discharge
+    efficiency), a charge below it is topped up (with the charge efficiency,
+    a negative transfer).
+    """
+    surplus = kept - initial
+    return np.where(surplus > 0, surplus * battery.discharge_efficiency, surplus / battery.charge_efficiency)
+
+def simulate_dispatch(energy_flow_wh, battery_capacity_wh, initial_state_wh, strategy=None, battery=None):
+    """
+    Battery state and the energy exchanged with the grid per interval.
+
+    Whatever the strategy does not send to the battery, whatever exceeds the
+    power limits, and whatever the battery cannot absorb (it is full) or
+    provide (it is empty), goes to the grid. The first row and the reset
+    rows only hold the initial state, so their whole flow goes to the grid.
+
+    Args:
+        energy_flow_wh (array-like): Net energy per interval in Wh (production - demand),
+            shape (n,) or (n, scenarios)
+        battery_capacity_wh (float or array-like): Battery capacity in Wh
+        initial_state_wh (float or array-like): Initial state of charge in Wh
+        strategy (DispatchStrategy, optional): How the battery is operated.
+            Defaults to greedy self-consumption.
+        battery (BatteryProperties, optional): Losses and power limits.
+            Defaults to an ideal battery.
+
+    Returns:
+        tuple: (state, grid) arrays shaped like the state, with the battery
+            state in Wh and the grid exchange in Wh (positive = export,
+            negative = import)
+    """
+    if strategy is None:
+        strategy = GreedySelfConsumption()
+    if battery is None:
+        battery = BatteryProperties()
+    flow = np.asarray(energy_flow_wh, dtype=np.float64)
+    capacity = np.asarray(battery_capacity_wh, dtype=np.float64)
+    request = strategy.battery_request(flow)
+    shift = battery.stored_change(battery.limit_request(request, capacity))
+    reset_rows = strategy.reset_rows(len(flow))
+
+    state = simulate_battery_soc(shift, capacity, initial_state_wh, reset_rows, battery.retention)
+    flow = np.broadcast_to(flow, state.shape)
+
+    # Replay every interval from the previous state with the same step as
+    # simulate_battery_batch(), all intervals at once
+    previous = np.empty_like(state)
+    previous[:1] = state[:1]
+    previous[1:] = state[:-1]
+    _, _, grid = _dispatch_step(previous, flow, np.broadcast_to(request, state.shape), capacity, battery)
+
+    bypass = np.zeros(len(flow), dtype=bool)
+    bypass[:1] = True
+    if reset_rows is not None:
+        bypass[reset_rows] = True
+    grid[bypass] = flow[bypass]
+
+    return state, grid
+
+def simulate_hybrid_dispatch(energy_flow_wh, daily_capacity_wh, seasonal_capacity_wh, daily_initial_wh,
+                             seasonal_initial_wh, daily_strategy=None, daily_battery=None,
+                             seasonal_strategy=None, seasonal_battery=None):
+    """
+    Two storage tiers in series: a short-duration battery and a seasonal store.
+
+    The daily battery takes every flow first. Whatever it cannot absorb or
+    provide is offered to the seasonal store, and only what neither tier
+    handles goes to the grid. When the daily strategy resets the daily
+    battery, the charge it still holds is handed on to the seasonal store
+    (or the charge it needs is drawn from it), so a reset loses no energy.
+    The daily battery does not depend on the seasonal store, so each tier
+    is one run of the vectorized kernel.
+
+    Capacities and initial states broadcast against each other, so
+    e.g. daily capacities of shape (a, 1) and seasonal capacities of shape
+    (1, b) with a flow of shape (n, 1, 1) sweep every combination at once.
+
+    Args:
+        energy_flow_wh (array-like): Net energy per interval in Wh (production - demand)
+        daily_capacity_wh (float or array-like): Capacity of the daily battery in Wh
+        seasonal_capacity_wh (float or array-like): Capacity of the seasonal store in Wh
+        daily_initial_wh (float or array-like): Initial state of the daily battery in Wh
+        seasonal_initial_wh (float or array-like): Initial state of the seasonal store in Wh
+        daily_strategy (DispatchStrategy, optional): Operation of the daily battery
+        daily_battery (BatteryProperties, optional): Losses and power limits of the daily battery
+        seasonal_strategy (DispatchStrategy, optional): Operation of the seasonal store
+        seasonal_battery (BatteryProperties, optional): Losses and power limits of the seasonal store
+
+    Returns:
+        tuple: (daily_state, seasonal_state, grid) in Wh, with the grid exchange
+            positive for export and negative for import
+    """
+    if daily_strategy is None:
+        daily_strategy = GreedySelfConsumption()
+    if daily_battery is None:
+        daily_battery = BatteryProperties()
+    daily_state, residual = simulate_dispatch(
+        energy_flow_wh, daily_capacity_wh, daily_initial_wh, daily_strategy, daily_battery
+    )
+
+    reset_rows = daily_strategy.reset_rows(len(residual))
+    if reset_rows is not None:
+        reset_rows = reset_rows[reset_rows > 0]
+        kept = daily_battery.retention * daily_state[reset_rows - 1]
+        residual[reset_rows] += _reset_transfer(kept, daily_state[reset_rows], daily_battery)
+
+    seasonal_state, grid = simulate_dispatch(
+        residual, seasonal_capacity_wh, seasonal_initial_wh, seasonal_strategy, seasonal_battery
+    )
+    return np.broadcast_to(daily_state, grid.shape), seasonal_state, grid
+
+def simulate_hybrid_batch(energy_flow_wh, daily_capacities_wh, seasonal_capacities_wh, daily_initial_percent=0,
+                          seasonal_initial_percent=50, daily_strategy=None, daily_battery=None,
+                          seasonal_strategy=None, seasonal_battery=None):
+    """
+    Grid totals of every combination of a daily battery and a seasonal store, in one pass.
+
+    The per-interval counterpart of simulate_hybrid_dispatch() for wide
+    sweeps: every interval advances the daily batteries (one per daily
+    capacity) and then the seasonal stores (one per combination) with the
+    same step as simulate_battery_batch(), so the cost hardly grows with
+    the number of combinations. As there, a reset of the daily battery
+    hands its remaining charge on to the seasonal store; a reset of the
+    seasonal store gives its charge up, which counts as a loss.
+
+    Args:
+        energy_flow_wh (array-like): Net energy per interval in Wh (production - demand)
+        daily_capacities_wh (array-like): Daily battery capacities in Wh
+        seasonal_capacities_wh (array-like): Seasonal store capacities in Wh
+        daily_initial_percent (float): Initial charge of the daily battery (0-100)
+        seasonal_initial_percent (float): Initial charge of the seasonal store (0-100)
+        daily_strategy (DispatchStrategy, optional): Operation of the daily battery
+        daily_battery (BatteryProperties, optional): Losses and power limits of the daily battery
+        seasonal_strategy (DispatchStrategy, optional): Operation of the seasonal store
+        seasonal_battery (BatteryProperties, optional): Losses and power limits of the seasonal store
+
+    Returns:
+        DataFrame: One row per combination (daily capacity major) with
+            'Daily_Capacity_Wh', 'Seasonal_Capacity_Wh', 'Grid_Import_Wh',
+            'Grid_Export_Wh', 'Grid_Dependency_Hours', 'Losses_Wh' (conversion,
+            self-discharge and charge given up at seasonal resets),
+            'Daily_Final_State_Wh' and 'Seasonal_Final_State_Wh'
+    """
+    if daily_strategy is None:
+        daily_strategy = GreedySelfConsumption()
+    if seasonal_strategy is None:
+        seasonal_strategy = GreedySelfConsumption()
+    if daily_battery is None:
+        daily_battery = BatteryProperties()
+    if seasonal_battery is None:
+        seasonal_battery = BatteryProperties()
+    flow = np.asarray(energy_flow_wh, dtype=np.float64)
+    daily_capacities = np.atleast_1d(np.asarray(daily_capacities_wh, dtype=np.float64))
+    seasonal_capacities = np.atleast_1d(np.asarray(seasonal_capacities_wh, dtype=np.float64))[None, :]
+
+    daily_request = daily_strategy.battery_request(flow)
+    is_reset = {}
+    for tier, strategy in (('daily', daily_strategy), ('seasonal', seasonal_strategy)):
+        is_reset[tier] = np.zeros(len(flow), dtype=bool)
+        reset_rows = strategy.reset_rows(len(flow))
+        if reset_rows is not None:
+            is_reset[tier][reset_rows] = True
+
+    daily_initial = daily_capacities * (daily_initial_percent / 100)
+    seasonal_initial = np.broadcast_to(seasonal_capacities * (seasonal_initial_percent / 100),
+                                       (len(daily_capacities), seasonal_capacities.shape[1]))
+    daily_state = daily_initial
+    seasonal_state = seasonal_initial
+    grid_import = np.zeros(seasonal_initial.shape)
+    grid_export = np.zeros(seasonal_initial.shape)
+    import_intervals = np.zeros(seasonal_initial.shape, dtype=np.int64)
+    daily_losses = np.zeros(daily_initial.shape)
+    seasonal_losses = np.zeros(seasonal_initial.shape)
+
+    # The first row and the reset rows of a tier only hold its initial
+    # state and pass the whole flow on (as in simulate_dispatch())
+    for i in range(len(flow)):
+        if i == 0 or is_reset['daily'][i]:
+            residual = np.full_like(daily_initial, flow[i])
+            if i > 0:
+                kept = daily_battery.retention * daily_state
+                transfer = _reset_transfer(kept, daily_initial, daily_battery)
+                residual += transfer
+                daily_losses += daily_state - daily_initial - transfer
+            daily_state = daily_initial
+        else:
+            kept, new_state, residual = _dispatch_step(
+                daily_state, flow[i], daily_request[i], daily_capacities, daily_battery
+            )
+            daily_losses += _step_losses(daily_state, kept, new_state, daily_battery)
+            daily_state = new_state
+
+        residual = residual[:, None]
+        if i == 0 or is_reset['seasonal'][i]:
+            seasonal_losses += seasonal_state - seasonal_initial
+            seasonal_state = seasonal_initial
+            grid = np.broadcast_to(residual, seasonal_state.shape)
+        else:
+            kept, new_state, grid = _dispatch_step(
+                seasonal_state, residual, seasonal_strategy.battery_request(residual),
+                seasonal_capacities, seasonal_battery
+            )
+            seasonal_losses += _step_losses(seasonal_state, kept, new_state, seasonal_battery)
+            seasonal_state = new_state
+
+        grid_export += grid.clip(min=0.0)
+        grid_import -= grid.clip(max=0.0)
+        import_intervals += grid < 0
+
+    return pd.DataFrame({
+        'Daily_Capacity_Wh': np.repeat(daily_capacities, seasonal_capacities.shape[1]),
+        'Seasonal_Capacity_Wh': np.tile(seasonal_capacities[0], len(daily_capacities)),
+        'Grid_Import_Wh': grid_import.ravel(),
+        'Grid_Export_Wh': grid_export.ravel(),
+        'Grid_Dependency_Hours': import_intervals.ravel() * INTERVAL_HOURS,
+        'Losses_Wh': (daily_losses[:, None] + seasonal_losses).ravel(),
+        'Daily_Final_State_Wh': np.repeat(daily_state, seasonal_capacities.shape[1]),
+        'Seasonal_Final_State_Wh': seasonal_state.ravel(),
+    })
+
+def cyclic_initial_state(energy_flow_wh, battery_capacity_wh, strategy=None, battery=None, preferred_state_wh=None):
+    """
+    Initial state for which the battery ends the series where it started.
+
+    This is the periodic steady state of a battery that runs the same year
+    over and over, so the results do not depend on an assumed starting charge.
+    The steps of the whole series are combined into a single clamped affine
+    step s -> clip(retention * s + shift, lower, upper), whose fixed point is
+    found directly: shift / (1 - retention) clipped to [lower, upper] with
+    self-discharge, otherwise the full (empty) battery for a net gain (loss)
+    over the series.
+
+    Without self-discharge and with a net zero change every state in
+    [lower, upper] is periodic; the one closest to preferred_state_wh is
+    returned.
+
+    Args:
+        energy_flow_wh (array-like): Net energy per interval in Wh (production - demand),
+            shape (n,) or (n, scenarios)
+        battery_capacity_wh (float or array-like): Battery capacity in Wh
+        strategy (DispatchStrategy, optional): How the battery is operated. Strategies
+            with reset rows have no steady state of their own and are not supported.
+        battery (BatteryProperties, optional): Losses and power limits
+        preferred_state_wh (float or array-like, optional): Tie-breaker for the lossless
+            case. Defaults to half the capacity.
+
+    Returns:
+        ndarray: Initial (and final) state in Wh per scenario
+    """
+    if strategy is None:
+        strategy = GreedySelfConsumption()
+    if battery is None:
+        battery = BatteryProperties()
+    flow = np.asarray(energy_flow_wh, dtype=np.float64)
+    capacity = np.asarray(battery_capacity_wh, dtype=np.float64)
+    if strategy.reset_rows(len(flow)) is not None:
+        raise ValueError("Strategies that reset the battery have no cyclic steady state")
+    if preferred_state_wh is None:
+        preferred_state_wh = capacity / 2
+    if len(flow) < 2:
+        return np.clip(np.asarray(preferred_state_wh, dtype=np.float64), 0.0, capacity)
+
+    # Every row after the first applies its flow (the first only holds the initial state)
+    shift = battery.stored_change(battery.limit_request(strategy.battery_request(flow), capacity))[1:]
+    shape = np.broadcast_shapes(shift.shape, capacity.shape)
+    retention, shift, lower, upper = _reduce_clamps(
+        np.broadcast_to(battery.retention, shape),
+        np.broadcast_to(shift, shape),
+        np.zeros(shape),
+        np.broadcast_to(capacity, shape)
+    )
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        fixed_point = np.where(
+            retention < 1.0,
+            shift / (1.0 - retention),
+            np.where(shift > 0, np.inf, np.where(shift < 0, -np.inf, preferred_state_wh))
+        )
+    return np.clip(fixed_point, lower, upper)
+
+def _scan_batch_totals(flow, capacities, initial_state, strategy, battery, return_traces):
+    """
+    Running totals of simulate_battery_batch() from the scan kernel.
+
+    The scenarios are simulated SCAN_BATCH_SIZE at a time, and every total
+    is reduced from the whole state and grid series of a batch.
+    """
+    n = len(flow)
+    bypass = np.zeros(n, dtype=bool)
+    bypass[0] = True
+    reset_rows = strategy.reset_rows(n)
+    if reset_rows is not None:
+        bypass[reset_rows] = True
+    resets = np.flatnonzero(bypass[1:]) + 1
+    stepped = ~bypass[1:, None]
+
+    totals = {name: np.zeros(len(capacities)) for name in (
+        'final', 'minimum', 'maximum', 'state_sum', 'charged', 'discharged', 'grid_import', 'grid_export',
+        'import_intervals', 'losses', 'intervals_empty', 'intervals_full'
+    )}
+    totals['traces'] = np.empty((n, len(capacities))) if return_traces else None
+
+    for start in range(0, len(capacities), SCAN_BATCH_SIZE):
+        columns = slice(start, start + SCAN_BATCH_SIZE)
+        capacity = capacities[columns]
+        batch_battery = battery.select_scenarios(columns, len(capacities))
+        state, grid = simulate_dispatch(flow[:, None], capacity[None, :], initial_state[columns], strategy,
+                                        batch_battery)
+
+        # Every row after the first that is not a reset is one _dispatch_step()
+        previous = state[:-1]
+        kept = batch_battery.retention * previous
+        change = np.where(stepped, state[1:] - kept, 0.0)
+        losses = np.where(stepped, _step_losses(previous, kept, state[1:], batch_battery), 0.0).sum(axis=0)
+        # Charge given up (or added) at the resets
+        losses += (state[resets - 1] - initial_state[columns]).sum(axis=0)
+
+        totals['final'][columns] = state[-1]
+        totals['minimum'][columns] = state.min(axis=0)
+        totals['maximum'][columns] = state.max(axis=0)
+        totals['state_sum'][columns] = state.sum(axis=0)
+        totals['charged'][columns] = change.clip(min=0.0).sum(axis=0)
+        totals['discharged'][columns] = -change.clip(max=0.0).sum(axis=0)
+        totals['grid_import'][columns] = -grid.clip(max=0.0).sum(axis=0)
+        totals['grid_export'][columns] = grid.clip(min=0.0).sum(axis=0)
+        totals['import_intervals'][columns] = (grid < 0).sum(axis=0)
+        totals['losses'][columns] = losses
+        totals['intervals_empty'][columns] = (state <= 0).sum(axis=0)
+        totals['intervals_full'][columns] = (state >= capacity).sum(axis=0)
+        if return_traces:
+            totals['traces'][:, columns] = state
+    return totals
+
+def _loop_batch_totals(flow, capacities, initial_state, strategy, battery, return_traces):
+    """
+    Running totals of simulate_battery_batch() from one pass over the intervals.
+
+    Every interval advances all scenarios at once, so the cost hardly grows
+    with the number of scenarios and only the totals are kept in memory.
+    """
+    request = strategy.battery_request(flow)
+    is_reset = np.zeros(len(flow), dtype=bool)
+    reset_rows = strategy.reset_rows(len(flow))
+    if reset_rows is not None:
+        is_reset[reset_rows] = True
+
+    state = initial_state
+    minimum_state = np.full_like(state, np.inf)
+    maximum_state = np.full_like(state, -np.inf)
+    state_sum = np.zeros_like(state)
+    charged = np.zeros_like(state)
+    discharged = np.zeros_like(state)
+    grid_import = np.zeros_like(state)
+    grid_export = np.zeros_like(state)
+    import_intervals = np.zeros(len(state), dtype=np.int64)
+    losses = np.zeros_like(state)
+    intervals_empty = np.zeros(len(state), dtype=np.int64)
+    intervals_full = np.zeros(len(state), dtype=np.int64)
+
+    traces = None
+    if return_traces:
+        traces = np.empty((len(flow), len(capacities)))
+
+    for i in range(len(flow)):
+        if i == 0 or is_reset[i]:
+            # The first row and the reset rows only hold the initial state,
+            # their whole flow goes to the grid (as in simulate_dispatch());
+            # the charge given up (or added) at a reset counts as a loss
+            losses += state - initial_state
+            state = initial_state
+            grid = np.full_like(state, flow[i])
+        else:
+            kept, new_state, grid = _dispatch_step(state, flow[i], request[i], capacities, battery)
+            change = new_state - kept
+            charged += change.clip(min=0.0)
+            discharged -= change.clip(max=0.0)
+            losses += _step_losses(state, kept, new_state, battery)
+            state = new_state
+
+        grid_export += grid.clip(min=0.0)
+        grid_import -= grid.clip(max=0.0)
+        import_intervals += grid < 0
+        np.minimum(minimum_state, state, out=minimum_state)
+        np.maximum(maximum_state, state, out=maximum_state)
+        state_sum += state
+        intervals_empty += state <= 0
+        intervals_full += state >= capacities
+        if traces is not None:
+            traces[i] = state
+
+    if len(flow) == 0:
+        minimum_state, maximum_state = initial_state, initial_state
+    return {
+        'final': state, 'minimum': minimum_state, 'maximum': maximum_state, 'state_sum': state_sum,
+        'charged': charged, 'discharged': discharged, 'grid_import': grid_import, 'grid_export': grid_export,
+        'import_intervals': import_intervals, 'losses': losses, 'intervals_empty': intervals_empty,
+        'intervals_full': intervals_full, 'traces': traces,
+    }
+
+def simulate_battery_batch(energy_flow_wh, capacities_wh, initial_percents=50, return_traces=False, strategy=None,
+                           battery=None):
+    """
+    Simulate many battery scenarios together.
+
+    Up to SCAN_MAX_SCENARIOS scenarios run on the scan kernel
+    (simulate_dispatch()), SCAN_BATCH_SIZE at a time, whose cost grows
+    with the number of scenarios. Wider sweeps take a single pass over the
+    data instead: each interval updates the whole vector of battery states
+    at once, so hundreds of capacities cost about as much as one pass over
+    the time series, and unless traces are requested only a few running
+    totals per scenario are kept. Both paths apply the same step rule and
+    return the same KPIs.
+
+    Losses_Wh holds the conversion losses and self-discharge, plus the
+    charge a strategy with resets gives up at every reset (negative if the
+    reset adds charge), so production - demand equals the change of the
+    stored charge plus export minus import plus losses.
+
+    Args:
+        energy_flow_wh (array-like): Energy into the battery per interval in Wh
+            (positive = surplus/charging, negative = deficit/discharging)
+        capacities_wh (array-like): Battery capacity per scenario in Wh
+        initial_percents (float or array-like): Initial charge percentage (0-100),
+            either one value for all scenarios or one per scenario
+        return_traces (bool): Also return the full state of charge traces
+        strategy (DispatchStrategy, optional): How the battery is operated.
+            Defaults to greedy self-consumption.
+        battery (BatteryProperties, optional): Losses and power limits, with
+            scalar values or one value per scenario. Defaults to an ideal battery.
+
+    Returns:
+        DataFrame: One row of summary KPIs per scenario. If return_traces is
+            True, a tuple (kpis, traces) where traces is an ndarray of shape
+            (intervals, scenarios) with the battery state in Wh.
+    """
+    if strategy is None:
+        strategy = GreedySelfConsumption()
+    if battery is None:
+        battery = BatteryProperties()
+    flow = np.asarray(energy_flow_wh, dtype=np.float64)
+    capacities, initial_percents = np.broadcast_arrays(
+        np.atleast_1d(np.asarray(capacities_wh, dtype=np.float64)),
+        np.atleast_1d(np.asarray(initial_percents, dtype=np.float64))
+    )
+    capacities = capacities.copy()
+    initial_percents = initial_percents.copy()
+    initial_state = capacities * (initial_percents / 100)
+
+    if 0 < len(flow) and len(capacities) <= SCAN_MAX_SCENARIOS:
+        totals = _scan_batch_totals(flow, capacities, initial_state, strategy, battery, return_traces)
+    else:
+        totals = _loop_batch_totals(flow, capacities, initial_state, strategy, battery, return_traces)
+
+    n = max(len(flow), 1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        kpis = pd.DataFrame({
+            'Capacity_Wh': capacities,
+            'Initial_Percent': initial_percents,
+            'Initial_State_Wh': initial_state,
+            'Final_State_Wh': totals['final'],
+            'Min_State_Wh': totals['minimum'],
+            'Max_State_Wh': totals['maximum'],
+            'Mean_State_Percent': totals['state_sum'] / n / capacities * 100,
+            'Charged_Wh': totals['charged'],
+            'Discharged_Wh': totals['discharged'],
+            'Grid_Import_Wh': totals['grid_import'],
+            'Grid_Export_Wh': totals['grid_export'],
+            'Grid_Dependency_Hours': totals['import_intervals'] * INTERVAL_HOURS,
+            'Losses_Wh': totals['losses'],
+            'Hours_Empty': totals['intervals_empty'] * INTERVAL_HOURS,
+            'Hours_Full': totals['intervals_full'] * INTERVAL_HOURS,
+            'Equivalent_Full_Cycles': totals['discharged'] / capacities,
+        })
+
+    if return_traces:
+        return kpis, totals['traces']
+    return kpis
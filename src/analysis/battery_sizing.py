@@ -5,10 +5,12 @@ from datetime import datetime
 import os
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from utils.config import (CLEANED_DATA_PATH, IMAGES_DIR, REPORTS_DIR, 
-                         MORNING_START, EVENING_START, ensure_directories)
+from utils.config import (IMAGES_DIR, REPORTS_DIR, MORNING_START, EVENING_START, ensure_directories)
+from utils.dataset import EnergyDataset
+from analysis.daily_sizing import daily_sizing_table, sizing_statistics
+from analysis.capacity_solver import solve_minimum_capacity
 
-def calculate_battery_size():
+def calculate_battery_size(dataset=None):
     """
     Calculate the required battery capacity based on realistic solar production times:
     Using 8 AM to 6 PM as day period based on actual solar production analysis
@@ -17,67 +19,24 @@ def calculate_battery_size():
     ensure_directories()
     
     # Read the cleaned data
-    df = pd.read_csv(CLEANED_DATA_PATH)
-    print(f"Loaded data with {len(df)} rows")
-    
-    # Convert Time to datetime
-    df['Time'] = pd.to_datetime(df['Time'])
-    
-    # Convert negative production values to positive
-    df['Pprod(W)'] = df['Pprod(W)'].abs()
-    
-    # Calculate energy in Wh (15-minute intervals)
-    df['Energy_Production_Wh'] = df['Pprod(W)'] * 0.25
-    df['Energy_Demand_Wh'] = df['Pdemand(W)'] * 0.25
-    df['Energy_Net_Wh'] = df['Energy_Production_Wh'] - df['Energy_Demand_Wh']
+    if dataset is None:
+        dataset = EnergyDataset.load()
+    print(f"Loaded data with {len(dataset)} rows")
     
     # Define the realistic day/night boundaries based on solar production analysis
-    morning_start = 8  # 7:53 AM (average time when solar panels start producing)
-    evening_start = 18  # 6:17 PM (average time when solar panels stop producing)
-    
-    # Add time of day indicators
-    df['Hour'] = df['Time'].dt.hour
-    df['IsDay'] = (df['Hour'] >= morning_start) & (df['Hour'] < evening_start)
-    
-    # Group by date and calculate day/night energy
-    daily_data = []
+    morning_start = MORNING_START  # 7:53 AM (average time when solar panels start producing)
+    evening_start = EVENING_START  # 6:17 PM (average time when solar panels stop producing)
     
-    # Get unique dates
-    unique_dates = df['Time'].dt.date.unique()
-    print(f"Processing {len(unique_dates)} unique dates")
-    
-    for date in unique_dates:
-        day_data = df[df['Time'].dt.date == date]
-        
-        # Day energy (excess energy that could be stored)
-        day_excess = day_data[day_data['IsDay']]['Energy_Net_Wh'].sum()
-        day_excess = max(0, day_excess)  # Only consider positive excess during day
-        
-        # Night energy (deficit that needs battery)
-        night_deficit = abs(min(0, day_data[~day_data['IsDay']]['Energy_Net_Wh'].sum()))
-        
-        # Track which date this is
-        daily_data.append({
-            'Date': date,
-            'Day_Excess_Wh': day_excess,
-            'Night_Deficit_Wh': night_deficit
-        })
-    
-    # Convert to DataFrame
-    daily_df = pd.DataFrame(daily_data)
-    
-    # Calculate the ideal battery size for each day
-    # For each day, we need enough capacity to store the daytime excess
-    # and enough to cover the nighttime deficit
-    daily_df['Required_Capacity_Wh'] = daily_df.apply(
-        lambda row: min(row['Day_Excess_Wh'], row['Night_Deficit_Wh']), axis=1
-    )
+    # Day excess, night deficit and required capacity for every date
+    print(f"Processing {len(dataset.dates)} unique dates")
+    daily_df = daily_sizing_table(dataset, morning_start, evening_start)
     
     # Get statistics
-    mean_capacity = daily_df['Required_Capacity_Wh'].mean()
-    median_capacity = daily_df['Required_Capacity_Wh'].median()
-    p90_capacity = daily_df['Required_Capacity_Wh'].quantile(0.9)
-    max_capacity = daily_df['Required_Capacity_Wh'].max()
+    stats = sizing_statistics(daily_df)
+    mean_capacity = stats['mean']
+    median_capacity = stats['median']
+    p90_capacity = stats['p90']
+    max_capacity = stats['max']
     
     print(f"Results:")
     print(f"Mean required capacity: {mean_capacity/1000:.2f} kWh")
@@ -85,13 +44,17 @@ def calculate_battery_size():
     print(f"90th percentile capacity: {p90_capacity/1000:.2f} kWh")
     print(f"Maximum required capacity: {max_capacity/1000:.2f} kWh")
     
+    # Exact capacity from the 15-minute flows, battery empty every morning
+    exact_capacity = solve_minimum_capacity(dataset, mode='daily', reset_hour=morning_start)
+    print(f"Exact minimum capacity (daily operation): {exact_capacity/1000:.2f} kWh")
+    
     # Select summer and winter solstice (or nearby dates)
     summer_solstice = pd.to_datetime('2023-06-21').date()
     winter_solstice = pd.to_datetime('2023-12-21').date()
     
     # Find closest dates
-    summer_date = min(unique_dates, key=lambda x: abs((x - summer_solstice).days))
-    winter_date = min(unique_dates, key=lambda x: abs((x - winter_solstice).days))
+    summer_date = dataset.nearest_date(summer_solstice)
+    winter_date = dataset.nearest_date(winter_solstice)
     
     # Get required capacity for these days
     summer_capacity = daily_df[daily_df['Date'] == summer_date]['Required_Capacity_Wh'].values[0]
@@ -142,7 +105,8 @@ def calculate_battery_size():
         f.write(f"Mean Required Capacity: {mean_capacity/1000:.2f} kWh\n")
         f.write(f"Median Required Capacity: {median_capacity/1000:.2f} kWh\n")
         f.write(f"90th Percentile Capacity: {p90_capacity/1000:.2f} kWh\n")
-        f.write(f"Maximum Required Capacity: {max_capacity/1000:.2f} kWh\n\n")
+        f.write(f"Maximum Required Capacity: {max_capacity/1000:.2f} kWh\n")
+        f.write(f"Exact Minimum Capacity (15-minute flows, empty at {morning_start}AM): {exact_capacity/1000:.2f} kWh\n\n")
         
         f.write("Seasonal Variation:\n")
         f.write(f"Summer Solstice (approx. {summer_date}): {summer_capacity/1000:.2f} kWh\n")
@@ -3,74 +3,65 @@ import matplotlib.pyplot as plt
 import numpy as np
 from datetime import datetime
 import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.config import MORNING_START, EVENING_START
+from utils.dataset import EnergyDataset
+from analysis.daily_sizing import daily_sizing_tables, sizing_statistics
 
-def compare_battery_sizing_approaches():
+def format_hour(hour):
+    """Format decimal hours as HH:MM."""
+    minutes = int(round(hour * 60))
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+def compare_battery_sizing_approaches(dataset=None, boundaries=None):
     """
     Compare the battery sizing results with different day/night boundaries:
     1. Original: 6 AM to 6 PM (fixed)
     2. Realistic: 8 AM to 6 PM (based on actual solar production analysis)
+    
+    All boundaries are evaluated together from the per-day cumulative energy,
+    so a sensitivity sweep over many boundaries costs about as much as one.
+    
+    Args:
+        dataset (EnergyDataset, optional): Preloaded dataset. If None, it is loaded from disk.
+        boundaries (list, optional): (morning_start, evening_start) pairs in decimal hours
+            to compare instead of the two approaches above
     """
     print("Comparing battery sizing approaches...")
     
     # Read the cleaned data
-    df = pd.read_csv('cleaned_data.csv')
-    print(f"Loaded data with {len(df)} rows")
-    
-    # Convert Time to datetime
-    df['Time'] = pd.to_datetime(df['Time'])
-    
-    # Convert negative production values to positive
-    df['Pprod(W)'] = df['Pprod(W)'].abs()
-    
-    # Calculate energy in Wh (15-minute intervals)
-    df['Energy_Production_Wh'] = df['Pprod(W)'] * 0.25
-    df['Energy_Demand_Wh'] = df['Pdemand(W)'] * 0.25
-    df['Energy_Net_Wh'] = df['Energy_Production_Wh'] - df['Energy_Demand_Wh']
-    
-    # Define the realistic day/night boundaries based on solar production analysis
-    morning_start = 8  # 7:53 AM (average time when solar panels start producing)
-    evening_start = 18  # 6:17 PM (average time when solar panels stop producing)
-    
-    # Add time of day indicators
-    df['Hour'] = df['Time'].dt.hour
-    df['IsDay'] = (df['Hour'] >= morning_start) & (df['Hour'] < evening_start)
-        
-        # Group by date and calculate day/night energy
-        daily_data = []
-        
-        # Get unique dates
-        unique_dates = df['Time'].dt.date.unique()
-        
-        for date in unique_dates:
-            day_data = df[df['Time'].dt.date == date]
-            
-            # Day energy (excess energy that could be stored)
-            day_excess = day_data[day_data['IsDay']]['Energy_Net_Wh'].sum()
-            day_excess = max(0, day_excess)  # Only consider positive excess during day
-            
-            # Night energy (deficit that needs battery)
-            night_deficit = abs(min(0, day_data[~day_data['IsDay']]['Energy_Net_Wh'].sum()))
-            
-            # Track which date this is
-            daily_data.append({
-                'Date': date,
-                'Day_Excess_Wh': day_excess,
-                'Night_Deficit_Wh': night_deficit
-            })
-        
-        # Convert to DataFrame
-        daily_df = pd.DataFrame(daily_data)
-        
-        # Calculate the ideal battery size for each day
-        daily_df['Required_Capacity_Wh'] = daily_df.apply(
-            lambda row: min(row['Day_Excess_Wh'], row['Night_Deficit_Wh']), axis=1
-        )
+    if dataset is None:
+        dataset = EnergyDataset.load()
+    print(f"Loaded data with {len(dataset)} rows")
+    
+    # Day/night boundaries to compare
+    if boundaries is None:
+        approaches = [
+            {'name': 'Original (6AM-6PM)', 'morning_start': 6, 'evening_start': 18},
+            {'name': 'Realistic (8AM-6PM)', 'morning_start': MORNING_START, 'evening_start': EVENING_START}
+        ]
+    else:
+        approaches = [
+            {'name': f"{format_hour(m)}-{format_hour(e)}", 'morning_start': m, 'evening_start': e}
+            for m, e in boundaries
+        ]
+    
+    # Day excess, night deficit and required capacity for every date and approach
+    daily_tables = daily_sizing_tables(
+        dataset, [(a['morning_start'], a['evening_start']) for a in approaches]
+    )
+    
+    results = []
+    for approach, daily_df in zip(approaches, daily_tables):
+        print(f"\nAnalyzing approach: {approach['name']}")
         
         # Get statistics
-        mean_capacity = daily_df['Required_Capacity_Wh'].mean()
-        median_capacity = daily_df['Required_Capacity_Wh'].median()
-        p90_capacity = daily_df['Required_Capacity_Wh'].quantile(0.9)
-        max_capacity = daily_df['Required_Capacity_Wh'].max()
+        stats = sizing_statistics(daily_df)
+        mean_capacity = stats['mean']
+        median_capacity = stats['median']
+        p90_capacity = stats['p90']
+        max_capacity = stats['max']
         
         # Store results
         results.append({
@@ -107,7 +98,7 @@ def compare_battery_sizing_approaches():
     plt.xlabel('Approach')
     plt.ylabel('Capacity (kWh)')
     plt.title('Mean and Median Battery Capacity')
-    plt.xticks(x, approaches_names)
+    plt.xticks(x, approaches_names, rotation=90 if len(results) > 4 else 0)
     plt.legend()
     plt.grid(axis='y')
     
@@ -121,7 +112,7 @@ def compare_battery_sizing_approaches():
     plt.xlabel('Approach')
     plt.ylabel('Capacity (kWh)')
     plt.title('90th Percentile and Maximum Battery Capacity')
-    plt.xticks(x, approaches_names)
+    plt.xticks(x, approaches_names, rotation=90 if len(results) > 4 else 0)
     plt.legend()
     plt.grid(axis='y')
     
@@ -161,9 +152,12 @@ def compare_battery_sizing_approaches():
         f.write("Battery Sizing Comparison Report\n")
         f.write("=" * 50 + "\n\n")
         
-        f.write("This report compares two approaches to battery sizing:\n")
-        f.write("1. Original: Using fixed 6 AM to 6 PM as day period\n")
-        f.write("2. Realistic: Using 8 AM to 6 PM based on actual solar production analysis\n\n")
+        if boundaries is None:
+            f.write("This report compares two approaches to battery sizing:\n")
+            f.write("1. Original: Using fixed 6 AM to 6 PM as day period\n")
+            f.write("2. Realistic: Using 8 AM to 6 PM based on actual solar production analysis\n\n")
+        else:
+            f.write(f"This report compares {len(results)} day/night boundaries for battery sizing.\n\n")
         
         f.write("Summary of Results:\n")
         f.write("-" * 50 + "\n")
@@ -173,29 +167,31 @@ def compare_battery_sizing_approaches():
         for result in results:
             f.write(f"{result['Approach']:<25} {result['Mean_Capacity_kWh']:<15.2f} {result['Median_Capacity_kWh']:<15.2f} {result['P90_Capacity_kWh']:<15.2f} {result['Max_Capacity_kWh']:<15.2f}\n")
         
-        f.write("\n\nAnalysis and Implications:\n")
-        f.write("-" * 50 + "\n")
-        capacity_difference = results[1]['P90_Capacity_kWh'] - results[0]['P90_Capacity_kWh']
-        percent_increase = (capacity_difference / results[0]['P90_Capacity_kWh']) * 100
-        
-        f.write(f"The realistic approach (8 AM - 6 PM) results in a {capacity_difference:.2f} kWh ({percent_increase:.1f}%) ")
-        if capacity_difference > 0:
-            f.write("increase in the recommended battery capacity compared to the original approach.\n\n")
-        else:
-            f.write("decrease in the recommended battery capacity compared to the original approach.\n\n")
-        
-        f.write("This difference is due to the realistic approach accounting for the fact that:\n")
-        f.write("- Solar panels don't produce significant power until around 8 AM on average\n")
-        f.write("- This reduces the effective solar production window by 2 hours each day\n")
-        f.write("- Less daytime for production means more energy must be stored for nighttime use\n\n")
-        
-        f.write("Seasonal Variations:\n")
-        f.write("- Winter months show the largest difference between the two approaches\n")
-        f.write("- Summer months show smaller differences due to longer daylight hours\n\n")
-        
-        f.write("Recommendation:\n")
-        f.write("The realistic approach provides a more accurate battery sizing recommendation ")
-        f.write("because it's based on actual solar production patterns rather than arbitrary fixed times.\n")
+        # The discussion below is specific to the original vs realistic comparison
+        if boundaries is None:
+            f.write("\n\nAnalysis and Implications:\n")
+            f.write("-" * 50 + "\n")
+            capacity_difference = results[1]['P90_Capacity_kWh'] - results[0]['P90_Capacity_kWh']
+            percent_increase = (capacity_difference / results[0]['P90_Capacity_kWh']) * 100
+            
+            f.write(f"The realistic approach (8 AM - 6 PM) results in a {capacity_difference:.2f} kWh ({percent_increase:.1f}%) ")
+            if capacity_difference > 0:
+                f.write("increase in the recommended battery capacity compared to the original approach.\n\n")
+            else:
+                f.write("decrease in the recommended battery capacity compared to the original approach.\n\n")
+            
+            f.write("This difference is due to the realistic approach accounting for the fact that:\n")
+            f.write("- Solar panels don't produce significant power until around 8 AM on average\n")
+            f.write("- This reduces the effective solar production window by 2 hours each day\n")
+            f.write("- Less daytime for production means more energy must be stored for nighttime use\n\n")
+            
+            f.write("Seasonal Variations:\n")
+            f.write("- Winter months show the largest difference between the two approaches\n")
+            f.write("- Summer months show smaller differences due to longer daylight hours\n\n")
+            
+            f.write("Recommendation:\n")
+            f.write("The realistic approach provides a more accurate battery sizing recommendation ")
+            f.write("because it's based on actual solar production patterns rather than arbitrary fixed times.\n")
     
     print("\nComparison complete! Results saved to 'battery_sizing_comparison.png' and 'battery_sizing_comparison.txt'")
     return results
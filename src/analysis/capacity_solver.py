@@ -0,0 +1,254 @@
+import numpy as np
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.config import MORNING_START
+from utils.dataset import EnergyDataset
+from analysis.battery_simulation import simulate_battery_soc
+from analysis.degradation import rainflow_decomposition
+
+SIZING_MODES = ('daily', 'continuous', 'cyclic')
+
+def reset_segment_starts(dataset, reset_hour=MORNING_START):
+    """
+    First row of every daily battery cycle.
+
+    In daily operation the battery is empty at reset_hour and serves the
+    surplus of the day to the following night. A cycle runs from reset_hour
+    on one day to reset_hour on the next; the rows before the first reset
+    form a cycle of their own.
+
+    Args:
+        dataset (EnergyDataset): Dataset to segment
+        reset_hour (float): Hour of the day at which the battery is empty
+
+    Returns:
+        ndarray: Sorted row positions, starting with 0
+    """
+    if len(dataset) == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    after_reset = dataset.time_of_day >= reset_hour
+    new_day = np.concatenate(([True], dataset.day_index[1:] != dataset.day_index[:-1]))
+    crossed = after_reset & (new_day | ~np.concatenate(([False], after_reset[:-1])))
+    crossed[0] = True
+    return np.flatnonzero(crossed)
+
+def _segment_ids(n, segment_starts):
+    if segment_starts is None:
+        return np.zeros(n, dtype=np.int64), np.zeros(1, dtype=np.int64)
+    segment_starts = np.asarray(segment_starts, dtype=np.int64)
+    if len(segment_starts) == 0 or segment_starts[0] != 0:
+        raise ValueError("segment_starts must start at row 0")
+    ids = np.zeros(n, dtype=np.int64)
+    ids[segment_starts[1:]] = 1
+    return np.cumsum(ids), segment_starts
+
+def minimum_capacity_per_segment(energy_flow_wh, segment_starts=None):
+    """
+    Smallest battery that serves as much demand as an unlimited one, per segment.
+
+    The battery starts every segment empty. With an unlimited battery the
+    state is the running sum of the flows, lifted whenever it would go below
+    zero (that lift is unserved energy no battery could avoid). The charge
+    that is still useful at a row is capped by the largest drawdown that
+    follows it within the segment; the capacity needed is the largest such
+    useful charge. Both parts are running minima of the cumulative flow, so
+    the whole series is solved in O(n) without simulating.
+
+    If the unlimited battery serves all demand, the result is the smallest
+    capacity with zero unserved energy.
+
+    Args:
+        energy_flow_wh (array-like): Energy into the battery per interval in Wh
+            (positive = surplus, negative = deficit). Every interval is applied.
+        segment_starts (array-like, optional): First row of every segment (starting
+            with 0), e.g. from reset_segment_starts(). Defaults to one segment.
+
+    Returns:
+        ndarray: Required capacity in Wh for every segment
+    """
+    flow = np.asarray(energy_flow_wh, dtype=np.float64)
+    ids, segment_starts = _segment_ids(len(flow), segment_starts)
+    if len(flow) == 0:
+        return np.zeros(0)
+
+    # Cumulative flow within every segment
+    cumulative = np.cumsum(flow)
+    cumulative -= (cumulative - flow)[segment_starts][ids]
+
+    # Offsetting each segment by a multiple of the value range lets one
+    # running minimum over the whole series restart at every segment
+    span = cumulative.max() - cumulative.min() + 1.0
+    offset = ids * span
+    lowest_before = np.minimum(np.minimum.accumulate(cumulative - offset) + offset, 0.0)
+    lowest_after = np.minimum.accumulate((cumulative + offset)[::-1])[::-1] - offset
+
+    # State of an unlimited battery and the drawdown still ahead of it
+    unlimited_state = cumulative - lowest_before
+    future_need = cumulative - lowest_after
+    useful = np.minimum(unlimited_state, future_need)
+
+    return np.maximum.reduceat(useful, segment_starts)
+
+def minimum_cyclic_capacity(energy_flow_wh):
+    """
+    Smallest battery with zero unserved energy when the series repeats.
+
+    The battery ends the period where it started (e.g. a year of seasonal
+    storage repeating every year). This is the sequent peak method: the
+    largest drop of the cumulative flow below its running peak, taken over
+    two consecutive periods so that drawdowns across the period boundary are
+    included.
+
+    Args:
+        energy_flow_wh (array-like): Energy into the battery per interval in Wh
+
+    Returns:
+        float: Required capacity in Wh, or inf if the period has a net deficit
+            (no battery can then serve all demand)
+    """
+    flow = np.asarray(energy_flow_wh, dtype=np.float64)
+    if len(flow) == 0:
+        return 0.0
+    if flow.sum() < 0:
+        return np.inf
+
+    cumulative = np.concatenate(([0.0], np.cumsum(np.concatenate((flow, flow)))))
+    return float((np.maximum.accumulate(cumulative) - cumulative).max())
+
+def unserved_energy(energy_flow_wh, capacities_wh, segment_starts=None):
+    """
+    Unserved energy of batteries that start every segment empty.
+
+    Args:
+        energy_flow_wh (array-like): Energy into the battery per interval in Wh
+        capacities_wh (array-like): Battery capacities in Wh
+        segment_starts (array-like, optional): First row of every segment (starting with 0)
+
+    Returns:
+        ndarray: Unserved energy in Wh for every capacity
+    """
+    flow = np.asarray(energy_flow_wh, dtype=np.float64)
+    capacities = np.atleast_1d(np.asarray(capacities_wh, dtype=np.float64))
+    ids, segment_starts = _segment_ids(len(flow), segment_starts)
+    if len(flow) == 0:
+        return np.zeros(len(capacities))
+
+    # An empty row before every segment holds the reset, so every flow is applied
+    padded = np.insert(flow, segment_starts, 0.0)
+    reset_rows = segment_starts + np.arange(len(segment_starts))
+    states = simulate_battery_soc(padded[:, None], capacities[None, :], 0.0, reset_rows=reset_rows)
+
+    # Demand the battery could not provide at each step
+    flow_rows = np.setdiff1d(np.arange(len(padded)), reset_rows)
+    shortfall = np.maximum(-(states[flow_rows - 1] + padded[flow_rows, None]), 0.0)
+    return shortfall.sum(axis=0)
+
+def served_cycle_depths(energy_flow_wh, segment_starts=None):
+    """
+    Depths of the charge-discharge cycles a battery serves, for all capacities at once.
+
+    The cumulative flow of every segment (starting at 0, the empty battery)
+    is split into rainflow cycles. A battery of capacity C that starts every
+    segment empty serves sum(min(depth, C)) over the returned depths:
+    every full cycle serves its range, and in the residue every rise that
+    is followed by a fall serves the smaller of the two. Everything else
+    is the deficit no battery started empty could serve.
+
+    Args:
+        energy_flow_wh (array-like): Energy into the battery per interval in Wh
+        segment_starts (array-like, optional): First row of every segment (starting with 0)
+
+    Returns:
+        ndarray: Cycle depths in Wh (unsorted)
+    """
+    flow = np.asarray(energy_flow_wh, dtype=np.float64)
+    ids, segment_starts = _segment_ids(len(flow), segment_starts)
+    if len(flow) == 0:
+        return np.zeros(0)
+
+    cumulative = np.cumsum(flow)
+    cumulative -= (cumulative - flow)[segment_starts][ids]
+    cumulative = np.insert(cumulative, segment_starts, 0.0)
+    full_ranges, _, residue, residue_segments = rainflow_decomposition(
+        cumulative, segment_starts + np.arange(len(segment_starts))
+    )
+
+    steps = np.diff(residue)
+    served = (steps[:-1] > 0) & (steps[1:] < 0) & (residue_segments[:-2] == residue_segments[2:])
+    return np.concatenate((full_ranges, np.minimum(steps[:-1], -steps[1:])[served]))
+
+def capacity_for_unserved_fraction(energy_flow_wh, fraction, segment_starts=None):
+    """
+    Smallest battery whose unserved energy is at most a fraction of the deficit.
+
+    The fraction is relative to the total deficit without a battery. The
+    served energy sum(min(depth, C)) of served_cycle_depths() is piecewise
+    linear in the capacity C, with one kink per cycle depth, so one pass
+    over the sorted depths finds the exact capacity: O(n log n), without
+    simulating.
+
+    Args:
+        energy_flow_wh (array-like): Energy into the battery per interval in Wh
+        fraction (float): Allowed unserved energy as a fraction of the deficit (0-1)
+        segment_starts (array-like, optional): First row of every segment (starting with 0)
+
+    Returns:
+        float: Required capacity in Wh, or inf if even an unlimited battery
+            leaves more unserved energy than allowed
+    """
+    flow = np.asarray(energy_flow_wh, dtype=np.float64)
+    deficit = -np.minimum(flow, 0.0).sum()
+    needed = (1 - fraction) * deficit
+    if needed <= 0:
+        return 0.0
+
+    depths = np.sort(served_cycle_depths(flow, segment_starts))
+    served_below = np.concatenate(([0.0], np.cumsum(depths)))
+    if served_below[-1] < needed * (1 - 1e-12):
+        return np.inf
+
+    # Served energy at C = depths[k]: the depths up to k plus C for every deeper cycle
+    deeper = len(depths) - np.arange(len(depths))
+    served_at_depths = served_below[1:] + (deeper - 1) * depths
+    k = min(int(np.searchsorted(served_at_depths, needed)), len(depths) - 1)
+    return float((needed - served_below[k]) / deeper[k])
+
+def solve_minimum_capacity(dataset=None, mode='daily', unserved_fraction=0.0, reset_hour=MORNING_START):
+    """
+    Exact battery capacity for the dataset in one of the operating modes.
+
+    Modes:
+        'daily': the battery is empty at reset_hour every day and moves the
+            day surplus to the following night
+        'continuous': the battery starts empty at the first row and is never reset
+        'cyclic': the battery ends the period where it started (seasonal
+            storage in steady state); only zero unserved energy is supported
+
+    Args:
+        dataset (EnergyDataset, optional): Preloaded dataset. If None, it is loaded from disk.
+        mode (str): One of 'daily', 'continuous' or 'cyclic'
+        unserved_fraction (float): Allowed unserved energy as a fraction of the
+            deficit without a battery. With 0 the capacity is the smallest one
+            that serves as much demand as an unlimited battery.
+        reset_hour (float): Hour of the daily reset in 'daily' mode
+
+    Returns:
+        float: Required capacity in Wh (inf if not achievable)
+    """
+    if mode not in SIZING_MODES:
+        raise ValueError(f"Unknown sizing mode '{mode}', expected one of {SIZING_MODES}")
+    if dataset is None:
+        dataset = EnergyDataset.load()
+
+    flow = dataset.net_energy_wh
+    if mode == 'cyclic':
+        if unserved_fraction > 0:
+            raise ValueError("Cyclic sizing only supports zero unserved energy")
+        return minimum_cyclic_capacity(flow)
+
+    segment_starts = reset_segment_starts(dataset, reset_hour) if mode == 'daily' else None
+    if unserved_fraction > 0:
+        return capacity_for_unserved_fraction(flow, unserved_fraction, segment_starts)
+    return float(minimum_capacity_per_segment(flow, segment_starts).max(initial=0.0))
@@ -1,31 +1,25 @@
 import pandas as pd
 import matplotlib.pyplot as plt
 import os
-from src.utils.config import CLEANED_DATA_PATH, IMAGES_DIR, REPORTS_DIR
+from src.utils.config import output_dirs
+from src.utils.dataset import EnergyDataset
 
-def analyze_daily_energy():
-    """Analyze daily energy production and demand patterns."""
-    # Read the cleaned data
-    df = pd.read_csv(CLEANED_DATA_PATH)
-    
-    # Convert Time to datetime
-    df['Time'] = pd.to_datetime(df['Time'])
+def analyze_daily_energy(dataset=None, output_dir=None):
+    """
+    Analyze daily energy production and demand patterns.
     
-    # Convert negative production values to positive
-    df['Pprod(W)'] = df['Pprod(W)'].abs()
+    Args:
+        dataset (EnergyDataset, optional): Preloaded dataset. If None, it is loaded from disk.
+        output_dir (str, optional): Directory for the images and reports. Defaults to the configured output directories.
+    """
+    images_dir, reports_dir = output_dirs(output_dir)
     
-    # Calculate energy in Wh (15-minute intervals)
-    df['Energy_Production_Wh'] = df['Pprod(W)'] * 0.25
-    df['Energy_Demand_Wh'] = df['Pdemand(W)'] * 0.25
-    
-    # Calculate daily totals
-    daily_totals = df.groupby(df['Time'].dt.date).agg({
-        'Energy_Production_Wh': 'sum',
-        'Energy_Demand_Wh': 'sum'
-    }).reset_index()
+    # Read the cleaned data
+    if dataset is None:
+        dataset = EnergyDataset.load()
     
-    # Calculate daily difference
-    daily_totals['Energy_Difference_Wh'] = daily_totals['Energy_Production_Wh'] - daily_totals['Energy_Demand_Wh']
+    # Calculate daily totals (production as absolute values, energy in Wh)
+    daily_totals = dataset.daily_totals()
     
     # Create visualizations
     plt.figure(figsize=(15, 10))
@@ -51,10 +45,10 @@ def analyze_daily_energy():
     
     # Adjust layout and save plot
     plt.tight_layout()
-    plt.savefig(os.path.join(IMAGES_DIR, 'energy_analysis.png'))
+    plt.savefig(os.path.join(images_dir, 'energy_analysis.png'))
     
     # Save results to text file
-    with open(os.path.join(REPORTS_DIR, 'energy_analysis.txt'), 'w') as f:
+    with open(os.path.join(reports_dir, 'energy_analysis.txt'), 'w') as f:
         f.write("Energy Analysis Results\n")
         f.write("=" * 50 + "\n\n")
         
@@ -76,7 +70,7 @@ def analyze_daily_energy():
             f.write("-" * 20 + "\n")
     
     print("Energy analysis complete! Results have been saved to:")
-    print(f"- {os.path.join(IMAGES_DIR, 'energy_analysis.png')}")
-    print(f"- {os.path.join(REPORTS_DIR, 'energy_analysis.txt')}")
+    print(f"- {os.path.join(images_dir, 'energy_analysis.png')}")
+    print(f"- {os.path.join(reports_dir, 'energy_analysis.txt')}")
     
     return daily_totals
@@ -0,0 +1,166 @@
+import numpy as np
+import pandas as pd
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.config import MORNING_START, EVENING_START, INTERVAL_HOURS
+from utils.dataset import EnergyDataset
+
+MINUTES_PER_DAY = 24 * 60
+
+def cumulative_net_energy(dataset):
+    """
+    Cumulative net energy of every day by minute of the day.
+
+    Row d, column k holds the net energy (production minus demand) of day d
+    from midnight up to, but not including, minute k; the last column is the
+    day total. The energy of any time window of any day is then the
+    difference of two columns.
+
+    Args:
+        dataset (EnergyDataset): Dataset to aggregate
+
+    Returns:
+        ndarray: Array of shape (days, 1441) in Wh
+    """
+    n_days = len(dataset.dates)
+    minute_of_day = dataset.hour * 60 + dataset.minute
+    per_minute = np.bincount(
+        dataset.day_index * MINUTES_PER_DAY + minute_of_day,
+        dataset.net_energy_wh,
+        n_days * MINUTES_PER_DAY
+    ).reshape(n_days, MINUTES_PER_DAY)
+
+    cumulative = np.zeros((n_days, MINUTES_PER_DAY + 1))
+    np.cumsum(per_minute, axis=1, out=cumulative[:, 1:])
+    return cumulative
+
+def day_night_energy(dataset, boundaries):
+    """
+    Day excess and night deficit of every date for several day/night boundaries at once.
+
+    Args:
+        dataset (EnergyDataset): Dataset to aggregate
+        boundaries (list): (morning_start, evening_start) pairs in decimal hours;
+            the day period is morning_start (inclusive) to evening_start (exclusive)
+
+    Returns:
+        tuple: (day_excess, night_deficit), arrays of shape (days, len(boundaries)) in Wh
+    """
+    cumulative = cumulative_net_energy(dataset)
+
+    # An interval belongs to the day period if its start minute lies in [start, end)
+    boundaries = np.asarray(boundaries, dtype=np.float64).reshape(-1, 2)
+    minutes = np.clip(np.ceil(np.round(boundaries * 60, 6)), 0, MINUTES_PER_DAY).astype(np.int64)
+    minutes[:, 1] = np.maximum(minutes[:, 1], minutes[:, 0])
+
+    day_net = cumulative[:, minutes[:, 1]] - cumulative[:, minutes[:, 0]]
+    night_net = cumulative[:, -1:] - day_net
+
+    # Day energy (excess that could be stored) and night energy (deficit that needs the battery)
+    return np.maximum(day_net, 0.0), -np.minimum(night_net, 0.0)
+
+def daily_sizing_table(dataset=None, morning_start=MORNING_START, evening_start=EVENING_START):
+    """
+    Calculate the daily battery sizing table for one day/night boundary.
+
+    For each calendar day the excess energy during the day period and the
+    deficit during the rest of the day are summed; the battery needed that
+    day is the smaller of the two (it cannot store more than the day excess
+    and does not need more than the night deficit).
+
+    Args:
+        dataset (EnergyDataset, optional): Preloaded dataset. If None, it is loaded from disk.
+        morning_start (float): Start of the day period in decimal hours (inclusive)
+        evening_start (float): End of the day period in decimal hours (exclusive)
+
+    Returns:
+        DataFrame: One row per date with 'Date', 'Day_Excess_Wh',
+            'Night_Deficit_Wh' and 'Required_Capacity_Wh'
+    """
+    if dataset is None:
+        dataset = EnergyDataset.load()
+
+    return daily_sizing_tables(dataset, [(morning_start, evening_start)])[0]
+
+def daily_sizing_tables(dataset, boundaries):
+    """
+    Calculate daily battery sizing tables for many day/night boundaries in one pass.
+
+    Args:
+        dataset (EnergyDataset): Dataset to aggregate
+        boundaries (list): (morning_start, evening_start) pairs in decimal hours
+
+    Returns:
+        list: One table per boundary, as returned by daily_sizing_table()
+    """
+    day_excess, night_deficit = day_night_energy(dataset, boundaries)
+    required = np.minimum(day_excess, night_deficit)
+
+    tables = []
+    for i in range(required.shape[1]):
+        tables.append(pd.DataFrame({
+            'Date': dataset.dates,
+            'Day_Excess_Wh': day_excess[:, i],
+            'Night_Deficit_Wh': night_deficit[:, i],
+            'Required_Capacity_Wh': required[:, i],
+        }))
+    return tables
+
+def boundary_sweep(dataset=None, boundaries=None, weights=None):
+    """
+    Summarize the required battery capacity for a sweep of day/night boundaries.
+
+    Args:
+        dataset (EnergyDataset, optional): Preloaded dataset. If None, it is loaded from disk.
+        boundaries (list, optional): (morning_start, evening_start) pairs in decimal hours.
+            Defaults to every 15-minute morning start from 05:00 to 10:00 with
+            the configured evening start.
+        weights (array-like, optional): Number of days each day of the dataset stands
+            for, e.g. RepresentativeDays.weights for a dataset of representative days
+
+    Returns:
+        DataFrame: One row per boundary with 'Morning_Start', 'Evening_Start' and
+            the mean, median, 90th percentile and maximum required capacity in Wh
+    """
+    if dataset is None:
+        dataset = EnergyDataset.load()
+    if boundaries is None:
+        boundaries = [(m, EVENING_START) for m in np.arange(5, 10 + INTERVAL_HOURS / 2, INTERVAL_HOURS)]
+
+    day_excess, night_deficit = day_night_energy(dataset, boundaries)
+    required = np.minimum(day_excess, night_deficit)
+    if weights is not None:
+        required = np.repeat(required, weights, axis=0)
+
+    boundaries = np.asarray(boundaries, dtype=np.float64).reshape(-1, 2)
+    return pd.DataFrame({
+        'Morning_Start': boundaries[:, 0],
+        'Evening_Start': boundaries[:, 1],
+        'Mean_Capacity_Wh': required.mean(axis=0),
+        'Median_Capacity_Wh': np.median(required, axis=0),
+        'P90_Capacity_Wh': np.quantile(required, 0.9, axis=0),
+        'Max_Capacity_Wh': required.max(axis=0),
+    })
+
+def sizing_statistics(daily_df, weights=None):
+    """
+    Summarize a daily sizing table.
+
+    Args:
+        daily_df (DataFrame): Table from daily_sizing_table()
+        weights (array-like, optional): Number of days each row stands for, e.g.
+            RepresentativeDays.weights for a table of representative days
+
+    Returns:
+        dict: Mean, median, 90th percentile and maximum required capacity in Wh
+    """
+    capacity = daily_df['Required_Capacity_Wh']
+    if weights is not None:
+        capacity = pd.Series(np.repeat(capacity.to_numpy(), weights))
+    return {
+        'mean': capacity.mean(),
+        'median': capacity.median(),
+        'p90': capacity.quantile(0.9),
+        'max': capacity.max(),
+    }
@@ -0,0 +1,266 @@
+import numpy as np
+import pandas as pd
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.config import INTERVAL_HOURS
+
+HOURS_PER_YEAR = 8760
+
+def _segment_starts(n, segment_starts):
+    if segment_starts is None:
+        return np.zeros(min(n, 1), dtype=np.int64)
+    segment_starts = np.asarray(segment_starts, dtype=np.int64)
+    if n and (len(segment_starts) == 0 or segment_starts[0] != 0):
+        raise ValueError("segment_starts must start at row 0")
+    return segment_starts
+
+def turning_points(trace, segment_starts=None):
+    """
+    Positions of the reversals of a series (plus its first and last point).
+
+    Flat stretches are skipped, so a plateau at a peak counts as one reversal.
+
+    Args:
+        trace (array-like): 1-D series, e.g. a battery state of charge
+        segment_starts (array-like, optional): First row of every independent
+            segment (starting with 0), e.g. of every scenario in a flattened
+            batch. Every segment starts and ends with a point of its own.
+
+    Returns:
+        ndarray: Sorted row positions
+    """
+    values = np.asarray(trace, dtype=np.float64)
+    n = len(values)
+    segment_starts = _segment_starts(n, segment_starts)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+    segment_ends = np.append(segment_starts[1:] - 1, n - 1)
+
+    # Steps within a segment (the step into the next segment is no step)
+    steps = np.diff(values)
+    within = np.ones(len(steps), dtype=bool)
+    within[segment_ends[:-1]] = False
+    moving = np.flatnonzero((steps != 0) & within)
+
+    # The last step of every monotone run ends at a reversal
+    direction = np.sign(steps[moving])
+    step_segments = np.searchsorted(segment_starts, moving, side='right')
+    reverses = (direction[1:] != direction[:-1]) & (step_segments[1:] == step_segments[:-1])
+    is_point = np.zeros(n, dtype=bool)
+    is_point[moving[:-1][reverses] + 1] = True
+    is_point[segment_starts] = True
+    is_point[segment_ends] = True
+    return np.flatnonzero(is_point)
+
+def rainflow_decomposition(trace, segment_starts=None):
+    """
+    Full rainflow cycles and the residue of a series.
+
+    Uses the four-point rule: for consecutive reversals A, B, C, D the pair
+    B-C is a full cycle if its range fits within both A-B and C-D. Removing
+    such a pair only widens the ranges next to it, so every pair that meets
+    the rule is removed at once and the passes repeat until none is left.
+    What remains is the residue: reversals whose ranges first grow and then
+    shrink. Cycles never span two segments.
+
+    Args:
+        trace (array-like): 1-D series, e.g. a battery state of charge
+        segment_starts (array-like, optional): First row of every independent
+            segment (starting with 0). Defaults to one segment.
+
+    Returns:
+        tuple: (full_ranges, full_segments, residue, residue_segments) with the
+            range and segment number of every full cycle and the values and
+            segment numbers of the residue reversals
+    """
+    values = np.asarray(trace, dtype=np.float64)
+    segment_starts = _segment_starts(len(values), segment_starts)
+    positions = turning_points(values, segment_starts)
+    reversals = values[positions]
+    segments = np.searchsorted(segment_starts, positions, side='right') - 1
+
+    full_ranges = []
+    full_segments = []
+    while len(reversals) >= 4:
+        spans = np.abs(np.diff(reversals))
+        inner = spans[1:-1]
+        is_cycle = (inner <= spans[:-2]) & (inner <= spans[2:]) & (segments[:-3] == segments[3:])
+        # Neighbouring candidates share a reversal (only with equal ranges),
+        # the second one is left for the next pass
+        is_cycle[1:] &= ~is_cycle[:-1]
+        starts = np.flatnonzero(is_cycle) + 1
+        if len(starts) == 0:
+            break
+
+        full_ranges.append(spans[starts])
+        full_segments.append(segments[starts])
+        keep = np.ones(len(reversals), dtype=bool)
+        keep[starts] = False
+        keep[starts + 1] = False
+        reversals = reversals[keep]
+        segments = segments[keep]
+
+    return (
+        np.concatenate(full_ranges) if full_ranges else np.zeros(0),
+        np.concatenate(full_segments) if full_segments else np.zeros(0, dtype=np.int64),
+        reversals,
+        segments
+    )
+
+def segment_rainflow_cycles(trace, segment_starts=None):
+    """
+    Rainflow count of the cycles of every segment of a series.
+
+    The full cycles come from rainflow_decomposition(); the residue is
+    counted as half cycles. Cycles with a zero range (e.g. of a constant
+    trace) are left out.
+
+    Args:
+        trace (array-like): 1-D series, e.g. a battery state of charge
+        segment_starts (array-like, optional): First row of every independent
+            segment (starting with 0). Defaults to one segment.
+
+    Returns:
+        tuple: (ranges, counts, segments) arrays with the range of every cycle,
+            its count (1.0 for full cycles, 0.5 for half cycles) and its segment
+    """
+    full_ranges, full_segments, residue, residue_segments = rainflow_decomposition(trace, segment_starts)
+    half = residue_segments[1:] == residue_segments[:-1]
+    half_ranges = np.abs(np.diff(residue))[half]
+
+    ranges = np.concatenate((full_ranges, half_ranges))
+    counts = np.concatenate((np.ones(len(full_ranges)), np.full(len(half_ranges), 0.5)))
+    segments = np.concatenate((full_segments, residue_segments[1:][half]))
+    cycling = ranges > 0
+    return ranges[cycling], counts[cycling], segments[cycling]
+
+def rainflow_cycles(trace):
+    """
+    Rainflow count of the cycles in a series (see segment_rainflow_cycles()).
+
+    Args:
+        trace (array-like): 1-D series, e.g. a battery state of charge
+
+    Returns:
+        tuple: (ranges, counts) arrays with the range of every cycle and its
+            count (1.0 for full cycles, 0.5 for half cycles)
+    """
+    ranges, counts, _ = segment_rainflow_cycles(trace)
+    return ranges, counts
+
+class DegradationModel:
+    """
+    Capacity fade from cycling (Wöhler curve) and from calendar ageing.
+
+    A cycle with depth of discharge DoD (0-1) uses 1 / N(DoD) of the cycle
+    life, with N(DoD) = cycle_life * DoD ** -woehler_exponent. At the end of
+    the cycle life the capacity has faded by end_of_life_fade. Calendar fade
+    grows linearly with time and with the mean state of charge.
+    """
+
+    def __init__(self, cycle_life=6000, woehler_exponent=1.5, end_of_life_fade=0.2,
+                 calendar_fade_per_year=0.01, calendar_soc_sensitivity=0.5):
+        """
+        Args:
+            cycle_life (float): Number of full (100% DoD) cycles until end of life
+            woehler_exponent (float): Exponent of the depth of discharge in the cycle life
+            end_of_life_fade (float): Capacity fade at end of life (0-1)
+            calendar_fade_per_year (float): Calendar fade per year at a mean charge of 50% (0-1)
+            calendar_soc_sensitivity (float): Relative change of the calendar fade per
+                unit of mean state of charge above 50%
+        """
+        self.cycle_life = cycle_life
+        self.woehler_exponent = woehler_exponent
+        self.end_of_life_fade = end_of_life_fade
+        self.calendar_fade_per_year = calendar_fade_per_year
+        self.calendar_soc_sensitivity = calendar_soc_sensitivity
+
+    def cycle_damage(self, depths, counts):
+        """
+        Args:
+            depths (ndarray): Depth of discharge of every cycle (0-1)
+            counts (ndarray): Count of every cycle (1.0 or 0.5)
+
+        Returns:
+            ndarray: Capacity fade (0-1) caused by every cycle
+        """
+        return counts * depths ** self.woehler_exponent / self.cycle_life * self.end_of_life_fade
+
+    def cycle_fade(self, depths, counts):
+        """
+        Args:
+            depths (ndarray): Depth of discharge of every cycle (0-1)
+            counts (ndarray): Count of every cycle (1.0 or 0.5)
+
+        Returns:
+            float: Capacity fade (0-1) caused by the cycles
+        """
+        return self.cycle_damage(depths, counts).sum()
+
+    def calendar_fade(self, mean_soc, years):
+        """
+        Args:
+            mean_soc (float or ndarray): Mean state of charge (0-1)
+            years (float): Time span in years
+
+        Returns:
+            float or ndarray: Capacity fade (0-1) caused by ageing
+        """
+        stress = np.maximum(1 + self.calendar_soc_sensitivity * (np.asarray(mean_soc) - 0.5), 0.0)
+        return self.calendar_fade_per_year * years * stress
+
+def estimate_degradation(traces_wh, capacities_wh, model=None, interval_hours=INTERVAL_HOURS):
+    """
+    Cycling and capacity fade per year from state of charge traces.
+
+    Args:
+        traces_wh (array-like): Battery state in Wh, shape (n,) or (n, scenarios),
+            e.g. the traces of simulate_battery_batch()
+        capacities_wh (float or array-like): Capacity of every scenario in Wh
+        model (DegradationModel, optional): Degradation model. Defaults to DegradationModel().
+        interval_hours (float): Length of one interval in hours
+
+    Returns:
+        DataFrame: One row per scenario with 'Capacity_Wh',
+            'Equivalent_Full_Cycles_Per_Year', 'Full_Cycles_Per_Year',
+            'Cycle_Fade_Percent_Per_Year', 'Calendar_Fade_Percent_Per_Year',
+            'Capacity_Fade_Percent_Per_Year' and 'Years_To_End_Of_Life'
+    """
+    if model is None:
+        model = DegradationModel()
+    traces = np.asarray(traces_wh, dtype=np.float64)
+    if traces.ndim == 1:
+        traces = traces[:, None]
+    capacities = np.broadcast_to(np.asarray(capacities_wh, dtype=np.float64), traces.shape[1:])
+    years = max(len(traces) * interval_hours / HOURS_PER_YEAR, interval_hours / HOURS_PER_YEAR)
+
+    # All scenarios in one rainflow count, one segment per scenario
+    active = np.flatnonzero(capacities > 0)
+    n = len(traces)
+    ranges, counts, segments = segment_rainflow_cycles(
+        traces[:, active].ravel(order='F'), np.arange(len(active), dtype=np.int64) * n
+    )
+    scenarios = active[segments]
+    depths = ranges / capacities[scenarios]
+
+    size = len(capacities)
+    equivalent_cycles = np.bincount(scenarios, weights=counts * depths, minlength=size)
+    full_cycles = np.bincount(scenarios, weights=counts * (counts == 1.0), minlength=size)
+    cycle_fade = np.bincount(scenarios, weights=model.cycle_damage(depths, counts), minlength=size)
+    calendar_fade = np.zeros(size)
+    calendar_fade[active] = model.calendar_fade(traces.mean(axis=0)[active] / capacities[active], years)
+
+    fade_per_year = (cycle_fade + calendar_fade) / years
+    with np.errstate(divide='ignore'):
+        years_to_end_of_life = model.end_of_life_fade / fade_per_year
+
+    return pd.DataFrame({
+        'Capacity_Wh': capacities,
+        'Equivalent_Full_Cycles_Per_Year': equivalent_cycles / years,
+        'Full_Cycles_Per_Year': full_cycles / years,
+        'Cycle_Fade_Percent_Per_Year': cycle_fade / years * 100,
+        'Calendar_Fade_Percent_Per_Year': calendar_fade / years * 100,
+        'Capacity_Fade_Percent_Per_Year': fade_per_year * 100,
+        'Years_To_End_Of_Life': years_to_end_of_life,
+    })
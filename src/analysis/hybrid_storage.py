@@ -0,0 +1,101 @@
+import numpy as np
+import pandas as pd
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.config import INTERVAL_HOURS, REPORTS_DIR, ensure_directories
+from utils.dataset import EnergyDataset
+from analysis.battery_simulation import (
+    SCAN_BATCH_SIZE,
+    SCAN_MAX_SCENARIOS,
+    simulate_hybrid_batch,
+    simulate_hybrid_dispatch
+)
+from analysis.inverse_sizing import grid_exchange_totals, grid_kpi_columns
+
+def hybrid_grid_kpis(dataset, daily_capacities_wh, seasonal_capacities_wh, daily_initial_percent=0,
+                     seasonal_initial_percent=50, daily_battery=None, seasonal_battery=None):
+    """
+    Grid KPIs of every combination of a daily battery and a seasonal store.
+
+    The daily battery handles every flow first and the seasonal store takes
+    what the daily battery cannot (see simulate_hybrid_dispatch()). Both
+    tiers run greedy self-consumption without resets, so the charge the
+    daily tier holds at midnight still serves the rest of the night. A few
+    combinations are simulated with the scan kernel, SCAN_BATCH_SIZE
+    pairs per call; larger grids step through the intervals once with all
+    combinations together (simulate_hybrid_batch()).
+
+    Args:
+        dataset (EnergyDataset): Dataset to simulate (any number of years)
+        daily_capacities_wh (array-like): Daily battery capacities in Wh
+        seasonal_capacities_wh (array-like): Seasonal store capacities in Wh
+        daily_initial_percent (float): Initial charge of the daily battery (0-100)
+        seasonal_initial_percent (float): Initial charge of the seasonal store (0-100)
+        daily_battery (BatteryProperties, optional): Losses and power limits of the daily battery
+        seasonal_battery (BatteryProperties, optional): Losses and power limits of the seasonal store
+
+    Returns:
+        DataFrame: One row per combination with 'Daily_Capacity_Wh',
+            'Seasonal_Capacity_Wh' and the columns of grid_kpi_columns()
+    """
+    daily_capacities = np.atleast_1d(np.asarray(daily_capacities_wh, dtype=np.float64))
+    seasonal_capacities = np.atleast_1d(np.asarray(seasonal_capacities_wh, dtype=np.float64))
+    flow = dataset.net_energy_wh
+    totals = (dataset.energy_demand_wh.sum(), dataset.energy_production_wh.sum())
+
+    # Every combination, daily capacity major
+    daily_pairs = np.repeat(daily_capacities, len(seasonal_capacities))
+    seasonal_pairs = np.tile(seasonal_capacities, len(daily_capacities))
+
+    if len(daily_pairs) > SCAN_MAX_SCENARIOS:
+        kpis = simulate_hybrid_batch(
+            flow, daily_capacities, seasonal_capacities, daily_initial_percent, seasonal_initial_percent,
+            daily_battery=daily_battery, seasonal_battery=seasonal_battery
+        )
+        grid_import = kpis['Grid_Import_Wh'].to_numpy()
+        grid_export = kpis['Grid_Export_Wh'].to_numpy()
+        import_intervals = kpis['Grid_Dependency_Hours'].to_numpy() / INTERVAL_HOURS
+    else:
+        grid_import = np.zeros(len(daily_pairs))
+        grid_export = np.zeros(len(daily_pairs))
+        import_intervals = np.zeros(len(daily_pairs), dtype=np.int64)
+        for start in range(0, len(daily_pairs), SCAN_BATCH_SIZE):
+            daily_batch = daily_pairs[start:start + SCAN_BATCH_SIZE]
+            seasonal_batch = seasonal_pairs[start:start + SCAN_BATCH_SIZE]
+            _, _, grid = simulate_hybrid_dispatch(
+                flow[:, None], daily_batch[None, :], seasonal_batch[None, :],
+                daily_batch * (daily_initial_percent / 100), seasonal_batch * (seasonal_initial_percent / 100),
+                daily_battery=daily_battery, seasonal_battery=seasonal_battery
+            )
+            (grid_import[start:start + len(daily_batch)],
+             grid_export[start:start + len(daily_batch)],
+             import_intervals[start:start + len(daily_batch)]) = grid_exchange_totals(grid)
+
+    return pd.DataFrame({
+        'Daily_Capacity_Wh': daily_pairs,
+        'Seasonal_Capacity_Wh': seasonal_pairs,
+        **grid_kpi_columns(*totals, grid_import, grid_export, import_intervals),
+    })
+
+if __name__ == "__main__":
+    try:
+        ensure_directories()
+        kpis = hybrid_grid_kpis(
+            EnergyDataset.load(),
+            daily_capacities_wh=np.linspace(0, 500, 6) * 1000,
+            seasonal_capacities_wh=np.linspace(0, 40, 5) * 1000 * 1000
+        )
+        output_path = os.path.join(REPORTS_DIR, 'hybrid_storage_sweep.csv')
+        kpis.to_csv(output_path, index=False)
+
+        table = kpis.pivot(index='Daily_Capacity_Wh', columns='Seasonal_Capacity_Wh', values='Self_Sufficiency_Percent')
+        table.index = [f"{capacity/1000:.0f} kWh" for capacity in table.index]
+        table.columns = [f"{capacity/1000/1000:.0f} MWh" for capacity in table.columns]
+        print("Self-sufficiency (%) by daily battery (rows) and seasonal store (columns):")
+        print(table.round(1).to_string())
+        print(f"Results saved to {output_path}")
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        import traceback
+        traceback.print_exc()
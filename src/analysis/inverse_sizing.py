@@ -0,0 +1,159 @@
+import numpy as np
+import pandas as pd
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.config import INTERVAL_HOURS
+from utils.dataset import EnergyDataset
+from analysis.battery_simulation import DailyReset, simulate_battery_batch
+
+# Capacities simulated together in every refinement step of the search
+CAPACITY_BATCH_SIZE = 16
+
+def grid_exchange_totals(grid):
+    """
+    Grid import, grid export and intervals with import, summed over time (axis 0).
+
+    Args:
+        grid (ndarray): Grid exchange per interval in Wh (positive = export, negative = import)
+
+    Returns:
+        tuple: (grid_import, grid_export, import_intervals)
+    """
+    return -grid.clip(max=0.0).sum(axis=0), grid.clip(min=0.0).sum(axis=0), (grid < 0).sum(axis=0)
+
+def grid_kpi_columns(total_demand_wh, total_production_wh, grid_import, grid_export, import_intervals):
+    """
+    KPI columns of the load duration analysis from grid exchange totals.
+
+    Args:
+        total_demand_wh (float): Total demand of the simulated period in Wh
+        total_production_wh (float): Total production of the simulated period in Wh
+        grid_import (ndarray): Energy imported from the grid in Wh
+        grid_export (ndarray): Energy exported to the grid in Wh
+        import_intervals (ndarray): Number of intervals with grid import
+
+    Returns:
+        dict: 'Grid_Import_Wh', 'Grid_Export_Wh', 'Grid_Dependency_Hours',
+            'Self_Sufficiency_Percent' and 'Self_Consumption_Percent'
+    """
+    return {
+        'Grid_Import_Wh': grid_import,
+        'Grid_Export_Wh': grid_export,
+        'Grid_Dependency_Hours': import_intervals * INTERVAL_HOURS,
+        'Self_Sufficiency_Percent': (1 - grid_import / total_demand_wh) * 100,
+        'Self_Consumption_Percent': (1 - grid_export / total_production_wh) * 100,
+    }
+
+def battery_grid_kpis(dataset, capacities_wh, initial_percent=50, daily_reset=False, battery=None):
+    """
+    Grid KPIs of a battery for several capacities at once.
+
+    The KPIs are the ones of the load duration analysis: grid import and
+    export, hours with grid import, self-sufficiency and self-consumption.
+    All capacities are simulated together with simulate_battery_batch().
+
+    Args:
+        dataset (EnergyDataset): Dataset to simulate
+        capacities_wh (array-like): Battery capacities in Wh
+        initial_percent (float): Initial charge percentage (0-100) of every capacity
+        daily_reset (bool): Reset the battery to the initial charge at the start of every day
+        battery (BatteryProperties, optional): Losses and power limits. Defaults to an ideal battery.
+
+    Returns:
+        DataFrame: One row per capacity with 'Capacity_Wh', 'Grid_Import_Wh',
+            'Grid_Export_Wh', 'Grid_Dependency_Hours', 'Self_Sufficiency_Percent'
+            and 'Self_Consumption_Percent'
+    """
+    capacities = np.atleast_1d(np.asarray(capacities_wh, dtype=np.float64))
+    strategy = DailyReset(dataset.day_starts) if daily_reset else None
+    kpis = simulate_battery_batch(dataset.net_energy_wh, capacities, initial_percent, strategy=strategy,
+                                  battery=battery)
+
+    return pd.DataFrame({
+        'Capacity_Wh': capacities,
+        **grid_kpi_columns(dataset.energy_demand_wh.sum(), dataset.energy_production_wh.sum(),
+                           kpis['Grid_Import_Wh'].to_numpy(), kpis['Grid_Export_Wh'].to_numpy(),
+                           kpis['Grid_Dependency_Hours'].to_numpy() / INTERVAL_HOURS),
+    })
+
+def _meets_targets(kpis, self_sufficiency, self_consumption, max_grid_dependency_hours):
+    meets = np.ones(len(kpis), dtype=bool)
+    if self_sufficiency is not None:
+        meets &= kpis['Self_Sufficiency_Percent'].to_numpy() >= self_sufficiency
+    if self_consumption is not None:
+        meets &= kpis['Self_Consumption_Percent'].to_numpy() >= self_consumption
+    if max_grid_dependency_hours is not None:
+        meets &= kpis['Grid_Dependency_Hours'].to_numpy() <= max_grid_dependency_hours
+    return meets
+
+def find_capacity_for_targets(dataset=None, self_sufficiency=None, self_consumption=None,
+                              max_grid_dependency_hours=None, initial_percent=50, daily_reset=False,
+                              max_capacity_wh=None, tolerance_wh=100.0, battery=None):
+    """
+    Find the smallest battery capacity that meets target KPI values.
+
+    Self-sufficiency and self-consumption never decrease and grid dependency
+    never increases with capacity (a larger battery holds at least as much
+    charge and at least as much free space at every interval), so the
+    capacities that meet all targets form a range [minimum, inf). The search
+    evaluates a grid of capacities per round with the vectorized simulation
+    and narrows the bracket around the first capacity that meets the
+    targets: a logarithmic grid first, then linear grids.
+
+    Args:
+        dataset (EnergyDataset, optional): Preloaded dataset. If None, it is loaded from disk.
+        self_sufficiency (float, optional): Minimum self-sufficiency in %
+        self_consumption (float, optional): Minimum self-consumption in %
+        max_grid_dependency_hours (float, optional): Maximum hours per year with grid import
+        initial_percent (float): Initial charge percentage (0-100)
+        daily_reset (bool): Reset the battery to the initial charge at the start of every day
+        max_capacity_wh (float, optional): Largest capacity to consider. Defaults to
+            the total surplus plus the total deficit, more than any battery can use.
+        tolerance_wh (float): Width of the final bracket in Wh
+        battery (BatteryProperties, optional): Losses and power limits. Defaults to an ideal battery.
+
+    Returns:
+        tuple: (capacity_wh, curve) where capacity_wh is the minimal capacity (inf if
+            the targets are not met at max_capacity_wh) and curve is a DataFrame with
+            the KPIs of every capacity sampled during the search, sorted by capacity
+    """
+    if dataset is None:
+        dataset = EnergyDataset.load()
+    if max_capacity_wh is None:
+        max_capacity_wh = np.abs(dataset.net_energy_wh).sum()
+
+    samples = []
+
+    def evaluate(capacities):
+        kpis = battery_grid_kpis(dataset, capacities, initial_percent, daily_reset, battery)
+        samples.append(kpis)
+        return _meets_targets(kpis, self_sufficiency, self_consumption, max_grid_dependency_hours)
+
+    # Invariant: low does not meet the targets, high does
+    low, high = 0.0, float(max_capacity_wh)
+    meets_low, meets_high = evaluate([low, high])
+    if meets_low or not meets_high:
+        capacity = low if meets_low else np.inf
+    else:
+        grid = np.geomspace(max(high * 1e-6, tolerance_wh), high, CAPACITY_BATCH_SIZE + 1)[:-1]
+        while high - low > tolerance_wh:
+            meets = evaluate(grid)
+            first = np.argmax(meets) if meets.any() else len(grid)
+            low = grid[first - 1] if first > 0 else low
+            high = grid[first] if first < len(grid) else high
+            grid = np.linspace(low, high, CAPACITY_BATCH_SIZE + 2)[1:-1]
+        capacity = high
+
+    curve = pd.concat(samples).sort_values('Capacity_Wh').drop_duplicates('Capacity_Wh').reset_index(drop=True)
+    return capacity, curve
+
+if __name__ == "__main__":
+    try:
+        capacity_wh, curve = find_capacity_for_targets(self_sufficiency=40, daily_reset=True, initial_percent=0)
+        print(f"Smallest daily battery for 40% self-sufficiency: {capacity_wh/1000:.2f} kWh")
+        print(f"Capacities evaluated: {len(curve)}")
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        import traceback
+        traceback.print_exc()
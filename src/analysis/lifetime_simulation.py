@@ -0,0 +1,135 @@
+import numpy as np
+import pandas as pd
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.config import INTERVAL_HOURS, REPORTS_DIR, ensure_directories
+from utils.dataset import EnergyDataset
+from analysis.battery_simulation import simulate_dispatch
+from analysis.degradation import HOURS_PER_YEAR, estimate_degradation
+from analysis.inverse_sizing import grid_exchange_totals, grid_kpi_columns
+from analysis.synthetic_years import synthetic_year_rows
+
+def simulate_lifetime(capacities_wh, dataset=None, years=20, update_days=30, model=None, initial_percent=50,
+                      battery=None, resample=False, seed=None):
+    """
+    Simulate batteries over many years while their capacity fades.
+
+    The profile of the dataset is repeated every year (or, with resample,
+    rebuilt from random days of the same month). The years are simulated in
+    chunks of update_days: every chunk is one pass of the scan kernel
+    (simulate_dispatch()) with all capacities as scenarios, each with its own
+    usable capacity. After every chunk the degradation model turns the state
+    of charge traces of the chunk into a fade per capacity, and the usable
+    capacity of each scenario in the next chunk shrinks accordingly. The state carries over between chunks,
+    so only one chunk is ever held in memory.
+
+    Cycles are counted per chunk, so a cycle spanning a chunk boundary is
+    counted as two half cycles.
+
+    Args:
+        capacities_wh (array-like): Nominal battery capacities in Wh
+        dataset (EnergyDataset, optional): Preloaded dataset. If None, it is loaded from disk.
+        years (int): Number of years to simulate
+        update_days (float): Days between updates of the usable capacity
+        model (DegradationModel, optional): Degradation model. Defaults to DegradationModel().
+        initial_percent (float): Initial charge percentage (0-100)
+        battery (BatteryProperties, optional): Losses and power limits. Defaults to an ideal battery.
+        resample (bool): Resample the days of every year instead of repeating the profile
+        seed (int, optional): Seed for resampling
+
+    Returns:
+        DataFrame: One row per year and capacity with 'Year', 'Capacity_Wh',
+            'Usable_Capacity_Wh' and 'Usable_Capacity_Percent' (at the end of
+            the year) and the columns of grid_kpi_columns()
+    """
+    if dataset is None:
+        dataset = EnergyDataset.load()
+    nominal = np.atleast_1d(np.asarray(capacities_wh, dtype=np.float64))
+    usable = nominal.copy()
+    state = usable * (initial_percent / 100)
+    rng = np.random.default_rng(seed)
+    chunk_rows = max(int(round(update_days * 24 / INTERVAL_HOURS)), 1)
+
+    results = []
+    last_flow = None
+    for year in range(1, years + 1):
+        if resample:
+            rows = synthetic_year_rows(dataset, rng, block_days=1, day_groups=dataset.month[dataset.day_starts])
+        else:
+            rows = np.arange(len(dataset))
+        flow = dataset.net_energy_wh[rows]
+
+        grid_import = np.zeros(len(nominal))
+        grid_export = np.zeros(len(nominal))
+        import_intervals = np.zeros(len(nominal), dtype=np.int64)
+
+        for start in range(0, len(flow), chunk_rows):
+            chunk = flow[start:start + chunk_rows]
+
+            # The first row of a pass only holds the initial state, so every
+            # chunk after the very first one starts with the last row of the
+            # previous chunk, which is dropped again afterwards
+            carried = 0 if last_flow is None else 1
+            if carried:
+                chunk = np.concatenate(([last_flow], chunk))
+            states, grid = simulate_dispatch(chunk[:, None], usable[None, :], state, battery=battery)
+            states, grid = states[carried:], grid[carried:]
+
+            chunk_import, chunk_export, chunk_intervals = grid_exchange_totals(grid)
+            grid_import += chunk_import
+            grid_export += chunk_export
+            import_intervals += chunk_intervals
+
+            # Fade of this chunk, as a fraction of the nominal capacity
+            chunk_years = len(states) * INTERVAL_HOURS / HOURS_PER_YEAR
+            fade = estimate_degradation(states, usable, model)['Capacity_Fade_Percent_Per_Year'].to_numpy()
+            usable = np.maximum(usable - nominal * fade / 100 * chunk_years, 0.0)
+            state = np.minimum(states[-1], usable)
+            last_flow = chunk[-1]
+
+        results.append(pd.DataFrame({
+            'Year': year,
+            'Capacity_Wh': nominal,
+            'Usable_Capacity_Wh': usable,
+            'Usable_Capacity_Percent': np.divide(usable, nominal, out=np.zeros_like(usable), where=nominal > 0) * 100,
+            **grid_kpi_columns(dataset.energy_demand_wh[rows].sum(), dataset.energy_production_wh[rows].sum(),
+                               grid_import, grid_export, import_intervals),
+        }))
+
+    return pd.concat(results, ignore_index=True)
+
+def years_below_thresholds(lifetime, thresholds):
+    """
+    First year in which the self-sufficiency falls below each threshold.
+
+    Args:
+        lifetime (DataFrame): Result of simulate_lifetime()
+        thresholds (array-like): Self-sufficiency thresholds in %
+
+    Returns:
+        DataFrame: One row per capacity with 'Capacity_Wh' and a column
+            'First_Year_Below_<threshold>%' per threshold (NaN if never)
+    """
+    table = lifetime.pivot(index='Year', columns='Capacity_Wh', values='Self_Sufficiency_Percent')
+    summary = pd.DataFrame({'Capacity_Wh': table.columns.to_numpy()})
+    for threshold in thresholds:
+        below = table.to_numpy() < threshold
+        first = np.where(below.any(axis=0), table.index.to_numpy()[below.argmax(axis=0)], np.nan)
+        summary[f'First_Year_Below_{threshold:g}%'] = first
+    return summary
+
+if __name__ == "__main__":
+    try:
+        ensure_directories()
+        lifetime = simulate_lifetime(np.linspace(100, 1000, 10) * 1000, years=20)
+        lifetime.to_csv(os.path.join(REPORTS_DIR, 'battery_lifetime_simulation.csv'), index=False)
+
+        summary = years_below_thresholds(lifetime, thresholds=(50, 45, 40))
+        summary['Capacity_kWh'] = summary.pop('Capacity_Wh') / 1000
+        print("First year with self-sufficiency below each threshold:")
+        print(summary.to_string(index=False))
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        import traceback
+        traceback.print_exc()
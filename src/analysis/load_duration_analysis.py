@@ -1,22 +1,32 @@
 import pandas as pd
 import matplotlib.pyplot as plt
 import numpy as np
-from utils.config import CLEANED_DATA_PATH, IMAGES_DIR, REPORTS_DIR
-from utils.config import DAILY_BATTERY_CAPACITY_WH, SEASONAL_BATTERY_CAPACITY_WH
+from utils.config import output_dirs
+from utils.dataset import EnergyDataset
+from utils.config import DAILY_BATTERY_CAPACITY_WH, SEASONAL_BATTERY_CAPACITY_WH, INTERVAL_HOURS
+from analysis.battery_simulation import DailyReset, simulate_dispatch, simulate_hybrid_dispatch
 import os
 
-def analyze_load_duration_curves():
-    """Create load duration curves for different battery scenarios."""
+def analyze_load_duration_curves(dataset=None, output_dir=None):
+    """
+    Create load duration curves for different battery scenarios.
+    
+    Args:
+        dataset (EnergyDataset, optional): Preloaded dataset. If None, it is loaded from disk.
+        output_dir (str, optional): Directory for the images and reports. Defaults to the configured output directories.
+    """
+    images_dir, reports_dir = output_dirs(output_dir)
+    
     # Read the cleaned data
-    df = pd.read_csv(CLEANED_DATA_PATH)
-    df['Time'] = pd.to_datetime(df['Time'])
+    if dataset is None:
+        dataset = EnergyDataset.load()
     
     # Use DAILY_BATTERY_CAPACITY_WH from config.py
-    # Convert power to absolute values
-    df['Pprod(W)'] = df['Pprod(W)'].abs()
+    # Production power as absolute values
+    df = dataset.to_frame()
     
     # Calculate net load (positive means demand exceeds production)
-    df['Net_Load_No_Battery'] = df['Pdemand(W)'] - df['Pprod(W)']
+    df['Net_Load_No_Battery'] = dataset.net_load_w
     
     # Sort values in descending order for duration curves
     sorted_no_battery = np.sort(df['Net_Load_No_Battery'].values)[::-1]
@@ -25,75 +35,33 @@ def analyze_load_duration_curves():
     # Convert 15-minute intervals to hours (multiply by 0.25)
     x_points = np.arange(len(sorted_no_battery)) * 0.25
     
-    # Simulate daily battery operation
-    df['Battery_State_Daily'] = 0.0
-    df['Net_Load_Daily_Battery'] = df['Net_Load_No_Battery'].copy()
-    
-    # Reset battery state at the start of each day
-    df['DayOfYear'] = df['Time'].dt.dayofyear
+    # Simulate daily battery operation: the battery is emptied at the start of
+    # every day, the residual grid flow is what it could not absorb or provide
+    df['Battery_State_Daily'], daily_grid = simulate_dispatch(
+        dataset.net_energy_wh, DAILY_BATTERY_CAPACITY_WH, 0.0, DailyReset(dataset.day_starts)
+    )
+    df['Net_Load_Daily_Battery'] = -daily_grid / INTERVAL_HOURS
+    
+    # Simulate seasonal battery operation, starting at 50%
+    df['Battery_State_Seasonal'], seasonal_grid = simulate_dispatch(
+        dataset.net_energy_wh, SEASONAL_BATTERY_CAPACITY_WH, SEASONAL_BATTERY_CAPACITY_WH * 0.5
+    )
+    df['Net_Load_Seasonal_Battery'] = -seasonal_grid / INTERVAL_HOURS
+    
+    # Simulate both storages together: the daily battery (empty at the start,
+    # as above) handles every flow first, the seasonal battery what the daily
+    # battery cannot. The daily battery is not emptied every day here, since
+    # the charge it holds at midnight still serves the rest of the night
+    _, _, hybrid_grid = simulate_hybrid_dispatch(
+        dataset.net_energy_wh, DAILY_BATTERY_CAPACITY_WH, SEASONAL_BATTERY_CAPACITY_WH,
+        0.0, SEASONAL_BATTERY_CAPACITY_WH * 0.5
+    )
+    df['Net_Load_Hybrid_Battery'] = -hybrid_grid / INTERVAL_HOURS
     
-    # Calculate battery state and net load with daily battery
-    for i in range(1, len(df)):
-        # Reset battery at start of day
-        if df['DayOfYear'].iloc[i] != df['DayOfYear'].iloc[i-1]:
-            df.loc[df.index[i], 'Battery_State_Daily'] = 0.0
-            continue
-            
-        # Calculate energy surplus/deficit
-        power_difference = df['Pprod(W)'].iloc[i] - df['Pdemand(W)'].iloc[i]
-        energy_flow = power_difference * 0.25  # 15-minute intervals
-        current_state = df['Battery_State_Daily'].iloc[i-1]
-        new_state = current_state + energy_flow
-        
-        # Apply battery capacity constraints
-        df.loc[df.index[i], 'Battery_State_Daily'] = max(0, min(new_state, DAILY_BATTERY_CAPACITY_WH))
-        
-        # Calculate how much power was actually absorbed/provided by the battery
-        if power_difference > 0:  # Excess production (charging)
-            if current_state >= DAILY_BATTERY_CAPACITY_WH:  # Battery full
-                absorbed_power = 0
-            else:
-                absorbed_power = min(power_difference, (DAILY_BATTERY_CAPACITY_WH - current_state) / 0.25)
-            df.loc[df.index[i], 'Net_Load_Daily_Battery'] = -(power_difference - absorbed_power)
-        else:  # Power deficit (discharging)
-            if current_state <= 0:  # Battery empty
-                provided_power = 0
-            else:
-                provided_power = min(-power_difference, current_state / 0.25)
-            df.loc[df.index[i], 'Net_Load_Daily_Battery'] = power_difference + provided_power
-
-    # Simulate seasonal battery operation
-    df['Battery_State_Seasonal'] = SEASONAL_BATTERY_CAPACITY_WH * 0.5  # Start at 50%
-    df['Net_Load_Seasonal_Battery'] = df['Net_Load_No_Battery'].copy()
-    
-    # Calculate battery state and net load with seasonal battery
-    for i in range(1, len(df)):
-        # Calculate energy surplus/deficit
-        power_difference = df['Pprod(W)'].iloc[i] - df['Pdemand(W)'].iloc[i]
-        energy_flow = power_difference * 0.25  # 15-minute intervals
-        current_state = df['Battery_State_Seasonal'].iloc[i-1]
-        new_state = current_state + energy_flow
-        
-        # Apply battery capacity constraints
-        df.loc[df.index[i], 'Battery_State_Seasonal'] = max(0, min(new_state, SEASONAL_BATTERY_CAPACITY_WH))
-        
-        # Calculate how much power was actually absorbed/provided by the battery
-        if power_difference > 0:  # Excess production (charging)
-            if current_state >= SEASONAL_BATTERY_CAPACITY_WH:  # Battery full
-                absorbed_power = 0
-            else:
-                absorbed_power = min(power_difference, (SEASONAL_BATTERY_CAPACITY_WH - current_state) / 0.25)
-            df.loc[df.index[i], 'Net_Load_Seasonal_Battery'] = -(power_difference - absorbed_power)
-        else:  # Power deficit (discharging)
-            if current_state <= 0:  # Battery empty
-                provided_power = 0
-            else:
-                provided_power = min(-power_difference, current_state / 0.25)
-            df.loc[df.index[i], 'Net_Load_Seasonal_Battery'] = power_difference + provided_power
-
     # Sort values for duration curves
     sorted_daily = np.sort(df['Net_Load_Daily_Battery'].values)[::-1]
     sorted_seasonal = np.sort(df['Net_Load_Seasonal_Battery'].values)[::-1]
+    sorted_hybrid = np.sort(df['Net_Load_Hybrid_Battery'].values)[::-1]
     
     # Create plots
     fig, (ax1, ax2, ax3) = plt.subplots(3, 1, figsize=(12, 15))
@@ -132,7 +100,7 @@ def analyze_load_duration_curves():
     plt.tight_layout()
     
     # Save the plot
-    plt.savefig(os.path.join(IMAGES_DIR, 'load_duration_curves_separate.png'), dpi=300, bbox_inches='tight')
+    plt.savefig(os.path.join(images_dir, 'load_duration_curves_separate.png'), dpi=300, bbox_inches='tight')
     
     # Also create a combined plot for comparison
     plt.figure(figsize=(12, 8))
@@ -141,6 +109,7 @@ def analyze_load_duration_curves():
              color='blue', linewidth=2)
     plt.plot(x_points, sorted_seasonal/1000, label=f'Seasonal Battery ({SEASONAL_BATTERY_CAPACITY_WH/1000/1000:.0f} MWh)', 
              color='green', linewidth=2)
+    plt.plot(x_points, sorted_hybrid/1000, label='Daily + Seasonal Battery', color='purple', linewidth=2)
     plt.axhline(y=0, color='black', linestyle='-', alpha=0.3)
     plt.grid(True, alpha=0.3)
     plt.xlabel('Duration (hours)')
@@ -149,10 +118,10 @@ def analyze_load_duration_curves():
     plt.legend()
     
     # Save the combined plot
-    plt.savefig(os.path.join(IMAGES_DIR, 'load_duration_curves_combined.png'), dpi=300, bbox_inches='tight')
+    plt.savefig(os.path.join(images_dir, 'load_duration_curves_combined.png'), dpi=300, bbox_inches='tight')
     
     # Calculate and save statistics
-    with open(os.path.join(REPORTS_DIR, 'load_duration_analysis.txt'), 'w') as f:
+    with open(os.path.join(reports_dir, 'load_duration_analysis.txt'), 'w') as f:
         f.write("Load Duration Curve Analysis\n")
         f.write("=" * 50 + "\n\n")
         
@@ -167,14 +136,15 @@ def analyze_load_duration_curves():
         
         # Create a table header for the KPIs
         f.write("\nKey Performance Indicators:\n")
-        f.write("-" * 90 + "\n")
-        f.write(f"{'Metric':<30} | {'No Battery':^18} | {'Daily Battery':^18} | {'Seasonal Battery':^18}\n")
-        f.write("-" * 90 + "\n")
+        f.write("-" * 111 + "\n")
+        f.write(f"{'Metric':<30} | {'No Battery':^18} | {'Daily Battery':^18} | {'Seasonal Battery':^18} | {'Daily + Seasonal':^18}\n")
+        f.write("-" * 111 + "\n")
         
         scenarios = {
             'No Battery': sorted_no_battery,
             'Daily Battery': sorted_daily,
-            'Seasonal Battery': sorted_seasonal
+            'Seasonal Battery': sorted_seasonal,
+            'Daily + Seasonal': sorted_hybrid
         }
         
         # Calculate KPIs for each scenario
@@ -209,9 +179,9 @@ def analyze_load_duration_curves():
         ]
         
         for metric in metrics:
-            f.write(f"{metric:<30} | {kpis['No Battery'][metric]:>18.1f} | {kpis['Daily Battery'][metric]:>18.1f} | {kpis['Seasonal Battery'][metric]:>18.1f}\n")
+            f.write(f"{metric:<30} | {kpis['No Battery'][metric]:>18.1f} | {kpis['Daily Battery'][metric]:>18.1f} | {kpis['Seasonal Battery'][metric]:>18.1f} | {kpis['Daily + Seasonal'][metric]:>18.1f}\n")
         
-        f.write("-" * 90 + "\n\n")
+        f.write("-" * 111 + "\n\n")
         
         # Add definitions
         f.write("\nMetric Definitions:\n")
@@ -221,9 +191,10 @@ def analyze_load_duration_curves():
         f.write("Grid Dependency: Hours per year when power is imported from the grid\n")
         f.write("Self-Sufficiency: Percentage of demand met by local generation\n")
         f.write("Self-Consumption: Percentage of production consumed locally\n")
+        f.write("Daily + Seasonal: Both batteries together, the daily battery is used first and not emptied daily\n")
     
     print("Load duration curve analysis complete! Results saved to:")
-    print(f"- {os.path.join(IMAGES_DIR, 'load_duration_curves.png')}")
-    print(f"- {os.path.join(REPORTS_DIR, 'load_duration_analysis.txt')}")
+    print(f"- {os.path.join(images_dir, 'load_duration_curves.png')}")
+    print(f"- {os.path.join(reports_dir, 'load_duration_analysis.txt')}")
     
     return df
@@ -3,8 +3,14 @@ import matplotlib.pyplot as plt
 import numpy as np
 from datetime import datetime, timedelta
 import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.config import MORNING_START, EVENING_START
+from utils.dataset import EnergyDataset
+from analysis.daily_sizing import daily_sizing_table, sizing_statistics
+from analysis.battery_simulation import simulate_battery_soc
 
-def calculate_realistic_battery_size():
+def calculate_realistic_battery_size(dataset=None):
     """
     Calculate a realistic battery size based on:
     1. How much energy is produced during the day
@@ -14,67 +20,24 @@ def calculate_realistic_battery_size():
     print("Starting realistic battery sizing analysis...")
     
     # Read the cleaned data
-    df = pd.read_csv('cleaned_data.csv')
-    print(f"Loaded data with {len(df)} rows")
-    
-    # Convert Time to datetime
-    df['Time'] = pd.to_datetime(df['Time'])
-    
-    # Convert negative production values to positive
-    df['Pprod(W)'] = df['Pprod(W)'].abs()
-    
-    # Calculate energy in Wh (15-minute intervals)
-    df['Energy_Production_Wh'] = df['Pprod(W)'] * 0.25
-    df['Energy_Demand_Wh'] = df['Pdemand(W)'] * 0.25
-    df['Energy_Net_Wh'] = df['Energy_Production_Wh'] - df['Energy_Demand_Wh']
+    if dataset is None:
+        dataset = EnergyDataset.load()
+    print(f"Loaded data with {len(dataset)} rows")
     
     # Define morning and evening hours based on actual solar production times
-    morning_start = 8  # 7:53 AM (average time when solar panels start producing)
-    evening_start = 18  # 6:17 PM (average time when solar panels stop producing)
-    
-    # Add time of day indicators
-    df['Hour'] = df['Time'].dt.hour
-    df['IsDay'] = (df['Hour'] >= morning_start) & (df['Hour'] < evening_start)
-    
-    # Group by date and calculate day/night energy
-    daily_data = []
+    morning_start = MORNING_START  # 7:53 AM (average time when solar panels start producing)
+    evening_start = EVENING_START  # 6:17 PM (average time when solar panels stop producing)
     
-    # Get unique dates
-    unique_dates = df['Time'].dt.date.unique()
-    print(f"Processing {len(unique_dates)} unique dates")
-    
-    for date in unique_dates:
-        day_data = df[df['Time'].dt.date == date]
-        
-        # Day energy (excess energy that could be stored)
-        day_excess = day_data[day_data['IsDay']]['Energy_Net_Wh'].sum()
-        day_excess = max(0, day_excess)  # Only consider positive excess during day
-        
-        # Night energy (deficit that needs battery)
-        night_deficit = abs(min(0, day_data[~day_data['IsDay']]['Energy_Net_Wh'].sum()))
-        
-        # Track which date this is
-        daily_data.append({
-            'Date': date,
-            'Day_Excess_Wh': day_excess,
-            'Night_Deficit_Wh': night_deficit
-        })
-    
-    # Convert to DataFrame
-    daily_df = pd.DataFrame(daily_data)
-    
-    # Calculate the ideal battery size for each day
-    # For each day, we need enough capacity to store the daytime excess
-    # and enough to cover the nighttime deficit
-    daily_df['Required_Capacity_Wh'] = daily_df.apply(
-        lambda row: min(row['Day_Excess_Wh'], row['Night_Deficit_Wh']), axis=1
-    )
+    # Day excess, night deficit and required capacity for every date
+    print(f"Processing {len(dataset.dates)} unique dates")
+    daily_df = daily_sizing_table(dataset, morning_start, evening_start)
     
     # Get statistics
-    mean_capacity = daily_df['Required_Capacity_Wh'].mean()
-    median_capacity = daily_df['Required_Capacity_Wh'].median()
-    p90_capacity = daily_df['Required_Capacity_Wh'].quantile(0.9)
-    max_capacity = daily_df['Required_Capacity_Wh'].max()
+    stats = sizing_statistics(daily_df)
+    mean_capacity = stats['mean']
+    median_capacity = stats['median']
+    p90_capacity = stats['p90']
+    max_capacity = stats['max']
     
     print(f"Analysis results:")
     print(f"Mean required capacity: {mean_capacity/1000:.2f} kWh")
@@ -87,8 +50,8 @@ def calculate_realistic_battery_size():
     winter_solstice = pd.to_datetime('2023-12-21').date()
     
     # Find closest dates
-    summer_date = min(unique_dates, key=lambda x: abs((x - summer_solstice).days))
-    winter_date = min(unique_dates, key=lambda x: abs((x - winter_solstice).days))
+    summer_date = dataset.nearest_date(summer_solstice)
+    winter_date = dataset.nearest_date(winter_solstice)
     
     # Get required capacity for these days
     summer_capacity = daily_df[daily_df['Date'] == summer_date]['Required_Capacity_Wh'].values[0]
@@ -187,17 +150,14 @@ def simulate_battery_with_realistic_size(capacity_wh):
     print(f"\nSimulating battery behavior with capacity: {capacity_wh/1000:.2f} kWh")
     
     # Read the cleaned data
-    df = pd.read_csv('cleaned_data.csv')
-    
-    # Convert Time to datetime
-    df['Time'] = pd.to_datetime(df['Time'])
+    dataset = EnergyDataset.load()
     
-    # Convert negative production values to positive
-    df['Pprod(W)'] = df['Pprod(W)'].abs()
+    # Production power as absolute values
+    df = dataset.to_frame()
     
     # Filter for June 1st (summer) and December 21st (winter)
-    summer_day = df[df['Time'].dt.date == pd.to_datetime('2023-06-01').date()]
-    winter_day = df[df['Time'].dt.date == pd.to_datetime('2023-12-21').date()]
+    summer_day = df.iloc[dataset.day_slice('2023-06-01')]
+    winter_day = df.iloc[dataset.day_slice('2023-12-21')]
     
     # Define the realistic battery capacity in Wh
     BATTERY_CAPACITY = capacity_wh
@@ -214,14 +174,11 @@ def simulate_battery_with_realistic_size(capacity_wh):
         
         # Initialize battery state at specified percentage
         initial_state = BATTERY_CAPACITY * (initial_percent / 100)
-        day_data['Battery_State_Wh'] = initial_state
         
-        # Calculate battery state over time
-        for i in range(1, len(day_data)):
-            # Calculate new state based on previous state and current flow
-            new_state = day_data['Battery_State_Wh'].iloc[i-1] + day_data['Energy_Flow_Wh'].iloc[i]
-            # Clip to battery capacity limits
-            day_data.loc[day_data.index[i], 'Battery_State_Wh'] = max(0, min(new_state, BATTERY_CAPACITY))
+        # Calculate battery state over time, clipped to battery capacity limits
+        day_data['Battery_State_Wh'] = simulate_battery_soc(
+            day_data['Energy_Flow_Wh'].to_numpy(), BATTERY_CAPACITY, initial_state
+        )
         
         # Calculate percentage of capacity
         day_data['Battery_State_Percent'] = (day_data['Battery_State_Wh'] / BATTERY_CAPACITY) * 100
@@ -341,14 +298,11 @@ def simulate_battery_with_realistic_size(capacity_wh):
         
         # Initialize battery state at specified percentage
         initial_state = BATTERY_CAPACITY * (initial_percent / 100)
-        data['Battery_State_Wh'] = initial_state
         
-        # Calculate battery state over time
-        for i in range(1, len(data)):
-            # Calculate new state based on previous state and current flow
-            new_state = data['Battery_State_Wh'].iloc[i-1] + data['Energy_Flow_Wh'].iloc[i]
-            # Clip to battery capacity limits
-            data.loc[data.index[i], 'Battery_State_Wh'] = max(0, min(new_state, BATTERY_CAPACITY))
+        # Calculate battery state over time, clipped to battery capacity limits
+        data['Battery_State_Wh'] = simulate_battery_soc(
+            data['Energy_Flow_Wh'].to_numpy(), BATTERY_CAPACITY, initial_state
+        )
         
         # Calculate percentage of capacity
         data['Battery_State_Percent'] = (data['Battery_State_Wh'] / BATTERY_CAPACITY) * 100
@@ -366,13 +320,13 @@ def simulate_battery_with_realistic_size(capacity_wh):
         return data, morning_state
     
     # Get a random full day
-    random_dates = df['Time'].dt.date.unique()
+    random_dates = dataset.dates
     if len(random_dates) > 180:
         random_date = random_dates[180]  # Middle of the year
     else:
         random_date = random_dates[0]
         
-    day_data = df[df['Time'].dt.date == random_date]
+    day_data = df.iloc[dataset.day_slice(random_date)]
     
     # Simulate with 0% initial
     sim_data, morning_state = simulate_day_night_cycle(day_data.copy(), 0)
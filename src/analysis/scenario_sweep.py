@@ -0,0 +1,156 @@
+import itertools
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+import numpy as np
+import pandas as pd
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.config import REPORTS_DIR, ensure_directories
+from utils.dataset import EnergyDataset
+from analysis.battery_simulation import BatteryProperties, DailyReset, simulate_battery_batch
+from analysis.capacity_solver import reset_segment_starts
+
+def scenario_grid(capacities_wh, initial_percents=(0, 50, 100), round_trip_efficiencies=(1.0,), reset_hours=(None,)):
+    """
+    Every combination of the given battery configurations.
+
+    Args:
+        capacities_wh (array-like): Battery capacities in Wh
+        initial_percents (array-like): Initial charge percentages (0-100)
+        round_trip_efficiencies (array-like): Round-trip efficiencies (0-1), split
+            evenly between charging and discharging
+        reset_hours (array-like): Hour at which the battery is reset every day, or
+            None for continuous operation
+
+    Returns:
+        DataFrame: One row per scenario with 'Capacity_Wh', 'Initial_Percent',
+            'Round_Trip_Efficiency' and 'Reset_Hour' (NaN = continuous)
+    """
+    rows = itertools.product(capacities_wh, initial_percents, round_trip_efficiencies, reset_hours)
+    scenarios = pd.DataFrame(rows, columns=['Capacity_Wh', 'Initial_Percent', 'Round_Trip_Efficiency', 'Reset_Hour'])
+    return scenarios.astype(np.float64)
+
+def simulate_scenarios(energy_flow_wh, scenarios, reset_rows_by_hour):
+    """
+    Simulate a table of scenarios and return one row of KPIs per scenario.
+
+    Scenarios with the same reset hour are simulated together in one batch.
+
+    Args:
+        energy_flow_wh (ndarray): Net energy per interval in Wh
+        scenarios (DataFrame): Rows from scenario_grid()
+        reset_rows_by_hour (dict): Reset rows for every reset hour used in scenarios
+
+    Returns:
+        DataFrame: 'Scenario' (index in scenarios), the scenario columns and the
+            KPIs of simulate_battery_batch()
+    """
+    results = []
+    for reset_hour, group in scenarios.groupby('Reset_Hour', dropna=False, sort=False):
+        strategy = None if np.isnan(reset_hour) else DailyReset(reset_rows_by_hour[reset_hour])
+        efficiency = np.sqrt(group['Round_Trip_Efficiency'].to_numpy())
+        kpis = simulate_battery_batch(
+            energy_flow_wh,
+            group['Capacity_Wh'].to_numpy(),
+            group['Initial_Percent'].to_numpy(),
+            strategy=strategy,
+            battery=BatteryProperties(efficiency, efficiency)
+        )
+        kpis.insert(0, 'Scenario', group.index.to_numpy())
+        kpis.insert(3, 'Round_Trip_Efficiency', group['Round_Trip_Efficiency'].to_numpy())
+        kpis.insert(4, 'Reset_Hour', reset_hour)
+        results.append(kpis)
+    return pd.concat(results, ignore_index=True)
+
+# Time series of a worker process, attached once from shared memory
+_worker_memory = None
+_worker_flow = None
+
+def _attach_shared_flow(name, length):
+    global _worker_memory, _worker_flow
+    _worker_memory = shared_memory.SharedMemory(name=name)
+    _worker_flow = np.ndarray((length,), dtype=np.float64, buffer=_worker_memory.buf)
+
+def _simulate_shard(scenarios, reset_rows_by_hour):
+    return simulate_scenarios(_worker_flow, scenarios, reset_rows_by_hour)
+
+def run_scenario_sweep(scenarios, dataset=None, max_workers=None, shard_size=64, output_path=None):
+    """
+    Simulate a grid of scenarios on a pool of worker processes.
+
+    The net energy series is placed in shared memory once and every worker
+    attaches to it, so tasks only carry their slice of the scenario table.
+    Scenarios are sorted by reset hour and split into shards; every shard is
+    one batched simulation. Results are collected as shards finish and, if
+    output_path is given, appended to a CSV file right away.
+
+    Args:
+        scenarios (DataFrame): Rows from scenario_grid()
+        dataset (EnergyDataset, optional): Preloaded dataset. If None, it is loaded from disk.
+        max_workers (int, optional): Number of worker processes (default: one per CPU)
+        shard_size (int): Scenarios per task
+        output_path (str, optional): CSV file the KPI rows are streamed to
+
+    Returns:
+        DataFrame: KPIs of every scenario, in the order of the scenario table
+    """
+    if dataset is None:
+        dataset = EnergyDataset.load()
+    flow = dataset.net_energy_wh
+
+    # Reset rows of every daily reset hour in the grid
+    reset_rows_by_hour = {
+        hour: reset_segment_starts(dataset, hour)
+        for hour in scenarios['Reset_Hour'].dropna().unique()
+    }
+
+    ordered = scenarios.sort_values('Reset_Hour', kind='stable')
+    shards = [ordered.iloc[i:i + shard_size] for i in range(0, len(ordered), shard_size)]
+
+    if output_path is not None and os.path.exists(output_path):
+        os.remove(output_path)
+
+    memory = shared_memory.SharedMemory(create=True, size=max(flow.nbytes, 1))
+    try:
+        np.ndarray(flow.shape, dtype=np.float64, buffer=memory.buf)[:] = flow
+
+        results = []
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_attach_shared_flow,
+                                 initargs=(memory.name, len(flow))) as executor:
+            futures = [
+                executor.submit(
+                    _simulate_shard, shard,
+                    {hour: rows for hour, rows in reset_rows_by_hour.items() if (shard['Reset_Hour'] == hour).any()}
+                )
+                for shard in shards
+            ]
+            for future in as_completed(futures):
+                shard_results = future.result()
+                if output_path is not None:
+                    shard_results.to_csv(output_path, mode='a', header=not results, index=False)
+                results.append(shard_results)
+    finally:
+        memory.close()
+        memory.unlink()
+
+    if not results:
+        return pd.DataFrame()
+    return pd.concat(results).sort_values('Scenario').reset_index(drop=True)
+
+if __name__ == "__main__":
+    try:
+        ensure_directories()
+        grid = scenario_grid(
+            capacities_wh=np.linspace(50, 700, 27) * 1000,
+            initial_percents=(0, 50, 100),
+            round_trip_efficiencies=(0.85, 0.9, 1.0),
+            reset_hours=(None, 8)
+        )
+        output_path = os.path.join(REPORTS_DIR, 'scenario_sweep.csv')
+        results = run_scenario_sweep(grid, output_path=output_path)
+        print(f"Simulated {len(results)} scenarios, results saved to {output_path}")
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        import traceback
+        traceback.print_exc()
@@ -3,70 +3,33 @@ import matplotlib.pyplot as plt
 import numpy as np
 from datetime import datetime, timedelta
 import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.dataset import EnergyDataset
+from analysis.daily_sizing import daily_sizing_table, sizing_statistics
 
-def calculate_realistic_battery_size():
+def calculate_realistic_battery_size(dataset=None):
     try:
         print("Starting battery sizing analysis...")
         # Read the cleaned data
-        df = pd.read_csv('cleaned_data.csv')
-        print(f"Loaded data with {len(df)} rows")
-        
-        # Convert Time to datetime
-        df['Time'] = pd.to_datetime(df['Time'])
-        
-        # Convert negative production values to positive
-        df['Pprod(W)'] = df['Pprod(W)'].abs()
-        
-        # Calculate energy in Wh (15-minute intervals)
-        df['Energy_Production_Wh'] = df['Pprod(W)'] * 0.25
-        df['Energy_Demand_Wh'] = df['Pdemand(W)'] * 0.25
-        df['Energy_Net_Wh'] = df['Energy_Production_Wh'] - df['Energy_Demand_Wh']
+        if dataset is None:
+            dataset = EnergyDataset.load()
+        print(f"Loaded data with {len(dataset)} rows")
         
         # Define morning and evening hours
         morning_start = 6  # 6 AM
         evening_start = 18  # 6 PM
         
-        # Add time of day indicators
-        df['Hour'] = df['Time'].dt.hour
-        df['IsDay'] = (df['Hour'] >= morning_start) & (df['Hour'] < evening_start)
-        
-        # Group by date and calculate day/night energy
-        daily_data = []
-        
-        # Get unique dates
-        unique_dates = df['Time'].dt.date.unique()
-        print(f"Processing {len(unique_dates)} unique dates")
-        
-        for date in unique_dates:
-            day_data = df[df['Time'].dt.date == date]
-            
-            # Day energy (excess energy that could be stored)
-            day_excess = day_data[day_data['IsDay']]['Energy_Net_Wh'].sum()
-            day_excess = max(0, day_excess)  # Only consider positive excess during day
-            
-            # Night energy (deficit that needs battery)
-            night_deficit = abs(min(0, day_data[~day_data['IsDay']]['Energy_Net_Wh'].sum()))
-            
-            # Track which date this is
-            daily_data.append({
-                'Date': date,
-                'Day_Excess_Wh': day_excess,
-                'Night_Deficit_Wh': night_deficit
-            })
-        
-        # Convert to DataFrame
-        daily_df = pd.DataFrame(daily_data)
-        
-        # Calculate the ideal battery size for each day
-        daily_df['Required_Capacity_Wh'] = daily_df.apply(
-            lambda row: min(row['Day_Excess_Wh'], row['Night_Deficit_Wh']), axis=1
-        )
+        # Day excess, night deficit and required capacity for every date
+        print(f"Processing {len(dataset.dates)} unique dates")
+        daily_df = daily_sizing_table(dataset, morning_start, evening_start)
         
         # Get statistics
-        mean_capacity = daily_df['Required_Capacity_Wh'].mean()
-        median_capacity = daily_df['Required_Capacity_Wh'].median()
-        p90_capacity = daily_df['Required_Capacity_Wh'].quantile(0.9)
-        max_capacity = daily_df['Required_Capacity_Wh'].max()
+        stats = sizing_statistics(daily_df)
+        mean_capacity = stats['mean']
+        median_capacity = stats['median']
+        p90_capacity = stats['p90']
+        max_capacity = stats['max']
         
         print(f"Analysis results:")
         print(f"Mean required capacity: {mean_capacity/1000:.2f} kWh")
@@ -1,58 +1,34 @@
-import pandas as pd
 import matplotlib.pyplot as plt
 import os
 from src.utils.config import (
-    CLEANED_DATA_PATH, 
-    IMAGES_DIR, 
-    REPORTS_DIR,
+    output_dirs,
     DAILY_BATTERY_CAPACITY_WH,
     SEASONAL_BATTERY_CAPACITY_WH
 )
+from src.utils.dataset import EnergyDataset
+from src.analysis.capacity_solver import solve_minimum_capacity
 
-def analyze_seasonal_storage():
-    """Analyze seasonal energy storage requirements."""
-    # Read the cleaned data
-    df = pd.read_csv(CLEANED_DATA_PATH)
-    
-    # Convert Time to datetime
-    df['Time'] = pd.to_datetime(df['Time'])
-    
-    # Convert negative production values to positive
-    df['Pprod(W)'] = df['Pprod(W)'].abs()
+def analyze_seasonal_storage(dataset=None, output_dir=None):
+    """
+    Analyze seasonal energy storage requirements.
     
-    # Calculate energy in Wh (15-minute intervals)
-    df['Energy_Production_Wh'] = df['Pprod(W)'] * 0.25
-    df['Energy_Demand_Wh'] = df['Pdemand(W)'] * 0.25
+    Args:
+        dataset (EnergyDataset, optional): Preloaded dataset. If None, it is loaded from disk.
+        output_dir (str, optional): Directory for the images and reports. Defaults to the configured output directories.
+    """
+    images_dir, reports_dir = output_dirs(output_dir)
     
-    # Add month and season columns
-    df['Month'] = df['Time'].dt.month
-    df['Season'] = pd.cut(df['Time'].dt.month, 
-                         bins=[0, 2, 5, 8, 11, 12],
-                         labels=['Winter1', 'Spring', 'Summer', 'Autumn', 'Winter2'],
-                         ordered=False)
+    # Read the cleaned data
+    if dataset is None:
+        dataset = EnergyDataset.load()
     
-    # Calculate seasonal totals
-    seasonal_totals = df.groupby('Season').agg({
+    # Seasonal totals from the rollups (winter = January, February and December)
+    seasonal_totals = dataset.rollup('season').groupby('Season', sort=False).agg({
         'Energy_Production_Wh': 'sum',
-        'Energy_Demand_Wh': 'sum'
+        'Energy_Demand_Wh': 'sum',
+        'Energy_Difference_Wh': 'sum'
     }).reset_index()
     
-    # Combine Winter1 and Winter2
-    winter1 = seasonal_totals[seasonal_totals['Season'] == 'Winter1']
-    winter2 = seasonal_totals[seasonal_totals['Season'] == 'Winter2']
-    winter_combined = pd.DataFrame({
-        'Season': ['Winter'],
-        'Energy_Production_Wh': [winter1['Energy_Production_Wh'].sum() + winter2['Energy_Production_Wh'].sum()],
-        'Energy_Demand_Wh': [winter1['Energy_Demand_Wh'].sum() + winter2['Energy_Demand_Wh'].sum()]
-    })
-    
-    seasonal_totals = pd.concat([
-        seasonal_totals[~seasonal_totals['Season'].isin(['Winter1', 'Winter2'])],
-        winter_combined
-    ])
-    
-    seasonal_totals['Energy_Difference_Wh'] = seasonal_totals['Energy_Production_Wh'] - seasonal_totals['Energy_Demand_Wh']
-    
     # Create visualization
     plt.figure(figsize=(15, 10))
     
@@ -83,25 +59,29 @@ def analyze_seasonal_storage():
     
     # Save results
     plt.tight_layout()
-    plt.savefig(os.path.join(IMAGES_DIR, 'seasonal_storage_analysis.png'))
+    plt.savefig(os.path.join(images_dir, 'seasonal_storage_analysis.png'))
     
     # Calculate required seasonal storage
     summer_excess = seasonal_totals[seasonal_totals['Season'] == 'Summer']['Energy_Difference_Wh'].values[0]
     winter_deficit = abs(seasonal_totals[seasonal_totals['Season'] == 'Winter']['Energy_Difference_Wh'].values[0])
     required_storage = max(winter_deficit, summer_excess)
     recommended_storage = required_storage * 1.1  # Add 10% buffer
+    
+    # Exact capacities from the 15-minute flows
+    cyclic_storage = solve_minimum_capacity(dataset, mode='cyclic')
+    continuous_storage = solve_minimum_capacity(dataset, mode='continuous')
 
     # Save detailed analysis
-    with open(os.path.join(REPORTS_DIR, 'seasonal_storage_calculations.txt'), 'w') as f:
+    with open(os.path.join(reports_dir, 'seasonal_storage_calculations.txt'), 'w') as f:
         f.write("Seasonal Storage Analysis\n")
         f.write("=" * 50 + "\n\n")
         
         # Overall statistics
         f.write("Overall Statistics:\n")
         f.write("-" * 20 + "\n")
-        f.write(f"Total Energy Produced: {df['Energy_Production_Wh'].sum()/1000:,.2f} kWh\n")
-        f.write(f"Total Energy Demanded: {df['Energy_Demand_Wh'].sum()/1000:,.2f} kWh\n")
-        f.write(f"Total Energy Difference: {(df['Energy_Production_Wh'].sum() - df['Energy_Demand_Wh'].sum())/1000:,.2f} kWh\n\n")
+        f.write(f"Total Energy Produced: {seasonal_totals['Energy_Production_Wh'].sum()/1000:,.2f} kWh\n")
+        f.write(f"Total Energy Demanded: {seasonal_totals['Energy_Demand_Wh'].sum()/1000:,.2f} kWh\n")
+        f.write(f"Total Energy Difference: {(seasonal_totals['Energy_Production_Wh'].sum() - seasonal_totals['Energy_Demand_Wh'].sum())/1000:,.2f} kWh\n\n")
         
         # Seasonal statistics
         f.write("Seasonal Statistics:\n")
@@ -118,10 +98,17 @@ def analyze_seasonal_storage():
         f.write("This includes:\n")
         f.write("1. Summer excess and winter deficit coverage\n")
         f.write("2. 10% buffer for efficiency losses\n")
-        f.write("3. Margin for variability between years\n")
+        f.write("3. Margin for variability between years\n\n")
+        
+        f.write("Exact Minimum Storage Capacity (15-minute flows):\n")
+        if cyclic_storage == float('inf'):
+            f.write("Year-round operation: not achievable, annual demand exceeds production\n")
+        else:
+            f.write(f"Year-round operation (same charge at the start of every year): {cyclic_storage/1000:,.2f} kWh\n")
+        f.write(f"Starting empty on {dataset.dates[0]} (as much demand served as with unlimited storage): {continuous_storage/1000:,.2f} kWh\n")
     
     print("Seasonal storage analysis complete! Results saved to:")
-    print(f"- {os.path.join(IMAGES_DIR, 'seasonal_storage_analysis.png')}")
-    print(f"- {os.path.join(REPORTS_DIR, 'seasonal_storage_calculations.txt')}")
+    print(f"- {os.path.join(images_dir, 'seasonal_storage_analysis.png')}")
+    print(f"- {os.path.join(reports_dir, 'seasonal_storage_calculations.txt')}")
     
     return seasonal_totals
@@ -0,0 +1,230 @@
+from concurrent.futures import ProcessPoolExecutor
+from statistics import NormalDist
+import numpy as np
+import pandas as pd
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.config import DAILY_BATTERY_CAPACITY_WH, SEASONAL_BATTERY_CAPACITY_WH, REPORTS_DIR, ensure_directories
+from utils.dataset import EnergyDataset
+from utils.rollups import SEASONS
+from analysis.capacity_solver import solve_minimum_capacity
+from analysis.daily_sizing import daily_sizing_table, sizing_statistics
+from analysis.inverse_sizing import battery_grid_kpis
+
+def day_seasons(dataset):
+    """
+    Season of every day of the dataset.
+
+    Returns:
+        ndarray: Index into SEASONS for every day
+    """
+    month_season = np.zeros(13, dtype=np.int64)
+    for season, months in enumerate(SEASONS.values()):
+        month_season[list(months)] = season
+    return month_season[dataset.month[dataset.day_starts]]
+
+def synthetic_year_rows(dataset, rng, block_days=7, day_groups=None):
+    """
+    Rows of a synthetic year built by a block bootstrap of whole days.
+
+    Every group of days (by default a season) is refilled with blocks of
+    block_days consecutive days drawn from the same group, wrapping around
+    at the end of the group. Whole days keep the intra-day shape and blocks
+    keep the day-to-day correlation of the weather within a block.
+
+    Args:
+        dataset (EnergyDataset): Dataset with (at least) one year of data
+        rng (numpy.random.Generator): Random number generator
+        block_days (int): Number of consecutive days per block
+        day_groups (array-like, optional): Group label of every day. Defaults to day_seasons().
+
+    Returns:
+        ndarray: Row positions into the dataset, day after day
+    """
+    if day_groups is None:
+        day_groups = day_seasons(dataset)
+    day_groups = np.asarray(day_groups)
+
+    chosen = np.empty(len(day_groups), dtype=np.int64)
+    for group in np.unique(day_groups):
+        days = np.flatnonzero(day_groups == group)
+        n_blocks = -(-len(days) // block_days)
+        block_starts = rng.integers(0, len(days), size=n_blocks)
+        positions = (block_starts[:, None] + np.arange(block_days)).ravel()[:len(days)] % len(days)
+        chosen[days] = days[positions]
+
+    starts = dataset.day_starts[chosen]
+    lengths = (dataset.day_ends - dataset.day_starts)[chosen]
+    offsets = np.cumsum(lengths) - lengths
+    return np.repeat(starts - offsets, lengths) + np.arange(lengths.sum())
+
+def synthetic_years(dataset, n_years, block_days=7, seed=None):
+    """
+    Row positions of several synthetic years.
+
+    The rows index any per-row array of the dataset, e.g.
+    dataset.net_energy_wh[rows] is the net energy of a synthetic year.
+
+    Args:
+        dataset (EnergyDataset): Dataset with (at least) one year of data
+        n_years (int): Number of synthetic years
+        block_days (int): Number of consecutive days per block
+        seed (int, optional): Seed of the random number generator
+
+    Returns:
+        list: One ndarray of row positions per synthetic year
+    """
+    rng = np.random.default_rng(seed)
+    return [synthetic_year_rows(dataset, rng, block_days) for _ in range(n_years)]
+
+def synthetic_dataset(dataset, rows):
+    """
+    Dataset of a synthetic year, on the calendar of the original year.
+
+    Every resampled day keeps its times of day but gets the date of the day
+    it replaces, so day-based analyses work unchanged.
+
+    Args:
+        dataset (EnergyDataset): Original dataset
+        rows (ndarray): Row positions from synthetic_year_rows()
+
+    Returns:
+        EnergyDataset: The synthetic year
+    """
+    df = dataset.df.iloc[rows].reset_index(drop=True)
+
+    # A new day starts wherever a source row is the first row of its day
+    starts_day = rows == dataset.day_starts[dataset.day_index[rows]]
+    target_day = np.cumsum(starts_day) - 1
+    source_dates = df['Time'].dt.normalize()
+    target_dates = pd.to_datetime(dataset.day_codes[target_day].astype('datetime64[D]'))
+    df['Time'] = target_dates + (df['Time'] - source_dates).to_numpy()
+    return EnergyDataset(df)
+
+def synthetic_year_sizing(dataset, rows):
+    """
+    Sizing and simulation results of one synthetic year.
+
+    Args:
+        dataset (EnergyDataset): Original dataset
+        rows (ndarray): Row positions from synthetic_year_rows()
+
+    Returns:
+        dict: Daily sizing statistics, the exact daily capacity and the
+            self-sufficiency of the configured daily and seasonal batteries
+    """
+    year = synthetic_dataset(dataset, rows)
+    stats = sizing_statistics(daily_sizing_table(year))
+    daily_kpis = battery_grid_kpis(year, DAILY_BATTERY_CAPACITY_WH, initial_percent=0, daily_reset=True)
+    seasonal_kpis = battery_grid_kpis(year, SEASONAL_BATTERY_CAPACITY_WH, initial_percent=50)
+    return {
+        'Mean_Capacity_Wh': stats['mean'],
+        'Median_Capacity_Wh': stats['median'],
+        'P90_Capacity_Wh': stats['p90'],
+        'Max_Capacity_Wh': stats['max'],
+        'Exact_Daily_Capacity_Wh': solve_minimum_capacity(year, mode='daily'),
+        'Daily_Battery_Self_Sufficiency_Percent': daily_kpis['Self_Sufficiency_Percent'].iloc[0],
+        'Seasonal_Battery_Self_Sufficiency_Percent': seasonal_kpis['Self_Sufficiency_Percent'].iloc[0],
+    }
+
+# Original dataset of a worker process, set once by _load_base_dataset
+_worker_dataset = None
+
+def _load_base_dataset(df):
+    global _worker_dataset
+    _worker_dataset = EnergyDataset(df)
+
+def _size_synthetic_year(seed, block_days):
+    rng = np.random.default_rng(seed)
+    return synthetic_year_sizing(_worker_dataset, synthetic_year_rows(_worker_dataset, rng, block_days))
+
+def run_synthetic_sizing(n_years=100, dataset=None, block_days=7, seed=None, max_workers=None):
+    """
+    Size the batteries for many synthetic years on a pool of worker processes.
+
+    Every year gets its own child seed, so the results do not depend on the
+    number of workers or the order in which the years finish.
+
+    Args:
+        n_years (int): Number of synthetic years
+        dataset (EnergyDataset, optional): Preloaded dataset. If None, it is loaded from disk.
+        block_days (int): Number of consecutive days per bootstrap block
+        seed (int, optional): Seed of the random number generator
+        max_workers (int, optional): Number of worker processes (default: one per CPU)
+
+    Returns:
+        DataFrame: One row per synthetic year with 'Year' and the results of
+            synthetic_year_sizing()
+    """
+    if dataset is None:
+        dataset = EnergyDataset.load()
+    seeds = np.random.SeedSequence(seed).spawn(n_years)
+
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_load_base_dataset,
+                             initargs=(dataset.df,)) as executor:
+        results = list(executor.map(_size_synthetic_year, seeds, [block_days] * n_years))
+
+    return pd.DataFrame(results).rename_axis('Year').reset_index()
+
+def summarize_distribution(results, confidence=0.95):
+    """
+    Distribution of every result over the synthetic years.
+
+    Args:
+        results (DataFrame): Result of run_synthetic_sizing()
+        confidence (float): Confidence level of the intervals (between 0 and 1)
+
+    Returns:
+        DataFrame: One row per result with 'Mean', 'Std', the central interval
+            of the years ('Interval_Low', 'Interval_High') and the confidence
+            interval of the mean ('Mean_CI_Low', 'Mean_CI_High')
+    """
+    if not 0 < confidence < 1:
+        raise ValueError(f"Confidence must be between 0 and 1, got {confidence}")
+    values = results.drop(columns='Year')
+    tail = (1 - confidence) / 2
+    # Normal approximation for the mean
+    z = NormalDist().inv_cdf(1 - tail)
+    standard_error = values.std() / np.sqrt(len(values))
+    return pd.DataFrame({
+        'Mean': values.mean(),
+        'Std': values.std(),
+        'Interval_Low': values.quantile(tail),
+        'Interval_High': values.quantile(1 - tail),
+        'Mean_CI_Low': values.mean() - z * standard_error,
+        'Mean_CI_High': values.mean() + z * standard_error,
+    })
+
+if __name__ == "__main__":
+    try:
+        ensure_directories()
+        dataset = EnergyDataset.load()
+        results = run_synthetic_sizing(n_years=100, dataset=dataset, seed=2023)
+        results.to_csv(os.path.join(REPORTS_DIR, 'synthetic_year_sizing.csv'), index=False)
+        confidence = 0.95
+        summary = summarize_distribution(results, confidence)
+        level = f"{confidence * 100:g}%"
+
+        with open(os.path.join(REPORTS_DIR, 'synthetic_year_sizing.txt'), 'w') as f:
+            f.write("Battery Sizing over Synthetic Weather Years\n")
+            f.write("=" * 50 + "\n\n")
+            f.write(f"Synthetic years: {len(results)} (7-day blocks of days resampled within each season)\n\n")
+            f.write(f"{'Result':<42} | {'Mean':>10} | {level + ' of years':>21} | {level + ' CI of mean':>21}\n")
+            f.write("-" * 104 + "\n")
+            for name, row in summary.iterrows():
+                scale, unit = (1 / 1000, 'kWh') if name.endswith('_Wh') else (1, '%')
+                label = f"{name.rsplit('_', 1)[0].replace('_', ' ')} ({unit})"
+                f.write(
+                    f"{label:<42} | {row['Mean']*scale:>10.2f} | "
+                    f"{row['Interval_Low']*scale:>9.2f} - {row['Interval_High']*scale:>9.2f} | "
+                    f"{row['Mean_CI_Low']*scale:>9.2f} - {row['Mean_CI_High']*scale:>9.2f}\n"
+                )
+
+        print("Synthetic year sizing complete! Results saved to:")
+        print(f"- {os.path.join(REPORTS_DIR, 'synthetic_year_sizing.csv')}")
+        print(f"- {os.path.join(REPORTS_DIR, 'synthetic_year_sizing.txt')}")
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        import traceback
+        traceback.print_exc()
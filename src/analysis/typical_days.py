@@ -0,0 +1,238 @@
+import numpy as np
+import pandas as pd
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.config import INTERVAL_HOURS, MORNING_START, EVENING_START
+from utils.dataset import EnergyDataset
+from analysis.daily_sizing import daily_sizing_table, sizing_statistics
+
+CLUSTER_METHODS = ('kmedoids', 'kmeans')
+
+def daily_profiles(dataset):
+    """
+    Production and demand energy of every day, per interval of the day.
+
+    Returns:
+        tuple: (production, demand) arrays of shape (days, intervals per day) in Wh
+    """
+    slots = int(round(24 / INTERVAL_HOURS))
+    index = dataset.day_index * slots + dataset.slot
+    size = len(dataset.day_starts) * slots
+    production = np.bincount(index, weights=dataset.energy_production_wh, minlength=size)
+    demand = np.bincount(index, weights=dataset.energy_demand_wh, minlength=size)
+    return production.reshape(-1, slots), demand.reshape(-1, slots)
+
+def _squared_distances(a, b):
+    return np.maximum((a ** 2).sum(axis=1)[:, None] - 2 * a @ b.T + (b ** 2).sum(axis=1)[None, :], 0.0)
+
+def _initial_centers(features, k, rng):
+    # k-means++ seeding: every next center is drawn with probability
+    # proportional to the squared distance to the nearest center so far
+    centers = [rng.integers(len(features))]
+    nearest = _squared_distances(features, features[centers]).min(axis=1)
+    for _ in range(1, k):
+        total = nearest.sum()
+        choice = rng.choice(len(features), p=nearest / total) if total > 0 else rng.integers(len(features))
+        centers.append(choice)
+        nearest = np.minimum(nearest, _squared_distances(features, features[[choice]])[:, 0])
+    return np.array(centers)
+
+def kmeans(features, k, rng, max_iter=100):
+    """
+    k-means clustering of the rows of a matrix.
+
+    Returns:
+        tuple: (labels, centers)
+    """
+    centers = features[_initial_centers(features, k, rng)]
+    labels = None
+    for _ in range(max_iter):
+        new_labels = _squared_distances(features, centers).argmin(axis=1)
+        if labels is not None and (new_labels == labels).all():
+            break
+        labels = new_labels
+        counts = np.bincount(labels, minlength=k)
+        sums = np.zeros_like(centers)
+        np.add.at(sums, labels, features)
+        # Empty clusters keep their previous center
+        filled = counts > 0
+        centers[filled] = sums[filled] / counts[filled, None]
+    return labels, centers
+
+def kmedoids(features, k, rng, max_iter=100):
+    """
+    k-medoids clustering (alternating assignment and medoid update) of the rows of a matrix.
+
+    Returns:
+        tuple: (labels, medoids) with medoids the row positions of the cluster centers
+    """
+    distances = np.sqrt(_squared_distances(features, features))
+    medoids = _initial_centers(features, k, rng)
+    for _ in range(max_iter):
+        labels = distances[:, medoids].argmin(axis=1)
+        labels[medoids] = np.arange(k)
+
+        # Total distance from every row to the members of every cluster; the
+        # new medoid is the member with the smallest total
+        cost = distances @ np.eye(k)[labels]
+        cost[labels[:, None] != np.arange(k)[None, :]] = np.inf
+        new_medoids = cost.argmin(axis=0)
+        if (new_medoids == medoids).all():
+            break
+        medoids = new_medoids
+    return labels, medoids
+
+class RepresentativeDays:
+    """
+    A year reduced to a few weighted representative days.
+
+    The representative days are kept in date order (the order of
+    representative_dataset()); clusters without members are dropped.
+
+    Attributes:
+        production_wh, demand_wh (ndarray): Profiles of the representative days,
+            shape (k, intervals per day)
+        weights (ndarray): Number of days every representative day stands for
+        chronology (ndarray): Representative day of every day of the year
+        days (ndarray or None): Day of the dataset every representative day is
+            (k-medoids) or None for averaged profiles (k-means)
+        day_positions (ndarray): Day of the dataset whose date every representative
+            day takes: the medoid, or the first member of the cluster
+        distances_wh (ndarray): Sum over the intervals of the absolute difference
+            between the net energy of every day and its representative day
+    """
+
+    def __init__(self, dataset, production_wh, demand_wh, chronology, days=None):
+        chronology = np.asarray(chronology)
+        weights = np.bincount(chronology, minlength=len(production_wh))
+        if days is None:
+            positions = np.full(len(weights), len(chronology))
+            np.minimum.at(positions, chronology, np.arange(len(chronology)))
+        else:
+            positions = np.asarray(days)
+
+        # Date order without empty clusters, so that the weights line up with
+        # the rows of representative_dataset() and no two share a date
+        filled = np.flatnonzero(weights > 0)
+        order = filled[np.argsort(positions[filled], kind='stable')]
+        relabel = np.empty(len(weights), dtype=np.int64)
+        relabel[order] = np.arange(len(order))
+
+        self.dataset = dataset
+        self.production_wh = production_wh[order]
+        self.demand_wh = demand_wh[order]
+        self.chronology = relabel[chronology]
+        self.days = None if days is None else positions[order]
+        self.day_positions = positions[order]
+        self.weights = weights[order]
+
+        production, demand = daily_profiles(dataset)
+        representative_net = self.net_energy_wh[self.chronology]
+        self.distances_wh = np.abs((production - demand) - representative_net).sum(axis=1)
+
+    @property
+    def net_energy_wh(self):
+        return self.production_wh - self.demand_wh
+
+    def error_bound_wh(self):
+        """
+        Bound on the error of the daily sizing statistics in reduced mode.
+
+        A day's excess and deficit change by at most the summed absolute
+        difference of its net energy, so replacing every day by its
+        representative moves every required capacity, and hence every
+        quantile and the maximum, by at most the largest distance, and the
+        mean by at most the mean distance.
+
+        Returns:
+            dict: 'max' (bound for quantiles and maximum) and 'mean' (bound for the mean) in Wh
+        """
+        return {'max': self.distances_wh.max(initial=0.0), 'mean': self.distances_wh.mean()}
+
+    def _dataset(self, day_positions, profile_days):
+        slots = self.production_wh.shape[1]
+        dates = self.dataset.day_codes[day_positions].astype('datetime64[D]').astype('datetime64[ns]')
+        offsets = (np.arange(slots) * INTERVAL_HOURS * 3600 * 1e9).astype('timedelta64[ns]')
+        return EnergyDataset(pd.DataFrame({
+            'Time': (dates[:, None] + offsets[None, :]).ravel(),
+            'Pprod(W)': self.production_wh[profile_days].ravel() / INTERVAL_HOURS,
+            'Pdemand(W)': self.demand_wh[profile_days].ravel() / INTERVAL_HOURS,
+            'Pimb': 0.0,
+        }))
+
+    def representative_dataset(self):
+        """
+        Dataset of only the representative days, one day each.
+
+        Day-based analyses run on it directly; pass weights to summarize,
+        e.g. sizing_statistics(daily_sizing_table(ds), weights=reduced.weights).
+        """
+        return self._dataset(self.day_positions, np.arange(len(self.weights)))
+
+    def expanded_dataset(self):
+        """Full-year dataset with every day replaced by its representative day, for chronological analyses."""
+        return self._dataset(np.arange(len(self.chronology)), self.chronology)
+
+def representative_days(dataset=None, k=12, method='kmedoids', seed=0):
+    """
+    Cluster the daily production and demand profiles into k representative days.
+
+    Args:
+        dataset (EnergyDataset, optional): Preloaded dataset. If None, it is loaded from disk.
+        k (int): Number of representative days
+        method (str): 'kmedoids' (representatives are real days) or 'kmeans'
+            (representatives are cluster averages)
+        seed (int): Seed of the random initialization
+
+    Returns:
+        RepresentativeDays: The reduced year
+    """
+    if method not in CLUSTER_METHODS:
+        raise ValueError(f"Unknown clustering method '{method}', expected one of {CLUSTER_METHODS}")
+    if dataset is None:
+        dataset = EnergyDataset.load()
+
+    production, demand = daily_profiles(dataset)
+    features = np.hstack((production, demand))
+    k = min(k, len(features))
+    rng = np.random.default_rng(seed)
+
+    if method == 'kmeans':
+        labels, centers = kmeans(features, k, rng)
+        slots = production.shape[1]
+        return RepresentativeDays(dataset, centers[:, :slots], centers[:, slots:], labels)
+
+    labels, medoids = kmedoids(features, k, rng)
+    return RepresentativeDays(dataset, production[medoids], demand[medoids], labels, days=medoids)
+
+def reduced_sizing_statistics(reduced, morning_start=MORNING_START, evening_start=EVENING_START):
+    """
+    Daily sizing statistics computed on the representative days only.
+
+    Args:
+        reduced (RepresentativeDays): Reduced year
+        morning_start (float): Start of the day period in decimal hours
+        evening_start (float): End of the day period in decimal hours
+
+    Returns:
+        dict: As sizing_statistics(), within reduced.error_bound_wh() of the full-year values
+    """
+    table = daily_sizing_table(reduced.representative_dataset(), morning_start, evening_start)
+    return sizing_statistics(table, weights=reduced.weights)
+
+if __name__ == "__main__":
+    try:
+        dataset = EnergyDataset.load()
+        full = sizing_statistics(daily_sizing_table(dataset))
+        print(f"{'Days':>5} | {'Mean':>9} | {'Median':>9} | {'P90':>9} | {'Max':>9} | {'Bound':>9}  (kWh)")
+        print(f"{'365':>5} | " + " | ".join(f"{full[s]/1000:>9.2f}" for s in ('mean', 'median', 'p90', 'max')))
+        for k in (8, 16, 32, 64):
+            reduced = representative_days(dataset, k=k)
+            stats = reduced_sizing_statistics(reduced)
+            print(f"{k:>5} | " + " | ".join(f"{stats[s]/1000:>9.2f}" for s in ('mean', 'median', 'p90', 'max'))
+                  + f" | {reduced.error_bound_wh()['max']/1000:>9.2f}")
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        import traceback
+        traceback.print_exc()
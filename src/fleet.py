@@ -0,0 +1,142 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import redirect_stdout
+import matplotlib.pyplot as plt
+import pandas as pd
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.config import (
+    INTERVAL_HOURS,
+    REPORTS_DIR,
+    SITES_DATA_DIR,
+    SITES_OUTPUTS_DIR,
+    ensure_directories,
+    output_dirs
+)
+from utils.data_store import list_sites
+from utils.read_csv import ingest_sites
+from utils.dataset import EnergyDataset
+from analysis.inverse_sizing import grid_exchange_totals, grid_kpi_columns
+from main import run_analyses
+
+# Scenarios of the load duration analysis summarized per site
+FLEET_SCENARIOS = {
+    'No_Battery': 'Net_Load_No_Battery',
+    'Daily_Battery': 'Net_Load_Daily_Battery',
+    'Seasonal_Battery': 'Net_Load_Seasonal_Battery',
+    'Hybrid_Battery': 'Net_Load_Hybrid_Battery'
+}
+
+def site_summary(site, dataset, results):
+    """
+    One row of the fleet summary.
+
+    Args:
+        site (str): Site name
+        dataset (EnergyDataset): Dataset of the site
+        results (dict): Result of run_analyses()
+
+    Returns:
+        dict: Period, energy totals, daily extremes, winter deficit and the
+            self-sufficiency of every battery scenario
+    """
+    daily = results['daily_totals']
+    seasonal = results['seasonal_storage'].set_index('Season')
+    production = dataset.energy_production_wh.sum()
+    demand = dataset.energy_demand_wh.sum()
+
+    summary = {
+        'Site': site,
+        'First_Date': dataset.dates[0],
+        'Last_Date': dataset.dates[-1],
+        'Days': len(dataset.dates),
+        'Production_MWh': production / 1e6,
+        'Demand_MWh': demand / 1e6,
+        'Balance_MWh': (production - demand) / 1e6,
+        'Max_Daily_Demand_kWh': daily['Energy_Demand_Wh'].max() / 1000,
+        'Max_Daily_Surplus_kWh': daily['Energy_Difference_Wh'].max() / 1000,
+        'Winter_Balance_MWh': seasonal['Energy_Difference_Wh'].get('Winter', float('nan')) / 1e6
+    }
+    for scenario, column in FLEET_SCENARIOS.items():
+        grid = -results['load_duration'][column].to_numpy() * INTERVAL_HOURS
+        kpis = grid_kpi_columns(demand, production, *grid_exchange_totals(grid))
+        summary[f'{scenario}_Self_Sufficiency_Percent'] = kpis['Self_Sufficiency_Percent']
+    return summary
+
+def analyze_site(site, sites_dir=SITES_DATA_DIR, outputs_dir=SITES_OUTPUTS_DIR):
+    """
+    Run the analyses of main.py for one site.
+
+    The images and reports go to <outputs_dir>/<site>/, the console output
+    of the analyses to <outputs_dir>/<site>/analysis.log.
+
+    Args:
+        site (str): Site name
+        sites_dir (str): Directory of the partitioned store
+        outputs_dir (str): Directory with one output directory per site
+
+    Returns:
+        dict: The site's row of the fleet summary
+    """
+    output_dir = os.path.join(outputs_dir, site)
+    for directory in output_dirs(output_dir):
+        os.makedirs(directory, exist_ok=True)
+
+    dataset = EnergyDataset.load_site(site, sites_dir=sites_dir)
+    with open(os.path.join(output_dir, 'analysis.log'), 'w') as log, redirect_stdout(log):
+        results = run_analyses(dataset, output_dir)
+
+    # Workers analyze many sites; release the figures of this one
+    plt.close('all')
+    return site_summary(site, dataset, results)
+
+def run_fleet_analysis(sites=None, sites_dir=SITES_DATA_DIR, outputs_dir=SITES_OUTPUTS_DIR, max_workers=None):
+    """
+    Analyze many sites on a pool of worker processes.
+
+    Every worker loads its site from the partitioned store itself, so only
+    site names and summary rows travel between processes. A failing site is
+    reported and left out of the summary instead of stopping the fleet.
+
+    Args:
+        sites (list, optional): Sites to analyze. Defaults to every site in the store.
+        sites_dir (str): Directory of the partitioned store
+        outputs_dir (str): Directory with one output directory per site
+        max_workers (int, optional): Number of worker processes (default: one per CPU)
+
+    Returns:
+        DataFrame: One row per site (see site_summary), sorted by site
+    """
+    if sites is None:
+        sites = list_sites(sites_dir)
+
+    rows = []
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(analyze_site, site, sites_dir, outputs_dir): site for site in sites}
+        for future in as_completed(futures):
+            try:
+                rows.append(future.result())
+                print(f"Analyzed site {futures[future]} ({len(rows)}/{len(sites)})")
+            except Exception as e:
+                print(f"Error analyzing site {futures[future]}: {str(e)}")
+
+    if not rows:
+        return pd.DataFrame(columns=['Site'])
+    return pd.DataFrame(rows).sort_values('Site', ignore_index=True)
+
+if __name__ == "__main__":
+    try:
+        ensure_directories()
+        if '--ingest' in sys.argv[1:]:
+            # Clean every raw export in RAW_SITES_DIR into the partitioned store first
+            for site, rows in ingest_sites().items():
+                print(f"Ingested {rows} rows for site {site}")
+        summary = run_fleet_analysis()
+        summary.to_csv(os.path.join(REPORTS_DIR, 'fleet_summary.csv'), index=False)
+        print(summary.to_string(index=False))
+        print(f"\nFleet summary saved to: {os.path.join(REPORTS_DIR, 'fleet_summary.csv')}")
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        import traceback
+        traceback.print_exc()
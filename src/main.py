@@ -3,34 +3,59 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from utils.config import ensure_directories
+from utils.dataset import EnergyDataset
 from analysis.daily_energy_analysis import analyze_daily_energy
 from analysis.storage_analysis import analyze_seasonal_storage
 from analysis.battery_analysis import analyze_battery_sizing
 from analysis.load_duration_analysis import analyze_load_duration_curves
 from visualization.solstice_visualization import create_solstice_comparison
 
-def main():
-    """Run all analyses in the correct sequence."""
-    # Ensure output directories exist
-    ensure_directories()
+def run_analyses(dataset, output_dir=None):
+    """
+    Run all analyses on one dataset in the correct sequence.
     
-    # Run analyses
+    Args:
+        dataset (EnergyDataset): Dataset to analyze
+        output_dir (str, optional): Directory for the images and reports. Defaults to the configured output directories.
+    
+    Returns:
+        dict: Result of every analysis
+    """
     print("Starting energy analysis...")
-    daily_totals = analyze_daily_energy()
+    daily_totals = analyze_daily_energy(dataset, output_dir)
     
     print("\nCreating solstice comparison...")
-    solstice_data = create_solstice_comparison()
+    solstice_data = create_solstice_comparison(dataset, output_dir)
     
     print("\nAnalyzing battery sizing requirements...")
-    battery_sizing_results = analyze_battery_sizing()
+    battery_sizing_results = analyze_battery_sizing(dataset, output_dir)
     
     print("\nAnalyzing seasonal storage requirements...")
-    seasonal_results = analyze_seasonal_storage()
+    seasonal_results = analyze_seasonal_storage(dataset, output_dir)
     
     print("\nGenerating load duration curves...")
-    load_duration_results = analyze_load_duration_curves()
+    load_duration_results = analyze_load_duration_curves(dataset, output_dir)
     
-    print("\nAll analyses complete!")
+    return {
+        'daily_totals': daily_totals,
+        'solstice': solstice_data,
+        'battery_sizing': battery_sizing_results,
+        'seasonal_storage': seasonal_results,
+        'load_duration': load_duration_results
+    }
+
+def main():
+    """Run all analyses in the correct sequence."""
+    # Ensure output directories exist
+    ensure_directories()
+    
+    # Load the dataset once and share it between all analyses
+    dataset = EnergyDataset.load()
     
+    # Run analyses
+    run_analyses(dataset)
+    
+    print("\nAll analyses complete!")
+
 if __name__ == "__main__":
     main()
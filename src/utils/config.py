@@ -11,16 +11,47 @@ REPORTS_DIR = os.path.join(OUTPUTS_DIR, 'reports')
 
 # Data files
 CLEANED_DATA_PATH = os.path.join(DATA_DIR, 'cleaned_data.csv')
+CLEANED_DATA_STORE_DIR = os.path.join(DATA_DIR, 'cleaned_data_columns')  # Typed columnar copy of the cleaned data
+ROLLUPS_DIR = os.path.join(DATA_DIR, 'cleaned_data_rollups')  # Day/week/month/season aggregates of the cleaned data
 RAW_DATA_PATH = os.path.join(PROJECT_ROOT, 'src', 'data', 'Aardehuizen_15min_ 2023 MMC dataset.csv')
+INGEST_STATE_PATH = os.path.join(DATA_DIR, 'ingest_state.json')  # Position in the raw CSV up to which rows were cleaned
+
+# Multi-site data: one raw export per site (<site>.csv), cleaned into one
+# columnar partition per site and year (sites/<site>/<year>/)
+RAW_SITES_DIR = os.path.join(PROJECT_ROOT, 'src', 'data', 'sites')
+SITES_DATA_DIR = os.path.join(DATA_DIR, 'sites')
+SITES_OUTPUTS_DIR = os.path.join(OUTPUTS_DIR, 'sites')  # Images and reports per site
+
+# Length of one measurement interval in hours (15-minute data)
+INTERVAL_HOURS = 0.25
 
 # Analysis dates
 SUMMER_SOLSTICE = '2023-06-01'  # Sample summer day
 WINTER_SOLSTICE = '2023-12-21'  # Sample winter day
 
+# Day/night boundaries for daily battery sizing (hours, based on solar production analysis)
+MORNING_START = 8  # 7:53 AM (average time when solar panels start producing)
+EVENING_START = 18  # 6:17 PM (average time when solar panels stop producing)
+
 # Battery configurations
 DAILY_BATTERY_CAPACITY_WH = 240 * 1000  # 240 kWh in Wh
 SEASONAL_BATTERY_CAPACITY_WH = 40 * 1000 * 1000  # 40 MWh in Wh
 
+def output_dirs(output_dir=None):
+    """
+    Return the images and reports directories.
+
+    Args:
+        output_dir (str, optional): Directory to write to instead of OUTPUTS_DIR,
+            e.g. the output directory of one site
+
+    Returns:
+        tuple: (images directory, reports directory)
+    """
+    if output_dir is None:
+        return IMAGES_DIR, REPORTS_DIR
+    return os.path.join(output_dir, 'images'), os.path.join(output_dir, 'reports')
+
 def ensure_directories():
     """Create output directories if they don't exist"""
     for directory in [DATA_DIR, IMAGES_DIR, REPORTS_DIR]:
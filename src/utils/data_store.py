@@ -0,0 +1,190 @@
+import json
+import numpy as np
+import pandas as pd
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.config import CLEANED_DATA_PATH, CLEANED_DATA_STORE_DIR, SITES_DATA_DIR
+
+# Column layout of the columnar store. Timestamps are stored as int64
+# nanoseconds since the epoch, power columns as float64.
+STORE_COLUMNS = {
+    'Time': 'int64',
+    'Pprod(W)': 'float64',
+    'Pdemand(W)': 'float64',
+    'Pimb': 'float64',
+}
+META_FILE = 'meta.json'
+
+def _column_path(store_dir, column):
+    """Return the file holding one column of the store."""
+    return os.path.join(store_dir, f"{column}.{STORE_COLUMNS[column]}")
+
+def _source_signature(source_path):
+    """Return the size and modification time used to detect a stale store."""
+    stat = os.stat(source_path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+def write_columnar_store(df, store_dir=CLEANED_DATA_STORE_DIR, source_path=CLEANED_DATA_PATH):
+    """
+    Write the cleaned data as one raw binary file per column.
+
+    Args:
+        df (DataFrame): Cleaned data with a datetime 'Time' column and the power columns
+        store_dir (str): Directory of the columnar store
+        source_path (str): CSV the store was derived from, used for the staleness check
+    """
+    os.makedirs(store_dir, exist_ok=True)
+
+    for column, dtype in STORE_COLUMNS.items():
+        if column == 'Time':
+            values = df['Time'].to_numpy(dtype='datetime64[ns]').view('int64')
+        else:
+            values = df[column].to_numpy(dtype=dtype)
+        values.tofile(_column_path(store_dir, column))
+
+    meta = {'rows': len(df), 'columns': STORE_COLUMNS}
+    if source_path is not None and os.path.exists(source_path):
+        meta['source'] = _source_signature(source_path)
+    with open(os.path.join(store_dir, META_FILE), 'w') as f:
+        json.dump(meta, f, indent=2)
+
+def append_columnar_store(df, store_dir=CLEANED_DATA_STORE_DIR, source_path=CLEANED_DATA_PATH):
+    """
+    Append rows to the columnar store without rewriting the existing rows.
+
+    Args:
+        df (DataFrame): New rows, later than every row in the store
+        store_dir (str): Directory of the columnar store
+        source_path (str): CSV the store was derived from (already holding the new rows)
+    """
+    meta_path = os.path.join(store_dir, META_FILE)
+    with open(meta_path) as f:
+        meta = json.load(f)
+
+    for column, dtype in STORE_COLUMNS.items():
+        if column == 'Time':
+            values = df['Time'].to_numpy(dtype='datetime64[ns]').view('int64')
+        else:
+            values = df[column].to_numpy(dtype=dtype)
+        with open(_column_path(store_dir, column), 'ab') as f:
+            values.tofile(f)
+
+    meta['rows'] += len(df)
+    if source_path is not None and os.path.exists(source_path):
+        meta['source'] = _source_signature(source_path)
+    with open(meta_path, 'w') as f:
+        json.dump(meta, f, indent=2)
+
+def is_store_stale(store_dir=CLEANED_DATA_STORE_DIR, source_path=CLEANED_DATA_PATH):
+    """
+    Check whether the columnar store is missing or older than its source CSV.
+
+    Returns:
+        bool: True if the store has to be rebuilt from the CSV
+    """
+    meta_path = os.path.join(store_dir, META_FILE)
+    if not os.path.exists(meta_path):
+        return True
+    with open(meta_path) as f:
+        meta = json.load(f)
+    if meta.get('columns') != STORE_COLUMNS:
+        return True
+    if source_path is not None and os.path.exists(source_path):
+        return meta.get('source') != _source_signature(source_path)
+    return False
+
+def read_columnar_store(store_dir=CLEANED_DATA_STORE_DIR):
+    """
+    Read the columnar store without any text parsing.
+
+    Returns:
+        DataFrame: Cleaned data with the same columns as cleaned_data.csv
+    """
+    with open(os.path.join(store_dir, META_FILE)) as f:
+        meta = json.load(f)
+
+    columns = {}
+    for column, dtype in STORE_COLUMNS.items():
+        values = np.fromfile(_column_path(store_dir, column), dtype=dtype, count=meta['rows'])
+        if column == 'Time':
+            values = values.view('datetime64[ns]')
+        columns[column] = values
+    return pd.DataFrame(columns)
+
+def load_cleaned_data(store_dir=CLEANED_DATA_STORE_DIR, source_path=CLEANED_DATA_PATH):
+    """
+    Load the cleaned dataset, preferring the columnar store.
+
+    The CSV is only parsed when the store is missing or stale, in which case
+    the store is rebuilt so the next load is cheap again.
+
+    Returns:
+        DataFrame: Cleaned data with a datetime 'Time' column and the power columns
+    """
+    if not is_store_stale(store_dir, source_path):
+        return read_columnar_store(store_dir)
+
+    df = pd.read_csv(source_path)
+    df['Time'] = pd.to_datetime(df['Time'], format='ISO8601')
+    write_columnar_store(df, store_dir, source_path)
+    return df
+
+def site_partition_dir(site, year, sites_dir=SITES_DATA_DIR):
+    """Return the columnar store holding one year of one site."""
+    return os.path.join(sites_dir, site, str(year))
+
+def site_rollups_dir(site, sites_dir=SITES_DATA_DIR):
+    """Return the directory of the persisted rollups of one site."""
+    return os.path.join(sites_dir, site, 'rollups')
+
+def list_sites(sites_dir=SITES_DATA_DIR):
+    """
+    List the sites in the partitioned store.
+
+    Returns:
+        list: Sorted site names
+    """
+    if not os.path.isdir(sites_dir):
+        return []
+    return sorted(site for site in os.listdir(sites_dir) if site_years(site, sites_dir))
+
+def site_years(site, sites_dir=SITES_DATA_DIR):
+    """
+    List the years stored for a site.
+
+    Returns:
+        list: Sorted years with a complete partition
+    """
+    directory = os.path.join(sites_dir, site)
+    if not os.path.isdir(directory):
+        return []
+    return sorted(
+        int(name) for name in os.listdir(directory)
+        if name.isdigit() and os.path.exists(os.path.join(directory, name, META_FILE))
+    )
+
+def load_site_data(site, years=None, sites_dir=SITES_DATA_DIR):
+    """
+    Load the cleaned data of one site from its year partitions.
+
+    Args:
+        site (str): Site name
+        years (iterable, optional): Years to load. Defaults to all stored years.
+        sites_dir (str): Directory of the partitioned store
+
+    Returns:
+        DataFrame: Cleaned data with the same columns as cleaned_data.csv
+    """
+    stored = site_years(site, sites_dir)
+    if not stored:
+        raise ValueError(f"Unknown site '{site}' in {sites_dir}")
+    if years is None:
+        years = stored
+    missing = sorted(set(years) - set(stored))
+    if missing:
+        raise ValueError(f"Site '{site}' has no data for {missing}, stored years are {stored}")
+    return pd.concat(
+        [read_columnar_store(site_partition_dir(site, year, sites_dir)) for year in sorted(years)],
+        ignore_index=True
+    )
@@ -0,0 +1,359 @@
+from functools import cached_property
+import numpy as np
+import pandas as pd
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.config import INTERVAL_HOURS, SITES_DATA_DIR
+from utils.data_store import load_cleaned_data, load_site_data, site_rollups_dir
+from utils.rollups import ROLLUP_GRANULARITIES, compute_rollup, store_rollups_dir, stored_rollups
+
+PROFILE_PERIODS = ('month', 'week', 'day_of_year')
+
+# Default of EnergyDataset.load(): the rollups directory of the loaded store
+_STORE_ROLLUPS = object()
+
+class ProfileCube:
+    """
+    Production, demand and net energy per period and interval of the day.
+
+    Every array has one row per period in `periods` and one column per
+    interval of the day. The cube is built with one bincount per quantity
+    over the combined (period, interval) index.
+    """
+
+    def __init__(self, period, slot, production_wh, demand_wh):
+        """
+        Args:
+            period (ndarray): Period (e.g. month) of every row
+            slot (ndarray): Interval of the day of every row
+            production_wh (ndarray): Production per row in Wh
+            demand_wh (ndarray): Demand per row in Wh
+        """
+        slots = int(round(24 / INTERVAL_HOURS))
+        self.periods = np.unique(period)
+        index = np.searchsorted(self.periods, period) * slots + slot
+        size = len(self.periods) * slots
+
+        self.counts = np.bincount(index, minlength=size).reshape(-1, slots)
+        self.production_wh = np.bincount(index, weights=production_wh, minlength=size).reshape(-1, slots)
+        self.demand_wh = np.bincount(index, weights=demand_wh, minlength=size).reshape(-1, slots)
+        self.net_wh = self.production_wh - self.demand_wh
+
+    def mean_power_w(self, quantity='production'):
+        """
+        Mean power of every cell.
+
+        Args:
+            quantity (str): 'production', 'demand' or 'net'
+
+        Returns:
+            ndarray: Mean power in W (NaN for cells without data)
+        """
+        totals = {'production': self.production_wh, 'demand': self.demand_wh, 'net': self.net_wh}[quantity]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return totals / self.counts / INTERVAL_HOURS
+
+class EnergyDataset:
+    """
+    The cleaned 15-minute dataset, loaded once and shared between analyses.
+
+    Derived arrays (absolute production, energies in Wh, time components, ...)
+    are computed the first time they are used and cached, so running the
+    whole pipeline reads the data from disk once and derives every column once.
+    """
+
+    def __init__(self, df):
+        """
+        Args:
+            df (DataFrame): Cleaned data with 'Time', 'Pprod(W)', 'Pdemand(W)' and 'Pimb' columns
+        """
+        # The day index relies on chronological order
+        if not df['Time'].is_monotonic_increasing:
+            df = df.sort_values('Time', kind='stable')
+        self.df = df.reset_index(drop=True)
+        # Directory of the persisted rollups; None keeps them in memory only
+        self.rollups_dir = None
+
+    @classmethod
+    def load(cls, rollups_dir=_STORE_ROLLUPS, **kwargs):
+        """
+        Load the dataset from the cleaned data store (see load_cleaned_data).
+
+        Args:
+            rollups_dir (str, optional): Directory of the persisted rollups of
+                the cleaned data, read when they match the loaded rows. Defaults
+                to the rollups of the loaded store (see store_rollups_dir); None
+                computes the rollups in memory only.
+            **kwargs: store_dir and source_path of the store, see load_cleaned_data
+        """
+        if rollups_dir is _STORE_ROLLUPS:
+            rollups_dir = store_rollups_dir(**kwargs)
+        dataset = cls(load_cleaned_data(**kwargs))
+        dataset.rollups_dir = rollups_dir
+        return dataset
+
+    @classmethod
+    def load_site(cls, site, years=None, sites_dir=SITES_DATA_DIR):
+        """
+        Load one site from the partitioned multi-site store (see load_site_data).
+
+        The rollups persisted next to the partitions by ingest_site() are
+        used when all years of the site are loaded.
+
+        Args:
+            site (str): Site name
+            years (iterable, optional): Years to load. Defaults to all stored years.
+            sites_dir (str): Directory of the partitioned store
+        """
+        dataset = cls(load_site_data(site, years, sites_dir))
+        if years is None:
+            dataset.rollups_dir = site_rollups_dir(site, sites_dir)
+        return dataset
+
+    def __len__(self):
+        return len(self.df)
+
+    # Power and energy
+
+    @cached_property
+    def time(self):
+        """Timestamps as a datetime Series named 'Time'."""
+        return self.df['Time']
+
+    @cached_property
+    def production_w(self):
+        """Production power in W (negative raw values converted to positive)."""
+        return np.abs(self.df['Pprod(W)'].to_numpy(dtype=np.float64))
+
+    @cached_property
+    def demand_w(self):
+        """Demand power in W."""
+        return self.df['Pdemand(W)'].to_numpy(dtype=np.float64)
+
+    @cached_property
+    def energy_production_wh(self):
+        """Produced energy per interval in Wh."""
+        return self.production_w * INTERVAL_HOURS
+
+    @cached_property
+    def energy_demand_wh(self):
+        """Demanded energy per interval in Wh."""
+        return self.demand_w * INTERVAL_HOURS
+
+    @cached_property
+    def net_energy_wh(self):
+        """Production minus demand per interval in Wh (positive = surplus)."""
+        return self.energy_production_wh - self.energy_demand_wh
+
+    @cached_property
+    def net_load_w(self):
+        """Demand minus production in W (positive = grid import without storage)."""
+        return self.demand_w - self.production_w
+
+    # Time components
+
+    @cached_property
+    def hour(self):
+        return self.time.dt.hour.to_numpy()
+
+    @cached_property
+    def minute(self):
+        return self.time.dt.minute.to_numpy()
+
+    @cached_property
+    def time_of_day(self):
+        """Time of day in decimal hours."""
+        return self.hour + self.minute / 60
+
+    @cached_property
+    def month(self):
+        return self.time.dt.month.to_numpy()
+
+    @cached_property
+    def day_of_year(self):
+        return self.time.dt.dayofyear.to_numpy()
+
+    @cached_property
+    def week(self):
+        """ISO week number."""
+        return self.time.dt.isocalendar().week.to_numpy(dtype=np.int64)
+
+    @cached_property
+    def slot(self):
+        """Interval of the day (0 = the first interval after midnight)."""
+        slots = int(round(24 / INTERVAL_HOURS))
+        return np.minimum((self.time_of_day / INTERVAL_HOURS + 1e-9).astype(np.int64), slots - 1)
+
+    @cached_property
+    def date_codes(self):
+        """Calendar day of every interval as days since the epoch."""
+        return self.time.to_numpy(dtype='datetime64[ns]').astype('datetime64[D]').astype(np.int64)
+
+    # Day index
+
+    @cached_property
+    def day_starts(self):
+        """First row of every calendar day in `dates`."""
+        codes = self.date_codes
+        if len(codes) == 0:
+            return np.zeros(0, dtype=np.int64)
+        return np.flatnonzero(np.concatenate(([True], codes[1:] != codes[:-1])))
+
+    @cached_property
+    def day_ends(self):
+        """Row after the last row of every calendar day in `dates`."""
+        return np.append(self.day_starts[1:], len(self)).astype(np.int64)
+
+    @cached_property
+    def day_codes(self):
+        """Calendar days present in the data as days since the epoch."""
+        return self.date_codes[self.day_starts]
+
+    @cached_property
+    def day_index(self):
+        """Position of every interval's calendar day in `dates`."""
+        return np.repeat(np.arange(len(self.day_starts)), self.day_ends - self.day_starts)
+
+    @cached_property
+    def dates(self):
+        """Sorted unique calendar dates as datetime.date objects."""
+        return pd.to_datetime(self.day_codes.astype('datetime64[D]')).date
+
+    @cached_property
+    def _day_positions(self):
+        return {code: i for i, code in enumerate(self.day_codes.tolist())}
+
+    @staticmethod
+    def _to_day_code(date):
+        return int(np.datetime64(pd.Timestamp(date).date(), 'D').astype(np.int64))
+
+    def day_slice(self, date):
+        """
+        Rows of one calendar day as a slice.
+
+        Args:
+            date: Date as string, datetime.date or Timestamp
+
+        Returns:
+            slice: Row range of the day (empty if the day is not in the data)
+        """
+        position = self._day_positions.get(self._to_day_code(date))
+        if position is None:
+            return slice(0, 0)
+        return slice(int(self.day_starts[position]), int(self.day_ends[position]))
+
+    def date_range_slice(self, start_date, end_date):
+        """
+        Rows from start_date up to and including end_date as a slice.
+
+        Returns:
+            slice: Row range covering the requested days
+        """
+        first = np.searchsorted(self.day_codes, self._to_day_code(start_date), side='left')
+        last = np.searchsorted(self.day_codes, self._to_day_code(end_date), side='right')
+        if last <= first:
+            return slice(0, 0)
+        return slice(int(self.day_starts[first]), int(self.day_ends[last - 1]))
+
+    def nearest_date(self, date):
+        """Return the date in the data closest to the given date."""
+        code = self._to_day_code(date)
+        position = np.searchsorted(self.day_codes, code)
+        candidates = [p for p in (position - 1, position) if 0 <= p < len(self.day_codes)]
+        best = min(candidates, key=lambda p: abs(self.day_codes[p] - code))
+        return self.dates[best]
+
+    # Profiles
+
+    @cached_property
+    def _profile_cubes(self):
+        return {}
+
+    def profile_cube(self, by='month'):
+        """
+        Energy per period and interval of the day, computed once per period type.
+
+        Args:
+            by (str): 'month', 'week' or 'day_of_year'
+
+        Returns:
+            ProfileCube: Totals for every (period, interval of the day) cell
+        """
+        if by not in PROFILE_PERIODS:
+            raise ValueError(f"Unknown profile period '{by}', expected one of {PROFILE_PERIODS}")
+        if by not in self._profile_cubes:
+            self._profile_cubes[by] = ProfileCube(
+                getattr(self, by), self.slot, self.energy_production_wh, self.energy_demand_wh
+            )
+        return self._profile_cubes[by]
+
+    # Rollups
+
+    @cached_property
+    def _rollups(self):
+        # Loaded datasets read the rollups persisted by the ingestion if they
+        # match the data; otherwise each granularity is computed on first use
+        # and kept in memory, so reading never writes to the store
+        if self.rollups_dir is not None:
+            stored = stored_rollups(self, self.rollups_dir)
+            if stored is not None:
+                return stored
+        return {}
+
+    def rollup(self, granularity='day'):
+        """
+        Aggregates of production, demand and net power per period.
+
+        Args:
+            granularity (str): 'day', 'week', 'month' or 'season'
+
+        Returns:
+            DataFrame: One row per period, see compute_rollup()
+        """
+        if granularity not in ROLLUP_GRANULARITIES:
+            raise ValueError(f"Unknown rollup granularity '{granularity}', expected one of {ROLLUP_GRANULARITIES}")
+        if granularity not in self._rollups:
+            self._rollups[granularity] = compute_rollup(self, granularity)
+        return self._rollups[granularity].copy()
+
+    # Frames
+
+    @cached_property
+    def _daily_totals(self):
+        daily = self.rollup('day')
+        return daily[['Time', 'Energy_Production_Wh', 'Energy_Demand_Wh', 'Energy_Difference_Wh']]
+
+    def daily_totals(self):
+        """
+        Daily production and demand totals.
+
+        Returns:
+            DataFrame: Columns 'Time' (date), 'Energy_Production_Wh',
+                'Energy_Demand_Wh' and 'Energy_Difference_Wh'
+        """
+        return self._daily_totals.copy()
+
+    def to_frame(self, rows=slice(None)):
+        """
+        Return a new DataFrame with the standard preprocessed columns.
+
+        The frame can be modified freely by the caller; the shared arrays are
+        not affected.
+
+        Args:
+            rows (slice, optional): Row range to include, e.g. from day_slice().
+                Defaults to all rows.
+
+        Returns:
+            DataFrame: 'Time', 'Pprod(W)' (absolute), 'Pdemand(W)', 'Pimb',
+                'Energy_Production_Wh' and 'Energy_Demand_Wh'
+        """
+        return pd.DataFrame({
+            'Time': self.time.iloc[rows],
+            'Pprod(W)': self.production_w[rows],
+            'Pdemand(W)': self.demand_w[rows],
+            'Pimb': self.df['Pimb'].to_numpy()[rows],
+            'Energy_Production_Wh': self.energy_production_wh[rows],
+            'Energy_Demand_Wh': self.energy_demand_wh[rows],
+        }, copy=True)
@@ -1,36 +1,409 @@
+from concurrent.futures import ProcessPoolExecutor
+import io
+import json
+import shutil
+import numpy as np
 import pandas as pd
 import os
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from utils.config import RAW_DATA_PATH, CLEANED_DATA_PATH, ensure_directories
+from utils.config import (
+    RAW_DATA_PATH,
+    CLEANED_DATA_PATH,
+    CLEANED_DATA_STORE_DIR,
+    INGEST_STATE_PATH,
+    INTERVAL_HOURS,
+    RAW_SITES_DIR,
+    SITES_DATA_DIR,
+    ensure_directories
+)
+from utils.data_store import (
+    append_columnar_store,
+    is_store_stale,
+    load_cleaned_data,
+    site_partition_dir,
+    site_rollups_dir,
+    write_columnar_store
+)
+from utils.dataset import EnergyDataset
+from utils.rollups import store_rollups_dir, update_rollups
 
-def read_csv_file():
-    """Read and clean the raw Aardehuizen dataset."""
+RAW_COLUMNS = ['Time', 'Pprod(W)', 'Pdemand(W)', 'Pimb']
+RAW_TIME_FORMAT = '%d/%m/%Y %H:%M'
+
+# Rows per chunk when streaming the raw CSV
+RAW_CHUNK_ROWS = 100000
+
+# Summary rows the export appends after the measurements
+SUMMARY_LABELS = ('Time Interval', 'Energy Production', 'Energy Demand', 'Total Energy Imbalance', '% Overproduction')
+
+# Byte positions of 'dd/mm/YYYY HH:MM' rearranged into ISO 8601 'YYYY-mm-ddTHH:MM'
+_ISO_ORDER = [6, 7, 8, 9, 2, 3, 4, 2, 0, 1, 10, 11, 12, 13, 14, 15]
+_DIGIT_POSITIONS = [0, 1, 3, 4, 6, 7, 8, 9, 11, 12, 14, 15]
+
+def _parse_raw_times(times):
+    """
+    Parse raw timestamps in RAW_TIME_FORMAT.
+    
+    Well-formed fixed-width timestamps are rearranged byte-wise into ISO 8601
+    and converted by numpy in one step. Everything else (the summary rows,
+    unpadded or invalid timestamps) goes through pandas with the explicit
+    format. Values that do not parse become NaT, see _clean_raw_rows().
+    
+    Args:
+        times (Series): Raw timestamp strings
+    
+    Returns:
+        Series: datetime64 timestamps with the same index
+    """
+    parsed = np.full(len(times), np.datetime64('NaT'), dtype='datetime64[ns]')
+    try:
+        # One byte more than a timestamp, so longer values are recognized
+        codes = times.to_numpy(dtype=object).astype('S17').view(np.uint8).reshape(len(times), 17)
+    except (UnicodeEncodeError, ValueError):
+        codes = np.zeros((len(times), 17), dtype=np.uint8)
+    digits = codes[:, _DIGIT_POSITIONS]
+    fixed = (
+        ((digits >= ord('0')) & (digits <= ord('9'))).all(axis=1)
+        & (codes[:, 2] == ord('/')) & (codes[:, 5] == ord('/'))
+        & (codes[:, 10] == ord(' ')) & (codes[:, 13] == ord(':')) & (codes[:, 16] == 0)
+    )
+    
+    iso = np.ascontiguousarray(codes[fixed][:, _ISO_ORDER])
+    iso[:, [4, 7]] = ord('-')
+    iso[:, 10] = ord('T')
+    try:
+        parsed[fixed] = iso.view('S16').ravel().astype('datetime64[m]')
+    except ValueError:
+        # An impossible date such as 31/02; let pandas handle every row
+        fixed[:] = False
+    
+    other = ~fixed
+    if other.any():
+        parsed[other] = pd.to_datetime(times[other], format=RAW_TIME_FORMAT, errors='coerce').to_numpy(dtype='datetime64[ns]')
+    return pd.Series(parsed, index=times.index)
+
+def _clean_raw_rows(df):
+    """
+    Drop the summary rows and convert the raw columns to datetimes and floats.
+    
+    Raises:
+        ValueError: If a timestamp other than a summary label does not parse
+    """
+    df = df.copy()
+    
+    # Convert Time column to datetime; the summary rows hold a label instead
+    # of a timestamp, so they become NaT and are dropped with the other
+    # incomplete rows below. Any other value that does not parse means the
+    # file is corrupted, so it is an error rather than a shorter dataset
+    raw_times = df['Time']
+    df['Time'] = _parse_raw_times(raw_times)
+    unparsed = raw_times[df['Time'].isna() & raw_times.notna()].astype(str)
+    invalid = unparsed[~unparsed.str.startswith(SUMMARY_LABELS)]
+    if len(invalid):
+        raise ValueError(f"{len(invalid)} raw timestamps do not match '{RAW_TIME_FORMAT}', "
+                         f"first {invalid.iloc[0]!r} at row {invalid.index[0]}")
+    
+    # Convert numeric columns to float
+    numeric_columns = ['Pprod(W)', 'Pdemand(W)', 'Pimb']
+    for col in numeric_columns:
+        df[col] = pd.to_numeric(df[col], errors='coerce')
+    
+    # Remove any rows with NaN values
+    return df.dropna()
+
+def _last_data_line(data):
+    """
+    Locate the last measurement line of raw CSV bytes.
+    
+    Returns:
+        tuple: (start, end) byte offsets of the line including its newline,
+            (0, 0) if there is none
+    """
+    end = len(data)
+    while end > 0:
+        start = data.rfind(b'\n', 0, end - 1) + 1
+        line = data[start:end].decode('utf-8', errors='replace').strip()
+        if line and not line.startswith(SUMMARY_LABELS) and not line.startswith('Time,'):
+            return start, end
+        end = start
+    return 0, 0
+
+def _last_raw_line(raw_path):
+    """
+    Find the last measurement line of the raw CSV by reading back from its end.
+    
+    Returns:
+        tuple: (byte offset after the line, line bytes), (0, b'') if there is none
+    """
+    size = os.path.getsize(raw_path)
+    block = 1 << 16
+    with open(raw_path, 'rb') as f:
+        while True:
+            start = max(size - block, 0)
+            f.seek(start)
+            data = f.read(size - start)
+            line_start, line_end = _last_data_line(data)
+            # A line at the very start of the block may be cut off
+            if line_end and (line_start > 0 or start == 0):
+                return start + line_end, data[line_start:line_end]
+            if start == 0:
+                return 0, b''
+            block *= 4
+
+def _write_ingest_state(raw_path, offset, last_line, last_time):
+    """Remember up to where the raw CSV has been cleaned."""
+    with open(INGEST_STATE_PATH, 'w') as f:
+        json.dump({
+            'raw_path': os.path.abspath(raw_path),
+            'offset': offset,
+            'last_line': last_line.decode('utf-8'),
+            'last_time': pd.Timestamp(last_time).isoformat()
+        }, f, indent=2)
+
+def _check_continuity(times, last_time):
+    """
+    Check that new rows continue the cleaned data without gaps or overlaps.
+    
+    Raises:
+        ValueError: If any step between consecutive intervals is not one interval
+    """
+    expected = pd.Timedelta(hours=INTERVAL_HOURS)
+    previous = pd.concat([pd.Series([last_time]), times.iloc[:-1]], ignore_index=True)
+    steps = times.reset_index(drop=True) - previous
+    broken = (steps != expected).to_numpy().nonzero()[0]
+    if len(broken):
+        i = broken[0]
+        raise ValueError(
+            f"New rows do not continue the cleaned data: {previous.iloc[i]} is followed by "
+            f"{times.iloc[i]} (expected steps of {expected})"
+        )
+
+def append_new_rows(raw_path=RAW_DATA_PATH):
+    """
+    Clean only the rows added to the raw CSV since the last ingestion.
+    
+    The ingest state holds the byte offset after the last cleaned measurement
+    line and the line itself. The raw file is read from that line onwards; if
+    the line is no longer there the history changed and None is returned, so
+    the caller can fall back to a full read. The new rows must continue the
+    cleaned data in steps of one interval. They are appended to
+    cleaned_data.csv and the columnar store, and the rollups are updated for
+    the periods they touch.
+    
+    Args:
+        raw_path (str): Path of the raw CSV
+    
+    Returns:
+        DataFrame or None: The appended rows (possibly empty), or None if a
+            full read is needed
+    
+    Raises:
+        ValueError: If the new rows leave a gap or overlap with the cleaned data
+    """
+    if not os.path.exists(INGEST_STATE_PATH) or not os.path.exists(CLEANED_DATA_PATH):
+        return None
+    with open(INGEST_STATE_PATH) as f:
+        state = json.load(f)
+    if state['raw_path'] != os.path.abspath(raw_path):
+        return None
+    
+    last_line = state['last_line'].encode('utf-8')
+    start = state['offset'] - len(last_line)
+    if start < 0:
+        return None
+    with open(raw_path, 'rb') as f:
+        f.seek(start)
+        tail = f.read()
+    if not tail.startswith(last_line):
+        return None
+    
+    # Measurement lines after the last cleaned one, without the summary rows
+    new_data = tail[len(last_line):]
+    line_start, line_end = _last_data_line(new_data)
+    if line_end == 0:
+        return pd.DataFrame(columns=RAW_COLUMNS)
+    df = pd.read_csv(io.BytesIO(new_data[:line_end]), sep=',', usecols=[0, 1, 2, 3],
+                     names=RAW_COLUMNS, header=None, dtype={'Time': str})
+    df = _clean_raw_rows(df)
+    if df.empty:
+        # Nothing usable was added (e.g. only incomplete lines)
+        return df
+    _check_continuity(df['Time'], pd.Timestamp(state['last_time']))
+    
+    # Rebuild the store first if it no longer matches the cleaned CSV
+    if is_store_stale(CLEANED_DATA_STORE_DIR, CLEANED_DATA_PATH):
+        load_cleaned_data(CLEANED_DATA_STORE_DIR, CLEANED_DATA_PATH)
+    df.to_csv(CLEANED_DATA_PATH, mode='a', header=False, index=False)
+    append_columnar_store(df, CLEANED_DATA_STORE_DIR, CLEANED_DATA_PATH)
+    dataset = EnergyDataset.load(store_dir=CLEANED_DATA_STORE_DIR, source_path=CLEANED_DATA_PATH)
+    update_rollups(dataset, dataset.rollups_dir)
+    
+    _write_ingest_state(raw_path, state['offset'] + line_end,
+                        new_data[line_start:line_end], df['Time'].iloc[-1])
+    return df
+
+def iter_cleaned_chunks(raw_path, chunk_rows=RAW_CHUNK_ROWS):
+    """
+    Read a raw export in chunks and clean every chunk.
+    
+    Args:
+        raw_path (str): Path of the raw CSV
+        chunk_rows (int): Number of raw rows per chunk
+    
+    Yields:
+        DataFrame: Cleaned rows of one chunk
+    """
+    reader = pd.read_csv(raw_path, sep=',', usecols=[0, 1, 2, 3], names=RAW_COLUMNS, skiprows=1,
+                         dtype={'Time': str}, chunksize=chunk_rows)
+    for chunk in reader:
+        yield _clean_raw_rows(chunk)
+
+def stream_csv_file(raw_path=RAW_DATA_PATH, chunk_rows=RAW_CHUNK_ROWS):
+    """
+    Clean the raw CSV in chunks, writing every chunk straight to disk.
+    
+    Each chunk is cleaned and appended to cleaned_data.csv and the columnar
+    store before the next one is read, so memory use is bounded by the chunk
+    size instead of the file size. The rollups are then rebuilt from the
+    columnar store. A raw file without measurements leaves
+    an empty cleaned dataset and no ingest state.
+    
+    Args:
+        raw_path (str): Path of the raw CSV
+        chunk_rows (int): Number of raw rows per chunk
+    
+    Returns:
+        int: Number of cleaned rows
+    
+    Raises:
+        ValueError: If a chunk holds a corrupted timestamp. The chunks before
+            it are already written, so there is no ingest state to append to.
+    """
+    # The outputs are replaced chunk by chunk, so the old state is void
+    if os.path.exists(INGEST_STATE_PATH):
+        os.remove(INGEST_STATE_PATH)
+    rows = 0
+    written = False
+    last_time = None
+    for chunk in iter_cleaned_chunks(raw_path, chunk_rows):
+        if not written:
+            chunk.to_csv(CLEANED_DATA_PATH, index=False)
+            write_columnar_store(chunk, CLEANED_DATA_STORE_DIR, CLEANED_DATA_PATH)
+            written = True
+        else:
+            chunk.to_csv(CLEANED_DATA_PATH, mode='a', header=False, index=False)
+            append_columnar_store(chunk, CLEANED_DATA_STORE_DIR, CLEANED_DATA_PATH)
+        rows += len(chunk)
+        if len(chunk):
+            last_time = chunk['Time'].iloc[-1]
+    
+    if not written:
+        # No chunk at all: replace the previous outputs by an empty dataset
+        empty = _clean_raw_rows(pd.DataFrame({column: pd.Series(dtype=object) for column in RAW_COLUMNS}))
+        empty.to_csv(CLEANED_DATA_PATH, index=False)
+        write_columnar_store(empty, CLEANED_DATA_STORE_DIR, CLEANED_DATA_PATH)
+    
+    dataset = EnergyDataset.load(store_dir=CLEANED_DATA_STORE_DIR, source_path=CLEANED_DATA_PATH)
+    update_rollups(dataset, dataset.rollups_dir, rebuild=True)
+    if last_time is not None:
+        _write_ingest_state(raw_path, *_last_raw_line(raw_path), last_time)
+    return rows
+
+def ingest_site(site, raw_path, sites_dir=SITES_DATA_DIR, chunk_rows=RAW_CHUNK_ROWS):
+    """
+    Clean the raw export of one site into its year partitions.
+    
+    The export is streamed in chunks and every chunk is split by year and
+    appended to the partition of that year, so memory use is bounded by the
+    chunk size. Earlier partitions and rollups of the site are replaced, and
+    the rollups are rebuilt from the new partitions.
+    
+    Args:
+        site (str): Site name
+        raw_path (str): Path of the raw CSV of the site
+        sites_dir (str): Directory of the partitioned store
+        chunk_rows (int): Number of raw rows per chunk
+    
+    Returns:
+        int: Number of cleaned rows
+    """
+    shutil.rmtree(os.path.join(sites_dir, site), ignore_errors=True)
+    written = set()
+    rows = 0
+    for chunk in iter_cleaned_chunks(raw_path, chunk_rows):
+        for year, part in chunk.groupby(chunk['Time'].dt.year.to_numpy()):
+            store_dir = site_partition_dir(site, year, sites_dir)
+            if year in written:
+                append_columnar_store(part, store_dir, source_path=None)
+            else:
+                write_columnar_store(part, store_dir, source_path=None)
+                written.add(year)
+        rows += len(chunk)
+    
+    if written:
+        update_rollups(EnergyDataset.load_site(site, sites_dir=sites_dir), site_rollups_dir(site, sites_dir),
+                       rebuild=True)
+    return rows
+
+def ingest_sites(raw_dir=RAW_SITES_DIR, sites_dir=SITES_DATA_DIR, max_workers=None):
+    """
+    Ingest the raw export of every site on a pool of worker processes.
+    
+    Args:
+        raw_dir (str): Directory with one raw export per site, named <site>.csv
+        sites_dir (str): Directory of the partitioned store
+        max_workers (int, optional): Number of worker processes (default: one per CPU)
+    
+    Returns:
+        dict: Number of cleaned rows per site
+    """
+    sites = sorted(name[:-4] for name in os.listdir(raw_dir) if name.endswith('.csv'))
+    raw_paths = [os.path.join(raw_dir, f"{site}.csv") for site in sites]
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        rows = executor.map(ingest_site, sites, raw_paths, [sites_dir] * len(sites))
+        return dict(zip(sites, rows))
+
+def read_csv_file(append=False, stream=False):
+    """
+    Read and clean the raw Aardehuizen dataset.
+    
+    Args:
+        append (bool): Only clean the rows added since the last run (see
+            append_new_rows), falling back to a full read when needed
+        stream (bool): Read the full CSV in chunks with bounded memory (see
+            stream_csv_file) instead of loading it at once
+    
+    Returns:
+        DataFrame or int: The cleaned data, only the appended rows in append
+            mode, or the number of cleaned rows in streaming mode; None if
+            the data could not be read or does not continue the cleaned data
+    """
     ensure_directories()
     
     # Define the CSV file path
     csv_file = RAW_DATA_PATH
     
     try:
+        if append:
+            new_rows = append_new_rows(csv_file)
+            if new_rows is not None:
+                print(f"Appended {len(new_rows)} new rows to: {CLEANED_DATA_PATH}")
+                return new_rows
+            print("No usable ingest state, reading the full CSV file")
+        
+        if stream:
+            rows = stream_csv_file(csv_file)
+            print(f"Streamed {rows} cleaned rows to: {CLEANED_DATA_PATH} and {CLEANED_DATA_STORE_DIR}")
+            return rows
+        
         df = pd.read_csv(csv_file, 
                         sep=',',  
                         usecols=[0, 1, 2, 3],  
-                        names=['Time', 'Pprod(W)', 'Pdemand(W)', 'Pimb'],  
+                        names=RAW_COLUMNS,  
                         skiprows=1)  
         
-
-        df = df[~df['Time'].str.contains('Time Interval|Energy Production|Energy Demand|Total Energy Imbalance|% Overproduction', na=False)]
-        
-        # Convert Time column to datetime
-        df['Time'] = pd.to_datetime(df['Time'], format='%d/%m/%Y %H:%M')
-        
-        # Convert numeric columns to float
-        numeric_columns = ['Pprod(W)', 'Pdemand(W)', 'Pimb']
-        for col in numeric_columns:
-            df[col] = pd.to_numeric(df[col], errors='coerce')
-        
-        # Remove any rows with NaN values
-        df = df.dropna()
+        df = _clean_raw_rows(df)
         
         # Display basic information about the dataset
         print("\nDataset Information:")
@@ -56,6 +429,16 @@ def read_csv_file():
         df.to_csv(CLEANED_DATA_PATH, index=False)
         print(f"\nCleaned data has been saved to: {CLEANED_DATA_PATH}")
         
+        # Save a typed columnar copy so analyses can skip CSV parsing
+        write_columnar_store(df, CLEANED_DATA_STORE_DIR, CLEANED_DATA_PATH)
+        print(f"Columnar store has been saved to: {CLEANED_DATA_STORE_DIR}")
+        
+        # The whole history may have changed, so rebuild the rollups
+        update_rollups(EnergyDataset(df), store_rollups_dir(CLEANED_DATA_STORE_DIR, CLEANED_DATA_PATH), rebuild=True)
+        
+        # Remember the last cleaned line so later runs can append
+        _write_ingest_state(csv_file, *_last_raw_line(csv_file), df['Time'].iloc[-1])
+        
         return df
         
     except FileNotFoundError:
@@ -66,4 +449,7 @@ def read_csv_file():
         return None
 
 if __name__ == "__main__":
-    df = read_csv_file() 
\ No newline at end of file
+    df = read_csv_file(append='--append' in sys.argv[1:], stream='--stream' in sys.argv[1:])
+    # A failed or discontinuous ingest must not look like a successful one
+    if df is None:
+        sys.exit(1) 
\ No newline at end of file
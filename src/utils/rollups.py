@@ -0,0 +1,305 @@
+import json
+import numpy as np
+import pandas as pd
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.config import CLEANED_DATA_PATH, CLEANED_DATA_STORE_DIR, ROLLUPS_DIR
+
+ROLLUP_GRANULARITIES = ('day', 'week', 'month', 'season')
+
+# Meteorological seasons; winter holds January, February and December of the same calendar year
+SEASONS = {
+    'Winter': (12, 1, 2),
+    'Spring': (3, 4, 5),
+    'Summer': (6, 7, 8),
+    'Autumn': (9, 10, 11)
+}
+
+# Power quantities summarized per period; the absolute net power gives the C-rates
+ROLLUP_QUANTITIES = ('Production', 'Demand', 'Net', 'Abs_Net')
+ROLLUP_PERCENTILES = (10, 50, 90)
+META_FILE = 'meta.json'
+
+def _month_codes(date_codes):
+    return date_codes.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+
+def period_keys(dataset, granularity):
+    """
+    Integer key of the period of every row.
+
+    Keys increase with time within a granularity, so sorting a rollup by its
+    'Period' column puts it in chronological order.
+
+    Args:
+        dataset (EnergyDataset): Dataset to key
+        granularity (str): One of ROLLUP_GRANULARITIES
+
+    Returns:
+        ndarray: Period key of every row
+    """
+    codes = dataset.date_codes
+    if granularity == 'day':
+        return codes
+    if granularity == 'week':
+        # Monday of the week (day 0 of the epoch is a Thursday)
+        return codes - (codes + 3) % 7
+    months = _month_codes(codes)
+    if granularity == 'month':
+        return months
+    if granularity == 'season':
+        month_season = np.zeros(12, dtype=np.int64)
+        for season, season_months in enumerate(SEASONS.values()):
+            month_season[[m - 1 for m in season_months]] = season
+        return (months // 12) * len(SEASONS) + month_season[months % 12]
+    raise ValueError(f"Unknown rollup granularity '{granularity}', expected one of {ROLLUP_GRANULARITIES}")
+
+def _percentiles(values, keys, starts, counts):
+    # Sort by period, then by value; linear interpolation as numpy.percentile.
+    # keys are sorted, so the periods start at the same positions
+    ordered = values[np.lexsort((values, keys))]
+    columns = {}
+    for percentile in ROLLUP_PERCENTILES:
+        position = starts + percentile / 100 * (counts - 1)
+        low = np.floor(position).astype(np.int64)
+        high = np.minimum(low + 1, starts + counts - 1)
+        columns[percentile] = ordered[low] + (position - low) * (ordered[high] - ordered[low])
+    return columns
+
+def _period_labels(granularity, keys):
+    if granularity == 'week':
+        iso = pd.DatetimeIndex(keys.astype('datetime64[D]')).isocalendar()
+        return {'Year': iso['year'].to_numpy(np.int64), 'Week': iso['week'].to_numpy(np.int64)}
+    if granularity == 'month':
+        return {'Year': 1970 + keys // 12, 'Month': keys % 12 + 1}
+    if granularity == 'season':
+        return {'Year': 1970 + keys // len(SEASONS), 'Season': np.array(list(SEASONS))[keys % len(SEASONS)]}
+    return {}
+
+def compute_rollup(dataset, granularity, rows=None):
+    """
+    Aggregate the rows of a dataset per period.
+
+    All periods are reduced at once: the rows are sorted by period key and
+    every statistic is one reduceat over the period boundaries.
+
+    Args:
+        dataset (EnergyDataset): Dataset to aggregate
+        granularity (str): One of ROLLUP_GRANULARITIES
+        rows (ndarray, optional): Boolean mask of the rows to include. Defaults to all rows.
+
+    Returns:
+        DataFrame: One row per period, sorted by 'Period', with 'Period' (key),
+            'Time' (date of the first interval), the period labels, 'Intervals',
+            'Energy_Production_Wh', 'Energy_Demand_Wh', 'Energy_Difference_Wh'
+            and for every quantity '<Quantity>_Mean_W', '_Min_W', '_Max_W'
+            and '_P10_W', '_P50_W', '_P90_W'
+    """
+    keys = period_keys(dataset, granularity)
+    power = {
+        'Production': dataset.production_w,
+        'Demand': dataset.demand_w,
+        'Net': dataset.production_w - dataset.demand_w,
+    }
+    power['Abs_Net'] = np.abs(power['Net'])
+    energy = {
+        'Energy_Production_Wh': dataset.energy_production_wh,
+        'Energy_Demand_Wh': dataset.energy_demand_wh,
+        'Energy_Difference_Wh': dataset.net_energy_wh,
+    }
+    date_codes = dataset.date_codes
+    if rows is not None:
+        keys = keys[rows]
+        power = {name: values[rows] for name, values in power.items()}
+        energy = {name: values[rows] for name, values in energy.items()}
+        date_codes = date_codes[rows]
+
+    # Stable sort, so the first row of every period is its earliest interval
+    order = np.argsort(keys, kind='stable')
+    keys = keys[order]
+    if len(keys) == 0:
+        starts = np.zeros(0, dtype=np.int64)
+    else:
+        starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+    counts = np.diff(np.append(starts, len(keys)))
+    period = keys[starts]
+
+    table = {
+        'Period': period,
+        'Time': pd.to_datetime(date_codes[order][starts].astype('datetime64[D]')).date,
+        **_period_labels(granularity, period),
+        'Intervals': counts,
+    }
+    if len(keys) == 0:
+        table.update({name: np.zeros(0) for name in energy})
+        for quantity in power:
+            table.update({f'{quantity}_{stat}_W': np.zeros(0) for stat in
+                          ('Mean', 'Min', 'Max', *(f'P{p}' for p in ROLLUP_PERCENTILES))})
+        return pd.DataFrame(table)
+
+    for name, values in energy.items():
+        table[name] = np.add.reduceat(values[order], starts)
+    for quantity, values in power.items():
+        values = values[order]
+        table[f'{quantity}_Mean_W'] = np.add.reduceat(values, starts) / counts
+        table[f'{quantity}_Min_W'] = np.minimum.reduceat(values, starts)
+        table[f'{quantity}_Max_W'] = np.maximum.reduceat(values, starts)
+        for percentile, column in _percentiles(values, keys, starts, counts).items():
+            table[f'{quantity}_P{percentile}_W'] = column
+    return pd.DataFrame(table)
+
+def _time_codes(dataset):
+    return dataset.time.to_numpy(dtype='datetime64[ns]').view('int64')
+
+def store_rollups_dir(store_dir=CLEANED_DATA_STORE_DIR, source_path=CLEANED_DATA_PATH):
+    """
+    Directory of the persisted rollups of a cleaned data store.
+
+    The configured store keeps its rollups in ROLLUPS_DIR; any other store
+    gets a directory next to it ('<store_dir>_rollups', or
+    '<source_path without extension>_rollups' if only the CSV differs), so
+    datasets never read or overwrite each other's rollups.
+    """
+    if store_dir != CLEANED_DATA_STORE_DIR:
+        return os.path.normpath(store_dir) + '_rollups'
+    if source_path != CLEANED_DATA_PATH:
+        return os.path.splitext(source_path)[0] + '_rollups'
+    return ROLLUPS_DIR
+
+def _rollup_path(rollups_dir, granularity):
+    return os.path.join(rollups_dir, f"{granularity}.csv")
+
+def _energy_totals(dataset, rows):
+    return [float(dataset.energy_production_wh[:rows].sum()), float(dataset.energy_demand_wh[:rows].sum())]
+
+def write_rollups(rollups, dataset, rollups_dir=ROLLUPS_DIR):
+    """
+    Persist the rollups of a dataset.
+
+    Besides the tables, the first and last timestamp, the number of rows
+    they cover and the energy totals of those rows are stored, so a later
+    update can tell appended data apart from a changed dataset.
+
+    Args:
+        rollups (dict): Rollup table per granularity
+        dataset (EnergyDataset): Dataset the rollups were computed from
+        rollups_dir (str): Directory of the persisted rollups
+    """
+    os.makedirs(rollups_dir, exist_ok=True)
+    for granularity, table in rollups.items():
+        table.to_csv(_rollup_path(rollups_dir, granularity), index=False)
+
+    times = _time_codes(dataset)
+    meta = {
+        'rows': len(times),
+        'first_time': int(times[0]) if len(times) else None,
+        'last_time': int(times[-1]) if len(times) else None,
+        'energy_wh': _energy_totals(dataset, len(times)),
+        'granularities': list(rollups),
+    }
+    with open(os.path.join(rollups_dir, META_FILE), 'w') as f:
+        json.dump(meta, f, indent=2)
+
+def read_rollups(rollups_dir=ROLLUPS_DIR):
+    """
+    Read the persisted rollups.
+
+    Returns:
+        dict: Rollup table per granularity
+    """
+    with open(os.path.join(rollups_dir, META_FILE)) as f:
+        meta = json.load(f)
+    rollups = {}
+    for granularity in meta['granularities']:
+        table = pd.read_csv(_rollup_path(rollups_dir, granularity), float_precision='round_trip')
+        table['Time'] = pd.to_datetime(table['Time']).dt.date
+        rollups[granularity] = table
+    return rollups
+
+def invalidate_rollups(rollups_dir=ROLLUPS_DIR):
+    """Drop the persisted rollups, so the next update rebuilds them."""
+    meta_path = os.path.join(rollups_dir, META_FILE)
+    if os.path.exists(meta_path):
+        os.remove(meta_path)
+
+def _appended_rows(dataset, rollups_dir):
+    """
+    First row not covered by the persisted rollups.
+
+    Returns:
+        int or None: Row position, or None if the rollups are missing or were
+            computed from data that is not a prefix of the dataset
+    """
+    meta_path = os.path.join(rollups_dir, META_FILE)
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path) as f:
+        meta = json.load(f)
+    if meta.get('granularities') != list(ROLLUP_GRANULARITIES):
+        return None
+
+    times = _time_codes(dataset)
+    rows = meta.get('rows', 0)
+    if rows == 0 or rows > len(times):
+        return None
+    if int(times[0]) != meta['first_time'] or int(times[rows - 1]) != meta['last_time']:
+        return None
+    # Same timestamps with other values (e.g. another site) are no prefix either
+    if 'energy_wh' not in meta or not np.allclose(_energy_totals(dataset, rows), meta['energy_wh'], rtol=1e-12, atol=0):
+        return None
+    return rows
+
+def stored_rollups(dataset, rollups_dir=ROLLUPS_DIR):
+    """
+    Read the persisted rollups if they cover exactly a dataset.
+
+    Only reads, so analyses can use the rollups without touching the store;
+    the ingest paths keep them up to date with update_rollups().
+
+    Args:
+        dataset (EnergyDataset): Dataset the rollups should summarize
+        rollups_dir (str): Directory of the persisted rollups
+
+    Returns:
+        dict or None: Rollup table per granularity, or None if the rollups
+            are missing or do not match all rows of the dataset
+    """
+    if _appended_rows(dataset, rollups_dir) != len(dataset):
+        return None
+    return read_rollups(rollups_dir)
+
+def update_rollups(dataset, rollups_dir=ROLLUPS_DIR, rebuild=False):
+    """
+    Bring the persisted rollups up to date with a dataset.
+
+    If the dataset extends the data the rollups were computed from, only the
+    periods touched by the new rows are recomputed (from all their rows, so
+    the percentiles stay exact) and merged into the stored tables. Otherwise
+    the rollups are rebuilt from scratch.
+
+    Args:
+        dataset (EnergyDataset): Dataset to summarize
+        rollups_dir (str): Directory of the persisted rollups
+        rebuild (bool): Rebuild from scratch, e.g. after the history was rewritten
+
+    Returns:
+        dict: Rollup table per granularity
+    """
+    first_new = None if rebuild else _appended_rows(dataset, rollups_dir)
+    if first_new is None:
+        rollups = {granularity: compute_rollup(dataset, granularity) for granularity in ROLLUP_GRANULARITIES}
+        write_rollups(rollups, dataset, rollups_dir)
+        return rollups
+
+    rollups = read_rollups(rollups_dir)
+    if first_new == len(dataset):
+        return rollups
+
+    for granularity in ROLLUP_GRANULARITIES:
+        keys = period_keys(dataset, granularity)
+        touched = np.unique(keys[first_new:])
+        fresh = compute_rollup(dataset, granularity, rows=np.isin(keys, touched))
+        kept = rollups[granularity][~rollups[granularity]['Period'].isin(touched)]
+        rollups[granularity] = pd.concat([kept, fresh], ignore_index=True).sort_values('Period', ignore_index=True)
+    write_rollups(rollups, dataset, rollups_dir)
+    return rollups
@@ -4,6 +4,9 @@ import matplotlib.animation as animation
 import numpy as np
 from datetime import datetime, timedelta
 import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.dataset import EnergyDataset
 
 def create_daily_energy_animation(date_str=None):
     """
@@ -16,28 +19,21 @@ def create_daily_energy_animation(date_str=None):
     print("Creating daily energy animation...")
     
     # Read the cleaned data
-    df = pd.read_csv('cleaned_data.csv')
-    print(f"Loaded data with {len(df)} rows")
-    
-    # Convert Time to datetime
-    df['Time'] = pd.to_datetime(df['Time'])
-    
-    # Convert negative production values to positive
-    df['Pprod(W)'] = df['Pprod(W)'].abs()
+    dataset = EnergyDataset.load()
+    print(f"Loaded data with {len(dataset)} rows")
     
     # If no date provided, use summer solstice (or closest available date)
     if not date_str:
         summer_solstice = pd.to_datetime('2023-06-21').date()
         # Find closest date
-        unique_dates = df['Time'].dt.date.unique()
-        date = min(unique_dates, key=lambda x: abs((x - summer_solstice).days))
+        date = dataset.nearest_date(summer_solstice)
         print(f"Using date closest to summer solstice: {date}")
     else:
         date = pd.to_datetime(date_str).date()
         print(f"Using specified date: {date}")
     
-    # Filter data for the selected date
-    day_data = df[df['Time'].dt.date == date].copy()
+    # Select the rows of the selected date (production as absolute values)
+    day_data = dataset.to_frame(dataset.day_slice(date))
     
     if day_data.empty:
         print(f"No data available for date: {date}")
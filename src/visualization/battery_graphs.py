@@ -6,7 +6,8 @@ import os
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from analysis.analyze_energy import calculate_battery_state
-from utils.config import CLEANED_DATA_PATH, IMAGES_DIR, ensure_directories
+from utils.config import IMAGES_DIR, ensure_directories
+from utils.dataset import EnergyDataset
 
 def create_battery_visualizations():
     """
@@ -16,17 +17,14 @@ def create_battery_visualizations():
     ensure_directories()
     
     # Read the cleaned data
-    df = pd.read_csv(CLEANED_DATA_PATH)
+    dataset = EnergyDataset.load()
     
-    # Convert Time to datetime
-    df['Time'] = pd.to_datetime(df['Time'])
-    
-    # Convert negative production values to positive
-    df['Pprod(W)'] = df['Pprod(W)'].abs()
+    # Production power as absolute values
+    df = dataset.to_frame()
     
     # Filter for June 1st (summer) and December 21st (winter)
-    summer_day = df[df['Time'].dt.date == pd.to_datetime('2023-06-01').date()]
-    winter_day = df[df['Time'].dt.date == pd.to_datetime('2023-12-21').date()]
+    summer_day = df.iloc[dataset.day_slice('2023-06-01')]
+    winter_day = df.iloc[dataset.day_slice('2023-12-21')]
     
     # Battery capacity in Wh
     BATTERY_CAPACITY = 231.62 * 1000  # 231.62 kWh in Wh
@@ -116,21 +114,14 @@ def create_battery_visualizations():
     # Create combined seasonal visualization
     plt.figure(figsize=(15, 10))
     
-    # Filter unique days and sort chronologically
-    days = sorted(df['Time'].dt.date.unique())
-    daily_stats = []
-    
-    for day in days:
-        day_data = df[df['Time'].dt.date == day]
-        stats = {
-            'Date': day,
-            'Production_kWh': day_data['Pprod(W)'].sum() * 0.25 / 1000,
-            'Demand_kWh': day_data['Pdemand(W)'].sum() * 0.25 / 1000
-        }
-        stats['Net_kWh'] = stats['Production_kWh'] - stats['Demand_kWh']
-        daily_stats.append(stats)
-    
-    daily_df = pd.DataFrame(daily_stats)
+    # Daily totals in chronological order
+    daily_totals = dataset.daily_totals()
+    daily_df = pd.DataFrame({
+        'Date': daily_totals['Time'],
+        'Production_kWh': daily_totals['Energy_Production_Wh'] / 1000,
+        'Demand_kWh': daily_totals['Energy_Demand_Wh'] / 1000
+    })
+    daily_df['Net_kWh'] = daily_df['Production_kWh'] - daily_df['Demand_kWh']
     
     plt.subplot(2, 1, 1)
     plt.plot(daily_df['Date'], daily_df['Production_kWh'],
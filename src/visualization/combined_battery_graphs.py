@@ -2,7 +2,12 @@ import pandas as pd
 import matplotlib.pyplot as plt
 from matplotlib.gridspec import GridSpec
 import os
-from analyze_energy import calculate_battery_state
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from analysis.analyze_energy import calculate_battery_state
+from analysis.battery_simulation import simulate_battery_soc
+from utils.data_store import load_cleaned_data
+from utils.dataset import EnergyDataset
 
 def create_combined_daynight_battery_graph():
     """
@@ -10,17 +15,14 @@ def create_combined_daynight_battery_graph():
     (0%, 50%, 100%) for summer and winter days with power flows on separate graphs.
     """
     # Read the cleaned data
-    df = pd.read_csv('cleaned_data.csv')
+    dataset = EnergyDataset.load()
     
-    # Convert Time to datetime
-    df['Time'] = pd.to_datetime(df['Time'])
-    
-    # Convert negative production values to positive
-    df['Pprod(W)'] = df['Pprod(W)'].abs()
+    # Production power as absolute values
+    df = dataset.to_frame()
     
     # Filter for June 1st (summer) and December 21st (winter)
-    summer_day = df[df['Time'].dt.date == pd.to_datetime('2023-06-01').date()]
-    winter_day = df[df['Time'].dt.date == pd.to_datetime('2023-12-21').date()]
+    summer_day = df.iloc[dataset.day_slice('2023-06-01')]
+    winter_day = df.iloc[dataset.day_slice('2023-12-21')]
     
     # Battery capacity in Wh
     BATTERY_CAPACITY = 650 * 1000  # 650 kWh in Wh
@@ -138,10 +140,7 @@ def create_combined_seasonal_battery_graph():
     # We'll need to rerun the simulations because the data isn't saved in the previous runs
     
     # Read the cleaned data
-    df = pd.read_csv('cleaned_data.csv')
-    
-    # Convert Time to datetime
-    df['Time'] = pd.to_datetime(df['Time'])
+    df = load_cleaned_data()
     
     # Convert negative production values to positive
     df['Pprod(W)'] = df['Pprod(W)'].abs()
@@ -171,14 +170,11 @@ def create_combined_seasonal_battery_graph():
         
         # Initialize battery state at specified percentage
         initial_state_wh = BATTERY_CAPACITY * (initial_percent / 100)
-        scenario_df['Battery_State_Wh'] = initial_state_wh
         
-        # Calculate battery state over time
-        for i in range(1, len(scenario_df)):
-            # Calculate new state based on previous state and current flow
-            new_state = scenario_df['Battery_State_Wh'].iloc[i-1] + scenario_df['Energy_Flow_Wh'].iloc[i]
-            # Clip to battery capacity limits
-            scenario_df.loc[scenario_df.index[i], 'Battery_State_Wh'] = max(0, min(new_state, BATTERY_CAPACITY))
+        # Calculate battery state over time, clipped to battery capacity limits
+        scenario_df['Battery_State_Wh'] = simulate_battery_soc(
+            scenario_df['Energy_Flow_Wh'].to_numpy(), BATTERY_CAPACITY, initial_state_wh
+        )
         
         # Calculate percentage of capacity
         scenario_df['Battery_State_Percent'] = (scenario_df['Battery_State_Wh'] / BATTERY_CAPACITY) * 100
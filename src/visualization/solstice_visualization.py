@@ -6,26 +6,32 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from utils.config import (
-    CLEANED_DATA_PATH, 
-    IMAGES_DIR,
+    output_dirs,
     SUMMER_SOLSTICE,
     WINTER_SOLSTICE
 )
+from utils.dataset import EnergyDataset
 
-def create_solstice_comparison():
-    """Create a comparison of energy patterns between summer and winter solstice."""
-    # Read the cleaned data
-    df = pd.read_csv(CLEANED_DATA_PATH)
+def create_solstice_comparison(dataset=None, output_dir=None):
+    """
+    Create a comparison of energy patterns between summer and winter solstice.
+    
+    Args:
+        dataset (EnergyDataset, optional): Preloaded dataset. If None, it is loaded from disk.
+        output_dir (str, optional): Directory for the images and reports. Defaults to the configured output directories.
+    """
+    images_dir, _ = output_dirs(output_dir)
     
-    # Convert Time to datetime
-    df['Time'] = pd.to_datetime(df['Time'])
+    # Read the cleaned data
+    if dataset is None:
+        dataset = EnergyDataset.load()
     
-    # Convert negative production values to positive
-    df['Pprod(W)'] = df['Pprod(W)'].abs()
+    # Production power as absolute values
+    df = dataset.to_frame()
     
     # Filter for summer and winter solstice
-    summer_day = df[df['Time'].dt.date == pd.to_datetime(SUMMER_SOLSTICE).date()]
-    winter_day = df[df['Time'].dt.date == pd.to_datetime(WINTER_SOLSTICE).date()]
+    summer_day = df.iloc[dataset.day_slice(SUMMER_SOLSTICE)]
+    winter_day = df.iloc[dataset.day_slice(WINTER_SOLSTICE)]
     
     # Create the plot
     plt.figure(figsize=(15, 8))
@@ -56,9 +62,9 @@ def create_solstice_comparison():
     
     # Save the plot
     plt.tight_layout()
-    plt.savefig(os.path.join(IMAGES_DIR, 'solstice_comparison.png'))
+    plt.savefig(os.path.join(images_dir, 'solstice_comparison.png'))
     plt.close()
     
-    print(f"Solstice comparison graph has been saved to {os.path.join(IMAGES_DIR, 'solstice_comparison.png')}")
+    print(f"Solstice comparison graph has been saved to {os.path.join(images_dir, 'solstice_comparison.png')}")
     
     return {'summer_day': summer_day, 'winter_day': winter_day}
@@ -3,74 +3,28 @@ import matplotlib.pyplot as plt
 import numpy as np
 from datetime import datetime, timedelta
 import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.dataset import EnergyDataset
+from analysis.analyze_solar_times import production_windows
 
-def visualize_monthly_solar_times():
+def visualize_monthly_solar_times(dataset=None):
     """
     Create a detailed visualization of solar production times by month
     and a heat map showing how production times vary throughout the year.
+    
+    Args:
+        dataset (EnergyDataset, optional): Preloaded dataset. If None, it is loaded from disk.
     """
     print("Creating monthly solar production time visualizations...")
     
     # Read the cleaned data
-    df = pd.read_csv('cleaned_data.csv')
-    print(f"Loaded data with {len(df)} rows")
-    
-    # Convert Time to datetime
-    df['Time'] = pd.to_datetime(df['Time'])
-    
-    # Convert negative production values to positive
-    df['Pprod(W)'] = df['Pprod(W)'].abs()
-    
-    # Add date and time components
-    df['Date'] = df['Time'].dt.date
-    df['Hour'] = df['Time'].dt.hour
-    df['Minute'] = df['Time'].dt.minute
-    df['TimeOfDay'] = df['Hour'] + df['Minute']/60
-    df['Month'] = df['Time'].dt.month
-    df['Day'] = df['Time'].dt.day
-    
-    # Define a significant production threshold (e.g., 5% of the daily maximum)
-    # Group by date to calculate daily statistics
-    daily_stats = df.groupby('Date').agg({'Pprod(W)': ['max', 'mean']})
-    daily_stats.columns = ['Daily_Max_Prod', 'Daily_Avg_Prod']
-    daily_stats.reset_index(inplace=True)
-    
-    # Merge daily stats back to the main dataframe
-    df = pd.merge(df, daily_stats, on='Date')
+    if dataset is None:
+        dataset = EnergyDataset.load()
+    print(f"Loaded data with {len(dataset)} rows")
     
-    # Define threshold as 5% of daily maximum production
-    df['Threshold'] = df['Daily_Max_Prod'] * 0.05
-    
-    # Identify when production is above threshold
-    df['IsProducing'] = df['Pprod(W)'] > df['Threshold']
-    
-    # Group by date to find the first and last time of production for each day
-    production_times = []
-    
-    for date, group in df.groupby('Date'):
-        if group['IsProducing'].any():
-            # Get rows where production is happening
-            producing_rows = group[group['IsProducing']]
-            
-            # Find first and last time of production
-            start_time = producing_rows['TimeOfDay'].min()
-            end_time = producing_rows['TimeOfDay'].max()
-            
-            # Get the month and day for seasonal analysis
-            month = producing_rows['Month'].iloc[0]
-            day = producing_rows['Day'].iloc[0]
-            
-            production_times.append({
-                'Date': date,
-                'Month': month,
-                'Day': day,
-                'Start_Time': start_time,
-                'End_Time': end_time,
-                'Duration': end_time - start_time
-            })
-    
-    # Convert to DataFrame
-    times_df = pd.DataFrame(production_times)
+    # First and last time above 5% of the daily maximum production
+    times_df = production_windows(dataset, 0.05)
     
     # Create a more detailed monthly visualization
     plt.figure(figsize=(15, 10))
@@ -117,24 +71,10 @@ def visualize_monthly_solar_times():
     # Plot 2: Heatmap of solar production by month and hour
     plt.subplot(2, 1, 2)
     
-    # Create a production matrix (month x hour)
-    hours = np.arange(0, 24, 0.25)  # 15-minute intervals
-    months = np.arange(1, 13)
-    
-    # Initialize the production matrix
-    production_matrix = np.zeros((len(months), len(hours)))
-    
-    # Fill the matrix with production data
-    for month in months:
-        month_data = df[df['Month'] == month]
-        for i, hour in enumerate(hours):
-            # Find production data for this hour and month
-            hour_data = month_data[(month_data['TimeOfDay'] >= hour) & 
-                                   (month_data['TimeOfDay'] < hour + 0.25)]
-            if not hour_data.empty:
-                # Calculate average production for this time slot
-                avg_production = hour_data['Pprod(W)'].mean()
-                production_matrix[int(month)-1, i] = avg_production
+    # Average production per month and 15-minute interval of the day
+    cube = dataset.profile_cube('month')
+    production_matrix = np.zeros((12, cube.counts.shape[1]))
+    production_matrix[cube.periods - 1] = np.nan_to_num(cube.mean_power_w('production'))
     
     # Normalize by the maximum production value
     max_production = np.max(production_matrix)
@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+import pytest
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from utils.config import INTERVAL_HOURS
+from utils.dataset import EnergyDataset
+
+def synthetic_frame(days=28, start='2023-01-01', seed=0):
+    """
+    Cleaned data of a small site: a solar bell curve that varies from day to
+    day and a noisy demand with a morning and an evening peak.
+    """
+    rng = np.random.default_rng(seed)
+    slots = int(round(24 / INTERVAL_HOURS))
+    time = pd.date_range(start, periods=days * slots, freq=f'{int(INTERVAL_HOURS * 60)}min')
+    hour = (np.arange(len(time)) % slots) * INTERVAL_HOURS
+    sun = np.clip(np.sin((hour - 6) / 12 * np.pi), 0, None)
+    production = -20000 * sun * np.repeat(rng.uniform(0.1, 1.0, days), slots)
+    demand = (6000 + 3000 * np.exp(-(hour - 8) ** 2) + 5000 * np.exp(-(hour - 19) ** 2 / 2)
+              + rng.normal(0, 800, len(time))).clip(min=0)
+    return pd.DataFrame({
+        'Time': time,
+        'Pprod(W)': production,
+        'Pdemand(W)': demand,
+        'Pimb': -(production + demand),
+    })
+
+# Summary rows of the raw export
+SUMMARY = ['Time Interval,15 min,,', 'Energy Production,123,,', '% Overproduction,5,,']
+
+def raw_lines(frame):
+    """Lines of a raw export (without header) for cleaned data."""
+    times = frame['Time'].dt.strftime('%d/%m/%Y %H:%M')
+    values = frame[['Pprod(W)', 'Pdemand(W)', 'Pimb']].round(1)
+    return [f"{t},{p},{d},{i}" for t, (p, d, i) in zip(times, values.itertuples(index=False))]
+
+def write_raw(path, lines):
+    with open(path, 'w') as f:
+        f.write('\n'.join(['Time,Pprod,Pdemand,Pimb', *lines, *SUMMARY]) + '\n')
+
+@pytest.fixture
+def dataset():
+    """Four weeks of synthetic data."""
+    return EnergyDataset(synthetic_frame())
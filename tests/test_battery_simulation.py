@@ -0,0 +1,149 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from analysis.battery_simulation import (
+    SCAN_BLOCK_ROWS,
+    SCAN_MAX_SCENARIOS,
+    BatteryProperties,
+    DailyReset,
+    PeakShaving,
+    cyclic_initial_state,
+    simulate_battery_batch,
+    simulate_battery_soc,
+    simulate_dispatch,
+)
+
+def reference_soc(flow, capacity, initial, reset_rows=(), retention=1.0):
+    """The per-row loop the scan kernel replaces."""
+    state = np.empty(len(flow))
+    resets = set(reset_rows)
+    for i, value in enumerate(flow):
+        if i == 0 or i in resets:
+            state[i] = initial
+        else:
+            state[i] = min(max(retention * state[i - 1] + value, 0.0), capacity)
+    return state
+
+CAPACITIES_WH = np.array([0.0, 2000.0, 10000.0, 40000.0, 1e7])
+
+STRATEGIES = {
+    'greedy': lambda dataset: None,
+    'peak_shaving': lambda dataset: PeakShaving(4000),
+    'daily_reset': lambda dataset: DailyReset(dataset.day_starts),
+}
+
+BATTERIES = {
+    'ideal': None,
+    'lossy': BatteryProperties(0.95, 0.9, max_charge_w=5000, max_discharge_c_rate=0.5,
+                               self_discharge_per_interval=1e-4),
+}
+
+@pytest.mark.parametrize('strategy', STRATEGIES)
+@pytest.mark.parametrize('battery', BATTERIES)
+def test_batch_matches_dispatch(dataset, strategy, battery):
+    flow = dataset.net_energy_wh
+    strategy = STRATEGIES[strategy](dataset)
+    battery = BATTERIES[battery]
+
+    kpis = simulate_battery_batch(flow, CAPACITIES_WH, 40, strategy=strategy, battery=battery)
+    state, grid = simulate_dispatch(flow[:, None], CAPACITIES_WH[None, :], CAPACITIES_WH * 0.4, strategy, battery)
+
+    np.testing.assert_allclose(kpis['Grid_Import_Wh'], -grid.clip(max=0.0).sum(axis=0), rtol=1e-9, atol=1e-6)
+    np.testing.assert_allclose(kpis['Grid_Export_Wh'], grid.clip(min=0.0).sum(axis=0), rtol=1e-9, atol=1e-6)
+    np.testing.assert_array_equal(kpis['Grid_Dependency_Hours'], (grid < 0).sum(axis=0) * 0.25)
+    np.testing.assert_allclose(kpis['Final_State_Wh'], state[-1], rtol=1e-9, atol=1e-6)
+    np.testing.assert_allclose(kpis['Min_State_Wh'], state.min(axis=0), rtol=1e-9, atol=1e-6)
+    np.testing.assert_allclose(kpis['Max_State_Wh'], state.max(axis=0), rtol=1e-9, atol=1e-6)
+
+@pytest.mark.parametrize('strategy', STRATEGIES)
+@pytest.mark.parametrize('battery', BATTERIES)
+def test_losses_close_energy_balance(dataset, strategy, battery):
+    flow = dataset.net_energy_wh
+    strategy = STRATEGIES[strategy](dataset)
+    battery = BATTERIES[battery]
+    wide = np.resize(CAPACITIES_WH, SCAN_MAX_SCENARIOS + 1)
+
+    for capacities in (CAPACITIES_WH, wide):
+        kpis = simulate_battery_batch(flow, capacities, 40, strategy=strategy, battery=battery)
+
+        # Every Wh of net flow is exchanged with the grid, stored, or lost
+        # (including the charge given up at resets)
+        stored = kpis['Final_State_Wh'] - kpis['Initial_State_Wh']
+        balance = flow.sum() - (kpis['Grid_Export_Wh'] - kpis['Grid_Import_Wh']) - stored
+        np.testing.assert_allclose(kpis['Losses_Wh'], balance, rtol=1e-9, atol=1e-6)
+        if battery is None and strategy is None:
+            np.testing.assert_allclose(kpis['Losses_Wh'], 0.0, atol=1e-6)
+
+@pytest.mark.parametrize('strategy', STRATEGIES)
+def test_scan_and_loop_paths_agree(dataset, strategy):
+    flow = dataset.net_energy_wh
+    strategy = STRATEGIES[strategy](dataset)
+    capacities = np.linspace(0, 60000, SCAN_MAX_SCENARIOS + 6)
+    battery = BatteryProperties(np.linspace(0.85, 1.0, len(capacities)), 0.9, max_discharge_c_rate=0.5,
+                                self_discharge_per_interval=1e-4)
+    half = len(capacities) // 2
+
+    # Above SCAN_MAX_SCENARIOS the per-interval loop is used, below it the scan kernel
+    wide, wide_traces = simulate_battery_batch(flow, capacities, 20, True, strategy, battery)
+    parts = [
+        simulate_battery_batch(flow, capacities[columns], 20, True, strategy,
+                               battery.select_scenarios(columns, len(capacities)))
+        for columns in (slice(None, half), slice(half, None))
+    ]
+    narrow = pd.concat([kpis for kpis, _ in parts], ignore_index=True)
+
+    pd.testing.assert_frame_equal(wide, narrow, rtol=1e-9, atol=1e-6)
+    np.testing.assert_allclose(wide_traces, np.hstack([traces for _, traces in parts]), rtol=1e-9, atol=1e-6)
+
+def test_first_row_goes_to_the_grid():
+    flow = np.array([500.0, -200.0, 300.0])
+    kpis = simulate_battery_batch(flow, [1000.0], 0)
+    _, grid = simulate_dispatch(flow, 1000.0, 0.0)
+
+    np.testing.assert_allclose(grid, [500.0, -200.0, 0.0])
+    assert kpis['Grid_Export_Wh'][0] == 500.0
+    assert kpis['Grid_Import_Wh'][0] == 200.0
+
+@pytest.mark.parametrize('seed', range(8))
+def test_scan_matches_reference_loop(seed):
+    rng = np.random.default_rng(seed)
+    n = int(rng.integers(1, 700))
+    flow = rng.normal(0, 300, n)
+    capacities = np.array([0.0, 500.0, 2000.0, 1e6])
+    initial = capacities * rng.uniform()
+    reset_rows = np.unique(rng.integers(1, n, 4)) if seed % 2 and n > 1 else None
+    retention = 1.0 if seed % 4 < 2 else 0.999
+
+    states = simulate_battery_soc(flow[:, None], capacities, initial, reset_rows, retention)
+    for j, capacity in enumerate(capacities):
+        expected = reference_soc(flow, capacity, initial[j], () if reset_rows is None else reset_rows, retention)
+        np.testing.assert_allclose(states[:, j], expected, rtol=1e-9, atol=1e-6)
+        single = simulate_battery_soc(flow, capacity, initial[j], reset_rows, retention)
+        np.testing.assert_allclose(single, states[:, j], rtol=1e-12, atol=1e-9)
+
+@pytest.mark.parametrize('n', [1, 2, SCAN_BLOCK_ROWS - 1, SCAN_BLOCK_ROWS, SCAN_BLOCK_ROWS + 1,
+                               3 * SCAN_BLOCK_ROWS, 5 * SCAN_BLOCK_ROWS + 7])
+def test_scan_matches_reference_loop_at_block_edges(n):
+    rng = np.random.default_rng(n)
+    flow = rng.normal(0, 300, n)
+    capacities = np.array([0.0, 500.0, 2000.0])
+    # Resets on the first row of a block and on the last one
+    reset_rows = [row for row in (SCAN_BLOCK_ROWS - 1, SCAN_BLOCK_ROWS, 2 * SCAN_BLOCK_ROWS) if row < n]
+
+    initial = capacities * 0.4
+
+    states = simulate_battery_soc(flow[:, None], capacities, initial, reset_rows, 0.999)
+    for j, capacity in enumerate(capacities):
+        np.testing.assert_allclose(states[:, j], reference_soc(flow, capacity, initial[j], reset_rows, 0.999),
+                                   rtol=1e-9, atol=1e-6)
+
+@pytest.mark.parametrize('battery', BATTERIES)
+def test_cyclic_initial_state_is_periodic(dataset, battery):
+    flow = dataset.net_energy_wh
+    battery = BATTERIES[battery]
+    initial = cyclic_initial_state(flow[:, None], CAPACITIES_WH, battery=battery)
+
+    # Starting from the cyclic state, the year ends where it started
+    state, _ = simulate_dispatch(flow[:, None], CAPACITIES_WH[None, :], initial, battery=battery)
+    np.testing.assert_allclose(state[-1], initial, rtol=1e-9, atol=1e-6)
@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+
+from analysis.battery_simulation import simulate_battery_soc
+from analysis.capacity_solver import (
+    capacity_for_unserved_fraction,
+    minimum_capacity_per_segment,
+    minimum_cyclic_capacity,
+    reset_segment_starts,
+    served_cycle_depths,
+    solve_minimum_capacity,
+    unserved_energy,
+)
+
+def random_case(seed):
+    rng = np.random.default_rng(seed)
+    n = int(rng.integers(20, 400))
+    flow = rng.normal(rng.normal(0, 0.3), 1, n) * 100
+    if seed % 3 == 0:
+        flow = np.round(flow, -1)  # plateaus and equal ranges
+    segment_starts = None if seed % 2 else np.unique(np.concatenate(([0], rng.integers(1, n, 5))))
+    return flow, segment_starts
+
+@pytest.mark.parametrize('seed', range(12))
+def test_cycle_depths_give_unserved_energy(seed):
+    flow, segment_starts = random_case(seed)
+    depths = served_cycle_depths(flow, segment_starts)
+    capacities = np.concatenate(([0.0], depths, np.linspace(0, depths.max(initial=1.0) * 1.2, 15)))
+
+    deficit = -np.minimum(flow, 0.0).sum()
+    expected = unserved_energy(flow, capacities, segment_starts)
+    served = np.minimum(depths[:, None], capacities[None, :]).sum(axis=0)
+    np.testing.assert_allclose(deficit - served, expected, rtol=1e-9, atol=1e-6)
+
+@pytest.mark.parametrize('seed', range(12))
+@pytest.mark.parametrize('fraction', [0.05, 0.3, 0.7])
+def test_capacity_for_unserved_fraction_is_minimal(seed, fraction):
+    flow, segment_starts = random_case(seed)
+    allowed = fraction * -np.minimum(flow, 0.0).sum()
+
+    capacity = capacity_for_unserved_fraction(flow, fraction, segment_starts)
+    unlimited = minimum_capacity_per_segment(flow, segment_starts).max()
+    if np.isinf(capacity):
+        assert unserved_energy(flow, [unlimited], segment_starts)[0] > allowed
+        return
+
+    unserved, unserved_below = unserved_energy(flow, [capacity, capacity - 1e-3], segment_starts)
+    assert unserved <= allowed + 1e-6
+    assert capacity == 0.0 or unserved_below > allowed
+
+@pytest.mark.parametrize('seed', range(12))
+def test_minimum_capacity_serves_as_much_as_unlimited(seed):
+    flow, segment_starts = random_case(seed)
+    capacities = minimum_capacity_per_segment(flow, segment_starts)
+    capacity = capacities.max()
+
+    unserved = unserved_energy(flow, [capacity, capacity * 10 + 1, capacity - 1e-3], segment_starts)
+    np.testing.assert_allclose(unserved[0], unserved[1], atol=1e-6)
+    if capacity > 0:
+        assert unserved[2] > unserved[1] + 1e-9
+
+def test_cyclic_capacity_repeats_without_unserved_energy():
+    rng = np.random.default_rng(5)
+    flow = rng.normal(0, 100, 500)
+    flow -= flow.mean() - 1.0  # small net surplus
+    capacity = minimum_cyclic_capacity(flow)
+
+    # Starting full, the battery never runs dry over several repetitions
+    repeated = np.tile(flow, 3)
+    states = simulate_battery_soc(np.concatenate(([0.0], repeated)), capacity, capacity)
+    assert (states[:-1] + repeated >= -1e-6).all()
+
+    smaller = capacity - 1e-3
+    states = simulate_battery_soc(np.concatenate(([0.0], repeated)), smaller, smaller)
+    assert (states[:-1] + repeated < 0).any()
+
+    assert minimum_cyclic_capacity(flow - 2.0) == np.inf
+
+def test_solver_modes(dataset):
+    daily = solve_minimum_capacity(dataset, 'daily')
+    segments = reset_segment_starts(dataset)
+    assert daily == minimum_capacity_per_segment(dataset.net_energy_wh, segments).max()
+    assert solve_minimum_capacity(dataset, 'daily', unserved_fraction=0.9) <= daily
+    with pytest.raises(ValueError):
+        solve_minimum_capacity(dataset, 'weekly')
@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import synthetic_frame
+from utils.dataset import EnergyDataset
+from analysis.battery_sizing_comparison import compare_battery_sizing_approaches
+from analysis.daily_sizing import boundary_sweep, daily_sizing_table, daily_sizing_tables, sizing_statistics
+
+def reference_daily_table(frame, morning_start, evening_start):
+    """The per-date loop daily_sizing_table replaces, with whole-hour boundaries."""
+    df = frame.copy()
+    df['Energy_Net_Wh'] = (df['Pprod(W)'].abs() - df['Pdemand(W)']) * 0.25
+    hour = df['Time'].dt.hour
+    df['IsDay'] = (hour >= morning_start) & (hour < evening_start)
+
+    daily_data = []
+    for date in df['Time'].dt.date.unique():
+        day_data = df[df['Time'].dt.date == date]
+        day_excess = max(0, day_data[day_data['IsDay']]['Energy_Net_Wh'].sum())
+        night_deficit = abs(min(0, day_data[~day_data['IsDay']]['Energy_Net_Wh'].sum()))
+        daily_data.append({'Date': date, 'Day_Excess_Wh': day_excess, 'Night_Deficit_Wh': night_deficit})
+    daily_df = pd.DataFrame(daily_data)
+    daily_df['Required_Capacity_Wh'] = daily_df[['Day_Excess_Wh', 'Night_Deficit_Wh']].min(axis=1)
+    return daily_df
+
+@pytest.fixture
+def gappy_frame():
+    """Four weeks of data with missing intervals, as in the real export."""
+    frame = synthetic_frame()
+    keep = np.random.default_rng(5).uniform(size=len(frame)) > 0.05
+    return frame[keep].reset_index(drop=True)
+
+@pytest.mark.parametrize('morning_start, evening_start', [(8, 18), (6, 18)])
+def test_table_matches_per_date_loop(gappy_frame, morning_start, evening_start):
+    table = daily_sizing_table(EnergyDataset(gappy_frame), morning_start, evening_start)
+    expected = reference_daily_table(gappy_frame, morning_start, evening_start)
+
+    pd.testing.assert_frame_equal(table, expected, check_dtype=False, rtol=1e-9, atol=1e-6)
+
+def test_statistics_match_pandas(gappy_frame):
+    table = daily_sizing_table(EnergyDataset(gappy_frame))
+    capacity = table['Required_Capacity_Wh']
+    stats = sizing_statistics(table)
+
+    assert stats == pytest.approx({'mean': capacity.mean(), 'median': capacity.median(),
+                                   'p90': capacity.quantile(0.9), 'max': capacity.max()})
+
+    # A weight of n counts a day n times
+    weights = np.arange(1, len(table) + 1)
+    repeated = pd.DataFrame({'Required_Capacity_Wh': np.repeat(capacity.to_numpy(), weights)})
+    assert sizing_statistics(table, weights) == pytest.approx(sizing_statistics(repeated))
+
+BOUNDARIES = [(8, 18), (6, 18), (7.25, 17.75), (5.1, 20.4), (0, 24), (10, 9)]
+
+def test_many_boundaries_match_single_boundaries(gappy_frame):
+    dataset = EnergyDataset(gappy_frame)
+    tables = daily_sizing_tables(dataset, BOUNDARIES)
+
+    assert len(tables) == len(BOUNDARIES)
+    for (morning_start, evening_start), table in zip(BOUNDARIES, tables):
+        single = daily_sizing_tables(EnergyDataset(gappy_frame), [(morning_start, evening_start)])[0]
+        pd.testing.assert_frame_equal(table, single, rtol=1e-9, atol=1e-6)
+    pd.testing.assert_frame_equal(tables[0], reference_daily_table(gappy_frame, 8, 18),
+                                  check_dtype=False, rtol=1e-9, atol=1e-6)
+
+def test_boundary_sweep_matches_statistics(gappy_frame):
+    dataset = EnergyDataset(gappy_frame)
+    sweep = boundary_sweep(dataset, BOUNDARIES)
+
+    for row, (morning_start, evening_start) in zip(sweep.itertuples(), BOUNDARIES):
+        stats = sizing_statistics(daily_sizing_table(dataset, morning_start, evening_start))
+        assert (row.Morning_Start, row.Evening_Start) == (morning_start, evening_start)
+        assert [row.Mean_Capacity_Wh, row.Median_Capacity_Wh, row.P90_Capacity_Wh, row.Max_Capacity_Wh] == \
+            pytest.approx([stats['mean'], stats['median'], stats['p90'], stats['max']])
+
+@pytest.mark.parametrize('boundaries', [None, BOUNDARIES])
+def test_comparison_matches_single_boundaries(gappy_frame, tmp_path, monkeypatch, boundaries):
+    # The comparison writes its plot and report to the working directory
+    monkeypatch.chdir(tmp_path)
+    results = compare_battery_sizing_approaches(EnergyDataset(gappy_frame), boundaries)
+
+    expected = [(6, 18), (8, 18)] if boundaries is None else boundaries
+    assert [(r['Morning_Start'], r['Evening_Start']) for r in results] == expected
+    for result, (morning_start, evening_start) in zip(results, expected):
+        stats = sizing_statistics(daily_sizing_table(EnergyDataset(gappy_frame), morning_start, evening_start))
+        assert result['P90_Capacity_kWh'] == pytest.approx(stats['p90'] / 1000)
+        assert result['Max_Capacity_kWh'] == pytest.approx(stats['max'] / 1000)
+    if boundaries is None:
+        reference = reference_daily_table(gappy_frame, 6, 18)['Required_Capacity_Wh']
+        assert results[0]['Mean_Capacity_kWh'] == pytest.approx(reference.mean() / 1000)
+    assert (tmp_path / 'battery_sizing_comparison.txt').exists()
@@ -0,0 +1,71 @@
+import os
+
+import pandas as pd
+import pytest
+
+from conftest import raw_lines, synthetic_frame, write_raw
+from utils.data_store import list_sites, load_site_data, site_years
+from utils.dataset import EnergyDataset
+from utils.read_csv import _clean_raw_rows, ingest_site, ingest_sites
+from utils.rollups import compute_rollup
+
+@pytest.fixture
+def raw_dir(tmp_path):
+    """Raw exports of two sites, one of them spanning a new year."""
+    raw_dir = tmp_path / 'raw'
+    raw_dir.mkdir()
+    write_raw(raw_dir / 'north.csv', raw_lines(synthetic_frame(days=20, start='2022-12-20', seed=1)))
+    write_raw(raw_dir / 'south.csv', raw_lines(synthetic_frame(days=5, start='2023-03-01', seed=2)))
+    return raw_dir
+
+def expected_rows(raw_path):
+    raw = pd.read_csv(raw_path, usecols=[0, 1, 2, 3], names=['Time', 'Pprod(W)', 'Pdemand(W)', 'Pimb'],
+                      skiprows=1, dtype={'Time': str})
+    return _clean_raw_rows(raw).reset_index(drop=True)
+
+def test_ingested_site_matches_raw_export(raw_dir, tmp_path):
+    sites_dir = str(tmp_path / 'sites')
+    rows = ingest_site('north', str(raw_dir / 'north.csv'), sites_dir, chunk_rows=500)
+    expected = expected_rows(raw_dir / 'north.csv')
+
+    assert rows == len(expected)
+    assert site_years('north', sites_dir) == [2022, 2023]
+    pd.testing.assert_frame_equal(load_site_data('north', sites_dir=sites_dir), expected, check_dtype=False)
+
+    year = load_site_data('north', [2023], sites_dir)
+    assert (year['Time'].dt.year == 2023).all()
+    assert len(year) == (expected['Time'].dt.year == 2023).sum()
+
+def test_reingest_replaces_partitions(raw_dir, tmp_path):
+    sites_dir = str(tmp_path / 'sites')
+    ingest_site('north', str(raw_dir / 'north.csv'), sites_dir)
+    ingest_site('north', str(raw_dir / 'south.csv'), sites_dir)
+
+    assert site_years('north', sites_dir) == [2023]
+    pd.testing.assert_frame_equal(load_site_data('north', sites_dir=sites_dir),
+                                  expected_rows(raw_dir / 'south.csv'), check_dtype=False)
+
+def test_ingest_sites_and_errors(raw_dir, tmp_path):
+    sites_dir = str(tmp_path / 'sites')
+    rows = ingest_sites(str(raw_dir), sites_dir, max_workers=2)
+
+    assert rows == {site: len(expected_rows(raw_dir / f'{site}.csv')) for site in ('north', 'south')}
+    assert list_sites(sites_dir) == ['north', 'south']
+    with pytest.raises(ValueError, match='Unknown site'):
+        load_site_data('east', sites_dir=sites_dir)
+    with pytest.raises(ValueError, match=r'no data for \[2022\]'):
+        load_site_data('south', [2022, 2023], sites_dir)
+
+def test_site_dataset_rollups(raw_dir, tmp_path):
+    sites_dir = str(tmp_path / 'sites')
+    ingest_site('north', str(raw_dir / 'north.csv'), sites_dir)
+
+    # The ingestion persists the rollups of the whole site
+    rollups_dir = os.path.join(sites_dir, 'north', 'rollups')
+    assert os.path.exists(os.path.join(rollups_dir, 'month.csv'))
+    dataset = EnergyDataset.load_site('north', sites_dir=sites_dir)
+    assert dataset.rollups_dir == rollups_dir
+    pd.testing.assert_frame_equal(dataset.rollup('month'), compute_rollup(dataset, 'month'), check_dtype=False)
+    assert len(dataset.rollup('month')) == 2
+    assert 'rollups' not in os.listdir(sites_dir) and list_sites(sites_dir) == ['north']
+    assert EnergyDataset.load_site('north', [2022], sites_dir).rollups_dir is None
@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from analysis.degradation import estimate_degradation, rainflow_cycles, segment_rainflow_cycles
+
+def reference_rainflow(trace):
+    """Stack-based four-point rainflow count, one reversal at a time."""
+    reversals = []
+    for value in trace:
+        if reversals and value == reversals[-1]:
+            continue
+        if len(reversals) >= 2 and (reversals[-1] - reversals[-2]) * (value - reversals[-1]) > 0:
+            reversals[-1] = value
+        else:
+            reversals.append(value)
+
+    stack, full = [], []
+    for value in reversals:
+        stack.append(value)
+        while len(stack) >= 4:
+            a, b, c, d = stack[-4:]
+            if abs(b - c) <= abs(a - b) and abs(b - c) <= abs(c - d):
+                full.append(abs(b - c))
+                del stack[-3:-1]
+            else:
+                break
+    half = [abs(b - a) for a, b in zip(stack[:-1], stack[1:])]
+    return np.array(full + half), np.array([1.0] * len(full) + [0.5] * len(half))
+
+@pytest.mark.parametrize('seed', range(20))
+def test_rainflow_matches_reference(seed):
+    rng = np.random.default_rng(seed)
+    trace = np.round(np.cumsum(rng.normal(0, 1, rng.integers(2, 300))), 1)
+
+    ranges, counts = rainflow_cycles(trace)
+    expected_ranges, expected_counts = reference_rainflow(trace)
+
+    order, expected_order = np.lexsort((counts, ranges)), np.lexsort((expected_counts, expected_ranges))
+    np.testing.assert_allclose(ranges[order], expected_ranges[expected_order])
+    np.testing.assert_array_equal(counts[order], expected_counts[expected_order])
+
+def test_constant_trace_has_no_cycles():
+    ranges, counts = rainflow_cycles(np.full(50, 3.0))
+    assert len(ranges) == 0 and len(counts) == 0
+
+def test_segments_are_counted_independently():
+    rng = np.random.default_rng(7)
+    parts = [np.cumsum(rng.normal(0, 1, length)) for length in (40, 1, 75, 2, 60)]
+    ranges, counts, segments = segment_rainflow_cycles(
+        np.concatenate(parts), np.cumsum([0] + [len(part) for part in parts[:-1]])
+    )
+
+    for segment, part in enumerate(parts):
+        expected_ranges, expected_counts = rainflow_cycles(part)
+        mine = segments == segment
+        np.testing.assert_allclose(np.sort(ranges[mine]), np.sort(expected_ranges))
+        assert counts[mine].sum() == expected_counts.sum()
+
+def test_batched_degradation_matches_single_traces():
+    rng = np.random.default_rng(11)
+    capacities = np.array([0.0, 2000.0, 5000.0, 20000.0])
+    traces = np.cumsum(rng.normal(0, 300, (2000, len(capacities))), axis=0).clip(0, capacities)
+
+    batched = estimate_degradation(traces, capacities)
+    single = pd.concat([estimate_degradation(traces[:, i], capacity) for i, capacity in enumerate(capacities)],
+                       ignore_index=True)
+
+    pd.testing.assert_frame_equal(batched, single, rtol=1e-12)
+    assert batched['Equivalent_Full_Cycles_Per_Year'][0] == 0.0
@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from analysis.battery_simulation import (
+    SCAN_MAX_SCENARIOS,
+    BatteryProperties,
+    DailyReset,
+    simulate_dispatch,
+    simulate_hybrid_batch,
+    simulate_hybrid_dispatch,
+)
+from analysis.hybrid_storage import hybrid_grid_kpis
+from analysis.inverse_sizing import battery_grid_kpis
+
+DAILY_WH = np.linspace(0, 40000, 17)
+SEASONAL_WH = np.linspace(0, 400000, 16)
+
+@pytest.mark.parametrize('battery', [None, BatteryProperties(0.95, 0.9, max_charge_w=8000)])
+def test_wide_grid_matches_scan(dataset, battery):
+    assert len(DAILY_WH) * len(SEASONAL_WH) > SCAN_MAX_SCENARIOS
+
+    wide = hybrid_grid_kpis(dataset, DAILY_WH, SEASONAL_WH, daily_battery=battery, seasonal_battery=battery)
+    rows = pd.concat([
+        hybrid_grid_kpis(dataset, [daily], SEASONAL_WH, daily_battery=battery, seasonal_battery=battery)
+        for daily in DAILY_WH
+    ], ignore_index=True)
+
+    pd.testing.assert_frame_equal(wide, rows, check_dtype=False, rtol=1e-9, atol=1e-6)
+
+@pytest.mark.parametrize('battery', [None, BatteryProperties(0.95, 0.9, max_charge_w=8000,
+                                                                self_discharge_per_interval=1e-4)])
+def test_hybrid_batch_closes_the_energy_balance(dataset, battery):
+    kpis = simulate_hybrid_batch(dataset.net_energy_wh, DAILY_WH, SEASONAL_WH, 20, 50,
+                                 DailyReset(dataset.day_starts), battery, seasonal_battery=battery)
+
+    # production - demand = change of both stores + export - import + losses
+    stored = (kpis['Daily_Final_State_Wh'] - kpis['Daily_Capacity_Wh'] * 0.2
+              + kpis['Seasonal_Final_State_Wh'] - kpis['Seasonal_Capacity_Wh'] * 0.5)
+    balance = stored + kpis['Grid_Export_Wh'] - kpis['Grid_Import_Wh'] + kpis['Losses_Wh']
+    np.testing.assert_allclose(balance, dataset.net_energy_wh.sum(), rtol=1e-9)
+
+def test_hybrid_dispatch_closes_the_energy_balance(dataset):
+    daily, seasonal = DAILY_WH[None, :, None], SEASONAL_WH[None, None, :]
+    daily_state, seasonal_state, grid = simulate_hybrid_dispatch(
+        dataset.net_energy_wh[:, None, None], daily, seasonal, daily[0] * 0.2, seasonal[0] * 0.5,
+        DailyReset(dataset.day_starts)
+    )
+
+    # An ideal battery has no losses, the reset charge is not lost either
+    stored = daily_state[-1] - daily[0] * 0.2 + seasonal_state[-1] - seasonal[0] * 0.5
+    np.testing.assert_allclose(stored + grid.sum(axis=0), dataset.net_energy_wh.sum(), rtol=1e-9)
+
+def test_reset_hands_the_daily_charge_on(dataset):
+    # Without a seasonal store a resetting daily tier is the daily battery of
+    # the load duration analysis, except that the charge it holds at a reset
+    # is exported instead of dropped
+    strategy = DailyReset(dataset.day_starts)
+    flow = dataset.net_energy_wh[:, None] + 1500  # surplus left at midnight
+    state, daily_grid = simulate_dispatch(flow, DAILY_WH[None, :], 0.0, strategy)
+    _, _, hybrid_grid = simulate_hybrid_dispatch(flow, DAILY_WH[None, :], 0.0, 0.0, 0.0, strategy)
+
+    resets = strategy.reset_rows(len(flow))[1:]
+    assert state[resets - 1].sum() > 0
+    np.testing.assert_allclose(hybrid_grid.sum(axis=0), daily_grid.sum(axis=0) + state[resets - 1].sum(axis=0),
+                               rtol=1e-9, atol=1e-6)
+
+def test_daily_tier_is_a_greedy_battery(dataset):
+    # Without a seasonal store the coupled daily tier is a greedy battery that is never reset
+    hybrid = hybrid_grid_kpis(dataset, DAILY_WH, [0.0], daily_initial_percent=30)
+    daily = battery_grid_kpis(dataset, DAILY_WH, initial_percent=30, daily_reset=False)
+
+    pd.testing.assert_frame_equal(hybrid.drop(columns=['Daily_Capacity_Wh', 'Seasonal_Capacity_Wh']),
+                                  daily.drop(columns=['Capacity_Wh']), check_dtype=False, rtol=1e-9, atol=1e-6)
+
+def test_larger_daily_tier_never_costs_self_sufficiency(dataset):
+    kpis = hybrid_grid_kpis(dataset, DAILY_WH, SEASONAL_WH)
+    table = kpis.pivot(index='Daily_Capacity_Wh', columns='Seasonal_Capacity_Wh', values='Self_Sufficiency_Percent')
+    assert (table.diff().iloc[1:] >= -1e-9).all().all()
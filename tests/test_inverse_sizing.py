@@ -0,0 +1,27 @@
+import numpy as np
+import pytest
+
+from analysis.battery_simulation import DailyReset, simulate_dispatch
+from analysis.inverse_sizing import battery_grid_kpis, find_capacity_for_targets
+
+@pytest.mark.parametrize('daily_reset', [False, True])
+def test_grid_kpis_match_dispatch(dataset, daily_reset):
+    capacities = np.linspace(0, 60000, 7)
+    kpis = battery_grid_kpis(dataset, capacities, 20, daily_reset)
+
+    strategy = DailyReset(dataset.day_starts) if daily_reset else None
+    _, grid = simulate_dispatch(dataset.net_energy_wh[:, None], capacities[None, :], capacities * 0.2, strategy)
+    np.testing.assert_allclose(kpis['Grid_Import_Wh'], -grid.clip(max=0.0).sum(axis=0), rtol=1e-9, atol=1e-6)
+    np.testing.assert_allclose(kpis['Grid_Export_Wh'], grid.clip(min=0.0).sum(axis=0), rtol=1e-9, atol=1e-6)
+    np.testing.assert_allclose(kpis['Self_Sufficiency_Percent'],
+                               (1 + grid.clip(max=0.0).sum(axis=0) / dataset.energy_demand_wh.sum()) * 100)
+
+def test_found_capacity_is_minimal(dataset):
+    capacity, curve = find_capacity_for_targets(dataset, self_sufficiency=45, daily_reset=True,
+                                                initial_percent=0, tolerance_wh=50)
+    assert np.isfinite(capacity)
+
+    kpis = battery_grid_kpis(dataset, [capacity, capacity - 50], 0, daily_reset=True)
+    assert kpis['Self_Sufficiency_Percent'][0] >= 45
+    assert kpis['Self_Sufficiency_Percent'][1] < 45
+    assert curve['Capacity_Wh'].is_monotonic_increasing
@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.config import INTERVAL_HOURS
+from analysis.battery_simulation import BatteryProperties, _dispatch_step
+from analysis.degradation import HOURS_PER_YEAR, DegradationModel, estimate_degradation
+from analysis.lifetime_simulation import simulate_lifetime, years_below_thresholds
+
+# Fast fade, so a few simulated years shrink the capacity noticeably
+MODEL = DegradationModel(cycle_life=200, calendar_fade_per_year=0.05)
+
+def reference_lifetime(flow, capacity, years, chunk_rows, initial_percent, battery, model):
+    """One capacity at a time, one interval at a time, with the fade applied after every chunk."""
+    if battery is None:
+        battery = BatteryProperties()
+    usable = capacity
+    state = capacity * initial_percent / 100
+    first = True
+    rows = []
+    for year in range(1, years + 1):
+        grid = np.empty(len(flow))
+        for start in range(0, len(flow), chunk_rows):
+            trace = np.empty(min(chunk_rows, len(flow) - start))
+            for i in range(len(trace)):
+                value = flow[start + i]
+                if first:
+                    # The very first row only holds the initial state
+                    grid[start + i] = value
+                    first = False
+                else:
+                    _, new_state, step_grid = _dispatch_step(np.array([state]), value, value, np.array([usable]),
+                                                             battery)
+                    state, grid[start + i] = new_state[0], step_grid[0]
+                trace[i] = state
+
+            fade = estimate_degradation(trace, usable, model)['Capacity_Fade_Percent_Per_Year'].iloc[0]
+            usable = max(usable - capacity * fade / 100 * len(trace) * INTERVAL_HOURS / HOURS_PER_YEAR, 0.0)
+            state = min(state, usable)
+        rows.append({'Year': year, 'Usable_Capacity_Wh': usable,
+                     'Grid_Import_Wh': -grid.clip(max=0.0).sum(), 'Grid_Export_Wh': grid.clip(min=0.0).sum()})
+    return pd.DataFrame(rows)
+
+@pytest.mark.parametrize('battery', [None, BatteryProperties(0.95, 0.9, max_charge_w=4000,
+                                                                self_discharge_per_interval=1e-4)])
+def test_lifetime_matches_per_capacity_loop(dataset, battery):
+    capacities = np.array([0.0, 5000.0, 20000.0, 60000.0])
+    update_days = 10
+    lifetime = simulate_lifetime(capacities, dataset, years=2, update_days=update_days, model=MODEL,
+                                 initial_percent=40, battery=battery)
+
+    chunk_rows = int(round(update_days * 24 / INTERVAL_HOURS))
+    for capacity in capacities:
+        expected = reference_lifetime(dataset.net_energy_wh, capacity, 2, chunk_rows, 40, battery, MODEL)
+        rows = lifetime[lifetime['Capacity_Wh'] == capacity].reset_index(drop=True)
+        pd.testing.assert_frame_equal(rows[expected.columns], expected, check_dtype=False, rtol=1e-9, atol=1e-6)
+
+    # The fade is per capacity: larger batteries cycle shallower and fade less
+    final = lifetime[lifetime['Year'] == 2].set_index('Capacity_Wh')['Usable_Capacity_Percent']
+    assert final[60000.0] > final[5000.0] and final[5000.0] < 100
+
+def test_years_below_thresholds():
+    lifetime = pd.DataFrame({
+        'Year': [1, 1, 2, 2, 3, 3],
+        'Capacity_Wh': [1000.0, 2000.0] * 3,
+        'Self_Sufficiency_Percent': [52.0, 60.0, 48.0, 58.0, 44.0, 56.0],
+    })
+    summary = years_below_thresholds(lifetime, thresholds=(50, 45))
+
+    np.testing.assert_array_equal(summary['Capacity_Wh'], [1000.0, 2000.0])
+    np.testing.assert_array_equal(summary['First_Year_Below_50%'], [2.0, np.nan])
+    np.testing.assert_array_equal(summary['First_Year_Below_45%'], [3.0, np.nan])
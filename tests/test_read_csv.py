@@ -0,0 +1,131 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import raw_lines, synthetic_frame, write_raw
+from utils import read_csv
+from utils.data_store import load_cleaned_data
+from utils.dataset import EnergyDataset
+from utils.rollups import compute_rollup
+
+@pytest.fixture
+def paths(tmp_path, monkeypatch):
+    """Point the ingestion at a temporary raw file and output directory."""
+    paths = {
+        'RAW_DATA_PATH': str(tmp_path / 'raw.csv'),
+        'CLEANED_DATA_PATH': str(tmp_path / 'cleaned_data.csv'),
+        'CLEANED_DATA_STORE_DIR': str(tmp_path / 'cleaned_data_columns'),
+        'INGEST_STATE_PATH': str(tmp_path / 'ingest_state.json'),
+    }
+    for name, path in paths.items():
+        monkeypatch.setattr(read_csv, name, path)
+    return paths
+
+def cleaned(paths):
+    return load_cleaned_data(paths['CLEANED_DATA_STORE_DIR'], paths['CLEANED_DATA_PATH'])
+
+def test_append_matches_full_ingest(paths, tmp_path, monkeypatch):
+    lines = raw_lines(synthetic_frame(days=20))
+    write_raw(paths['RAW_DATA_PATH'], lines[:1100])
+    read_csv.read_csv_file()
+    write_raw(paths['RAW_DATA_PATH'], lines[:1500])
+    assert len(read_csv.read_csv_file(append=True)) == 400
+    write_raw(paths['RAW_DATA_PATH'], lines)
+    assert len(read_csv.read_csv_file(append=True)) == len(lines) - 1500
+    appended = cleaned(paths)
+
+    # Full ingest of the same raw file into another directory
+    monkeypatch.setattr(read_csv, 'CLEANED_DATA_PATH', str(tmp_path / 'full.csv'))
+    monkeypatch.setattr(read_csv, 'CLEANED_DATA_STORE_DIR', str(tmp_path / 'full_columns'))
+    full = read_csv.read_csv_file()
+
+    pd.testing.assert_frame_equal(appended, full.reset_index(drop=True), check_dtype=False)
+    dataset = EnergyDataset.load(store_dir=paths['CLEANED_DATA_STORE_DIR'], source_path=paths['CLEANED_DATA_PATH'])
+    for granularity in ('day', 'week'):
+        pd.testing.assert_frame_equal(dataset.rollup(granularity), compute_rollup(EnergyDataset(full), granularity),
+                                      check_dtype=False, rtol=1e-9)
+
+def test_append_without_usable_rows(paths):
+    lines = raw_lines(synthetic_frame(days=3))
+    write_raw(paths['RAW_DATA_PATH'], lines)
+    read_csv.read_csv_file()
+    before = cleaned(paths)
+
+    write_raw(paths['RAW_DATA_PATH'], lines + ['04/01/2023 00:00,,,'])
+    assert len(read_csv.append_new_rows(paths['RAW_DATA_PATH'])) == 0
+    pd.testing.assert_frame_equal(cleaned(paths), before)
+
+def test_append_with_gap_fails(paths):
+    frame = synthetic_frame(days=3)
+    lines = raw_lines(frame)
+    write_raw(paths['RAW_DATA_PATH'], lines[:100])
+    read_csv.read_csv_file()
+
+    # Skip one interval
+    write_raw(paths['RAW_DATA_PATH'], lines[:100] + lines[101:120])
+    with pytest.raises(ValueError, match='do not continue'):
+        read_csv.append_new_rows(paths['RAW_DATA_PATH'])
+    assert read_csv.read_csv_file(append=True) is None
+    assert len(cleaned(paths)) == 100
+
+@pytest.mark.parametrize('chunk_rows', [97, 1000, 100000])
+def test_streaming_matches_in_memory_read(paths, tmp_path, monkeypatch, chunk_rows):
+    write_raw(paths['RAW_DATA_PATH'], raw_lines(synthetic_frame(days=11)))
+    rows = read_csv.stream_csv_file(paths['RAW_DATA_PATH'], chunk_rows)
+    streamed = cleaned(paths)
+    with open(paths['INGEST_STATE_PATH']) as f:
+        state = f.read()
+
+    monkeypatch.setattr(read_csv, 'CLEANED_DATA_PATH', str(tmp_path / 'full.csv'))
+    monkeypatch.setattr(read_csv, 'CLEANED_DATA_STORE_DIR', str(tmp_path / 'full_columns'))
+    full = read_csv.read_csv_file()
+
+    assert rows == len(full)
+    pd.testing.assert_frame_equal(streamed, full.reset_index(drop=True), check_dtype=False)
+    with open(paths['INGEST_STATE_PATH']) as f:
+        assert f.read() == state
+
+def test_streaming_an_empty_file_replaces_the_outputs(paths):
+    write_raw(paths['RAW_DATA_PATH'], raw_lines(synthetic_frame(days=2)))
+    read_csv.stream_csv_file(paths['RAW_DATA_PATH'])
+
+    with open(paths['RAW_DATA_PATH'], 'w') as f:
+        f.write('Time,Pprod,Pdemand,Pimb\n')
+    assert read_csv.stream_csv_file(paths['RAW_DATA_PATH']) == 0
+    assert len(cleaned(paths)) == 0
+    assert len(pd.read_csv(paths['CLEANED_DATA_PATH'])) == 0
+    assert read_csv.append_new_rows(paths['RAW_DATA_PATH']) is None
+
+def test_parse_raw_times_matches_pandas():
+    rng = np.random.default_rng(3)
+    stamps = pd.Timestamp('2020-01-01') + pd.to_timedelta(rng.integers(0, 6 * 365 * 96, 500) * 15, unit='min')
+    times = pd.Series(list(stamps.strftime('%d/%m/%Y %H:%M')) + [
+        '1/2/2023 3:04',        # unpadded
+        '29/02/2024 23:45',     # leap day
+        '31/02/2023 10:00',     # impossible date
+        '01/01/2023 00:00:00',  # too long
+        'Time Interval', '', 'é/01/2023 00:00',
+    ])
+
+    expected = pd.to_datetime(times, format=read_csv.RAW_TIME_FORMAT, errors='coerce').astype('datetime64[ns]')
+    pd.testing.assert_series_equal(read_csv._parse_raw_times(times), expected)
+
+def test_corrupted_timestamps_raise(paths):
+    lines = raw_lines(synthetic_frame(days=3))
+    write_raw(paths['RAW_DATA_PATH'], lines)
+    read_csv.read_csv_file()
+    before = cleaned(paths)
+
+    # Only the summary rows are dropped; any other bad timestamp is an error
+    write_raw(paths['RAW_DATA_PATH'], lines + ['31/02/2023 10:00,1.0,2.0,-3.0'])
+    with pytest.raises(ValueError, match='31/02/2023'):
+        read_csv.append_new_rows(paths['RAW_DATA_PATH'])
+    pd.testing.assert_frame_equal(cleaned(paths), before)
+
+    corrupted = lines[:100] + ['01/01/2023 1x:00,1.0,2.0,-3.0'] + lines[100:]
+    write_raw(paths['RAW_DATA_PATH'], corrupted)
+    assert read_csv.read_csv_file() is None
+    with pytest.raises(ValueError, match=r"1 raw timestamps .* first '01/01/2023 1x:00' at row 100"):
+        read_csv.stream_csv_file(paths['RAW_DATA_PATH'], chunk_rows=64)
+    # The partly streamed outputs cannot be appended to
+    assert read_csv.append_new_rows(paths['RAW_DATA_PATH']) is None
@@ -0,0 +1,97 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import synthetic_frame
+from utils.config import ROLLUPS_DIR
+from utils.data_store import write_columnar_store
+from utils.dataset import EnergyDataset
+from utils.rollups import ROLLUP_GRANULARITIES, compute_rollup, period_keys, store_rollups_dir, update_rollups
+
+def full_rollups(dataset):
+    return {granularity: compute_rollup(dataset, granularity) for granularity in ROLLUP_GRANULARITIES}
+
+def assert_rollups_equal(rollups, expected):
+    for granularity in ROLLUP_GRANULARITIES:
+        pd.testing.assert_frame_equal(rollups[granularity].reset_index(drop=True), expected[granularity],
+                                      check_dtype=False, rtol=1e-9)
+
+@pytest.mark.parametrize('granularity', ROLLUP_GRANULARITIES)
+def test_rollup_matches_per_period_groupby(dataset, granularity):
+    rollup = compute_rollup(dataset, granularity)
+    keys = period_keys(dataset, granularity)
+    grouped = pd.DataFrame({'key': keys, 'net': dataset.production_w - dataset.demand_w}).groupby('key')['net']
+
+    np.testing.assert_array_equal(rollup['Period'], grouped.mean().index)
+    np.testing.assert_allclose(rollup['Net_Mean_W'], grouped.mean())
+    np.testing.assert_allclose(rollup['Net_Max_W'], grouped.max())
+    np.testing.assert_allclose(rollup['Net_P90_W'], grouped.quantile(0.9))
+
+def test_incremental_update_matches_full_recompute(tmp_path):
+    frame = synthetic_frame(days=75, start='2023-02-10')
+    rollups_dir = str(tmp_path / 'rollups')
+
+    # Cut in the middle of a day, so appended rows extend existing periods
+    update_rollups(EnergyDataset(frame.iloc[:3000]), rollups_dir)
+    update_rollups(EnergyDataset(frame.iloc[:5000]), rollups_dir)
+    full = EnergyDataset(frame)
+    incremental = update_rollups(full, rollups_dir)
+
+    assert_rollups_equal(incremental, full_rollups(full))
+
+def test_rewritten_history_is_rebuilt(tmp_path):
+    rollups_dir = str(tmp_path / 'rollups')
+    update_rollups(EnergyDataset(synthetic_frame(days=10, seed=1)), rollups_dir)
+
+    other = EnergyDataset(synthetic_frame(days=12, seed=2))
+    assert_rollups_equal(update_rollups(other, rollups_dir), full_rollups(other))
+
+def test_store_rollups_dir():
+    assert store_rollups_dir() == ROLLUPS_DIR
+    assert store_rollups_dir(store_dir=os.path.join('x', 'store') + os.sep) == os.path.join('x', 'store_rollups')
+    assert store_rollups_dir(source_path=os.path.join('x', 'site.csv')) == os.path.join('x', 'site_rollups')
+
+def test_loaded_store_keeps_its_own_rollups(tmp_path):
+    frame = synthetic_frame(days=9)
+    source_path = tmp_path / 'cleaned.csv'
+    frame.to_csv(source_path, index=False)
+    store_dir = str(tmp_path / 'store')
+    write_columnar_store(frame, store_dir, str(source_path))
+
+    dataset = EnergyDataset.load(store_dir=store_dir, source_path=str(source_path))
+    assert dataset.rollups_dir == store_dir + '_rollups'
+
+    assert EnergyDataset.load(None, store_dir=store_dir, source_path=str(source_path)).rollups_dir is None
+
+def test_reading_never_writes_rollups(tmp_path):
+    frame = synthetic_frame(days=9)
+    source_path = tmp_path / 'cleaned.csv'
+    frame.to_csv(source_path, index=False)
+    store_dir = str(tmp_path / 'store')
+    write_columnar_store(frame, store_dir, str(source_path))
+    rollups_dir = store_dir + '_rollups'
+
+    # Without persisted rollups every granularity is computed in memory
+    dataset = EnergyDataset.load(store_dir=store_dir, source_path=str(source_path))
+    assert_rollups_equal({granularity: dataset.rollup(granularity) for granularity in ROLLUP_GRANULARITIES},
+                         full_rollups(EnergyDataset(frame)))
+    assert not os.path.exists(rollups_dir)
+
+    # Rollups persisted for exactly these rows are read as stored
+    update_rollups(EnergyDataset(frame), rollups_dir)
+    day_path = os.path.join(rollups_dir, 'day.csv')
+    stored = pd.read_csv(day_path)
+    stored.loc[0, 'Net_Mean_W'] = 12345.0
+    stored.to_csv(day_path, index=False)
+    dataset = EnergyDataset.load(store_dir=store_dir, source_path=str(source_path))
+    assert dataset.rollup('day')['Net_Mean_W'].iloc[0] == 12345.0
+
+    # Rollups of a prefix are not used, nor brought up to date
+    update_rollups(EnergyDataset(frame.iloc[:500]), rollups_dir)
+    dataset = EnergyDataset.load(store_dir=store_dir, source_path=str(source_path))
+    pd.testing.assert_frame_equal(dataset.rollup('day'), compute_rollup(EnergyDataset(frame), 'day'))
+    with open(os.path.join(rollups_dir, 'meta.json')) as f:
+        assert json.load(f)['rows'] == 500
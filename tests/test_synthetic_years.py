@@ -0,0 +1,26 @@
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from analysis.synthetic_years import summarize_distribution
+
+@pytest.mark.parametrize('confidence', [0.8, 0.9, 0.95, 0.99])
+def test_mean_interval_uses_the_confidence_level(confidence):
+    rng = np.random.default_rng(0)
+    results = pd.DataFrame({'Year': np.arange(200), 'Capacity_Wh': rng.normal(1000, 100, 200)})
+
+    row = summarize_distribution(results, confidence).loc['Capacity_Wh']
+    z = NormalDist().inv_cdf(1 - (1 - confidence) / 2)
+    half_width = z * results['Capacity_Wh'].std() / np.sqrt(len(results))
+
+    assert row['Mean_CI_High'] - row['Mean'] == pytest.approx(half_width)
+    assert row['Mean'] - row['Mean_CI_Low'] == pytest.approx(half_width)
+    assert row['Interval_High'] == pytest.approx(results['Capacity_Wh'].quantile(1 - (1 - confidence) / 2))
+
+@pytest.mark.parametrize('confidence', [0, 1, 95])
+def test_invalid_confidence(confidence):
+    results = pd.DataFrame({'Year': [0, 1], 'Capacity_Wh': [1.0, 2.0]})
+    with pytest.raises(ValueError):
+        summarize_distribution(results, confidence)
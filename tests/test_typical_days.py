@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+
+from analysis.daily_sizing import daily_sizing_table, sizing_statistics
+from analysis.typical_days import RepresentativeDays, reduced_sizing_statistics, representative_days
+
+STATISTICS = ('mean', 'median', 'p90', 'max')
+
+@pytest.mark.parametrize('method', ['kmedoids', 'kmeans'])
+@pytest.mark.parametrize('k', [3, 6, 10])
+def test_weighted_statistics_match_expanded_year(dataset, method, k):
+    reduced = representative_days(dataset, k=k, method=method)
+    stats = reduced_sizing_statistics(reduced)
+    expanded = sizing_statistics(daily_sizing_table(reduced.expanded_dataset()))
+
+    for statistic in STATISTICS:
+        assert stats[statistic] == pytest.approx(expanded[statistic], rel=1e-9, abs=1e-6)
+
+@pytest.mark.parametrize('method', ['kmedoids', 'kmeans'])
+def test_representatives_are_in_date_order(dataset, method):
+    reduced = representative_days(dataset, k=7, method=method)
+    assert (np.diff(reduced.day_positions) > 0).all()
+    assert reduced.weights.sum() == len(dataset.day_starts)
+    assert len(reduced.representative_dataset().day_starts) == len(reduced.weights)
+
+def test_empty_clusters_are_dropped(dataset):
+    days = len(dataset.day_starts)
+    reduced = representative_days(dataset, k=days, method='kmeans')
+    chronology = reduced.chronology.copy()
+    chronology[chronology == 1] = 0  # cluster 1 loses its only day
+
+    merged = RepresentativeDays(dataset, reduced.production_wh, reduced.demand_wh, chronology)
+    assert len(merged.weights) == days - 1 and (merged.weights > 0).all()
+    assert len(merged.representative_dataset().day_starts) == days - 1